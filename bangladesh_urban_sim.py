@@ -2,181 +2,8 @@ import random
 import pandas as pd # Using pandas for potentially more structured data later
 
 # --- Synthetic Data Generation ---
-
-def generate_synthetic_config():
-    """Generates a configuration dictionary with synthetic data placeholders."""
-    config = {
-        # --- Urban Growth Data ---
-        'urban_growth': {
-            'initial_population': {
-                'Dhaka': 18_000_000, 'Chattogram': 5_500_000, 'Khulna': 1_500_000,
-                'Sylhet': 800_000, 'Rajshahi': 900_000, 'Barishal': 400_000,
-                'Rangpur': 350_000, 'Mymensingh': 500_000, 'Narayanganj': 2_000_000,
-                "Cox's Bazar": 600_000
-            },
-            'annual_growth_rate': { # Simplified average annual % growth
-                'Dhaka': 0.035, 'Chattogram': 0.030, 'Khulna': 0.020,
-                'Sylhet': 0.032, 'Rajshahi': 0.025, 'Barishal': 0.022,
-                'Rangpur': 0.028, 'Mymensingh': 0.030, 'Narayanganj': 0.033,
-                "Cox's Bazar": 0.045
-            },
-            'land_use': { # Simplified initial land use %
-                'Dhaka': {'residential': 40, 'commercial': 15, 'industrial': 10, 'informal': 15, 'green': 5, 'water': 15},
-                'Chattogram': {'residential': 35, 'commercial': 12, 'industrial': 18, 'informal': 10, 'green': 8, 'water': 17},
-                # Add other cities...
-            },
-            'peri_urban_areas': ['Savar', 'Gazipur', 'Keraniganj'], # Examples near Dhaka
-        },
-        # --- Housing Data ---
-        'housing': {
-            'initial_housing_stock': { # Units
-                 'Dhaka': {'formal': 3_000_000, 'informal': 1_500_000},
-                 'Chattogram': {'formal': 800_000, 'informal': 400_000},
-                 # Add other cities...
-            },
-            'avg_house_price': { # BDT Lakh
-                'Dhaka': 80, 'Chattogram': 60, # Add other cities...
-            },
-            'avg_rent': { # BDT / month
-                'Dhaka': 20000, 'Chattogram': 12000, # Add other cities...
-            },
-            'affordability_ratio': { # Price-to-income
-                 'Dhaka': 15, 'Chattogram': 12, # Add other cities...
-            }
-        },
-        # --- Infrastructure Data ---
-        'infrastructure': {
-             'water_coverage': {'Dhaka': 0.85, 'Chattogram': 0.75, 'Khulna': 0.60}, # Piped water access %
-             'sanitation_coverage': {'Dhaka': 0.70, 'Chattogram': 0.60, 'Khulna': 0.50}, # Sewerage/FSM %
-             'power_reliability': {'Dhaka': 0.95, 'Chattogram': 0.92, 'Khulna': 0.88}, # % Uptime
-             'waste_collection': {'Dhaka': 0.75, 'Chattogram': 0.65, 'Khulna': 0.55}, # % Collected
-             'internet_penetration': {'Dhaka': 0.80, 'Chattogram': 0.70, 'Khulna': 0.50}, # % Households
-        },
-        # --- Transport Data ---
-        'transport': {
-            'modal_split': { # % trips
-                'Dhaka': {'walk': 30, 'rickshaw': 25, 'bus': 20, 'car/taxi': 15, 'other': 10},
-                'Chattogram': {'walk': 35, 'rickshaw': 30, 'bus': 15, 'car/taxi': 10, 'other': 10},
-                 # Add other cities...
-            },
-            'avg_commute_time': { # Minutes
-                'Dhaka': 60, 'Chattogram': 45, # Add other cities...
-            },
-            'road_density': { # km/sq km
-                'Dhaka': 15, 'Chattogram': 12, # Add other cities...
-            },
-             'public_transit_coverage': { # % population with access
-                'Dhaka': 0.60, 'Chattogram': 0.40, # Add other cities... (Excludes Rickshaws for simplicity)
-            }
-        },
-         # --- Economy Data ---
-        'economy': {
-            'gdp_per_capita': { # USD
-                'Dhaka': 5000, 'Chattogram': 4500, 'Khulna': 3000,
-            },
-            'unemployment_rate': { # %
-                'Dhaka': 0.06, 'Chattogram': 0.07, 'Khulna': 0.08,
-            },
-            'sectoral_employment': { # %
-                'Dhaka': {'services': 60, 'industry': 30, 'informal': 10}, # Simplified
-                'Chattogram': {'services': 50, 'industry': 40, 'informal': 10},
-            },
-            'informal_economy_share': { # % of GDP
-                'Dhaka': 0.30, 'Chattogram': 0.35,
-            }
-        },
-        # --- Governance Data ---
-        'governance': {
-            'municipal_own_revenue': { # % of total budget
-                'Dhaka': 0.40, 'Chattogram': 0.35, 'Khulna': 0.25,
-            },
-            'citizen_satisfaction': { # Index 0-1
-                 'Dhaka': 0.5, 'Chattogram': 0.55, 'Khulna': 0.6,
-            },
-            'planning_compliance': { # % development adhering to plan
-                'Dhaka': 0.45, 'Chattogram': 0.50,
-            }
-        },
-        # --- Environment Data ---
-        'environment': {
-            'air_quality_index': { # AQI avg
-                'Dhaka': 180, 'Chattogram': 150, 'Khulna': 120,
-            },
-            'green_space_ratio': { # % land area
-                'Dhaka': 0.05, 'Chattogram': 0.08, 'Khulna': 0.10,
-            },
-             'flood_prone_area': { # % land area
-                'Dhaka': 0.25, 'Chattogram': 0.15, 'Khulna': 0.30, 'Barishal': 0.40,
-            },
-             'waste_recycling_rate': { # %
-                'Dhaka': 0.10, 'Chattogram': 0.08,
-            }
-        },
-        # --- Social Data ---
-        'social': {
-             'literacy_rate': { # %
-                 'Dhaka': 0.80, 'Chattogram': 0.75, 'Khulna': 0.70,
-             },
-             'access_to_healthcare': { # % pop within X km of facility
-                 'Dhaka': 0.90, 'Chattogram': 0.85, 'Khulna': 0.75,
-             },
-             'social_cohesion_index': { # Index 0-1
-                 'Dhaka': 0.6, 'Chattogram': 0.65, 'Khulna': 0.7,
-             },
-              'crime_rate': { # Per 100k pop
-                 'Dhaka': 300, 'Chattogram': 250, 'Khulna': 200,
-             }
-        },
-         # --- Urban-Rural Linkage Data ---
-        'urban_rural': {
-            'remittance_dependency': { # % household income in surrounding rural areas
-                 'Sylhet': 0.40, 'Comilla': 0.30,
-            },
-            'rural_migration_rate': { # Net annual % into major cities
-                'Dhaka': 0.015, 'Chattogram': 0.010,
-            },
-            'commuter_percentage': { # % workforce commuting from peri-urban/rural
-                 'Dhaka': 0.15, 'Chattogram': 0.10,
-            }
-        },
-         # --- Service Delivery Data ---
-        'service_delivery': { # Focused on social infra
-            'school_density': { # Schools per sq km
-                 'Dhaka': 5, 'Chattogram': 4,
-            },
-            'hospital_beds_per_1000': {
-                 'Dhaka': 2.0, 'Chattogram': 1.5,
-            },
-             'public_space_per_capita': { # sq m
-                 'Dhaka': 1.0, 'Chattogram': 1.5,
-            }
-        },
-        # --- Smart City Data ---
-        'smart_city': {
-            'digital_literacy': { # % population
-                 'Dhaka': 0.65, 'Chattogram': 0.60,
-            },
-            'smart_service_adoption': { # % citizens using e-gov services
-                 'Dhaka': 0.30, 'Chattogram': 0.25,
-            },
-            'iot_sensor_density': { # sensors per sq km (conceptual)
-                 'Dhaka': 10, 'Chattogram': 5,
-            }
-        },
-        # --- Resilience Data ---
-        'resilience': {
-            'early_warning_coverage': { # % pop covered
-                'Dhaka': 0.7, 'Chattogram': 0.8, 'Khulna': 0.75, 'Barishal': 0.85, # Coastal/riverine focus
-            },
-            'building_code_compliance': { # % new builds
-                'Dhaka': 0.5, 'Chattogram': 0.55,
-            },
-            'disaster_recovery_speed': { # Avg time (days) to restore basic services
-                'Dhaka': 7, 'Chattogram': 5, 'Khulna': 10,
-            }
-        }
-    }
-    return config
+# Shared with main_simulation.py so the two entry points cannot drift apart
+from synthetic_config import generate_synthetic_config
 
 # --- Core Component Classes ---
 
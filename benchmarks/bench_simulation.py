@@ -0,0 +1,170 @@
+"""Benchmark matrix for the simulation core and its reporting phases.
+
+Every case (city count x horizon x replicates) runs in a fresh spawned process, so its
+peak RSS is its own, and is timed over `--repeat` runs (the fastest is kept). Results go
+to a JSON report; with a baseline report, any timing slower than the baseline by more
+than `--threshold` is flagged and the exit status is 1. Everything runs offline.
+
+    python benchmarks/bench_simulation.py                       # quick matrix
+    python benchmarks/bench_simulation.py --matrix full --save-baseline
+    python benchmarks/bench_simulation.py --baseline benchmarks/baseline.json
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, 'benchmarks', 'baseline.json')
+
+MATRICES = {
+    'quick': {'cities': [10, 1000], 'years': [10, 25], 'replicates': [1, 10]},
+    'full': {'cities': [10, 100, 1000, 10000], 'years': [10, 25, 50, 75], 'replicates': [1, 10, 100]},
+}
+# The overview plot draws one line and legend entry per city in every panel, which is what
+# limits plotting and reporting: the report itself is paginated into per-city fragments and
+# grows linearly. Both are timed together, only up to this many cities
+MAX_REPORT_CITIES = 100
+
+def _run_case(cities, years, replicates, with_report):
+    """Worker: builds a config with `cities` cities and times one run; returns ({metric: seconds}, peak RSS in MB)."""
+    sys.path.insert(0, REPO_ROOT)
+    from city_registry import synthetic_city_config
+    from main_simulation import BangladeshUrbanDevelopmentSimulation, UrbanAnalysisEngine, generate_synthetic_config
+    from sim_profile import PROFILE
+
+    os.chdir(tempfile.mkdtemp(prefix='bench_')) # The analysis engine writes to ./simulation_outputs
+    config = generate_synthetic_config()
+    if cities > 10:
+        config = synthetic_city_config(config, cities)
+
+    start = time.perf_counter()
+    simulation = BangladeshUrbanDevelopmentSimulation(config, seed=0)
+    engine = UrbanAnalysisEngine(simulation)
+    setup = time.perf_counter() - start
+
+    PROFILE.enable()
+    start = time.perf_counter()
+    simulation.run_simulation(engine, years=years, replicates=replicates)
+    timings = {'setup': setup, 'run_simulation': time.perf_counter() - start}
+    if with_report:
+        engine.generate_plots()
+        engine.generate_html_report()
+    PROFILE.disable()
+    summary = PROFILE.summary()
+    timings['record_state'] = summary['analysis.record_state']['total_ms'] / 1e3
+    for phase in ('generate_plots', 'generate_html_report'):
+        if f"analysis.{phase}" in summary:
+            timings[phase] = summary[f"analysis.{phase}"]['total_ms'] / 1e3
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # Linux reports KiB
+    return timings, peak_rss_mb
+
+
+def run_case(cities, years, replicates, repeat=1):
+    best = {}
+    peak_rss_mb = 0.0
+    with_report = cities <= MAX_REPORT_CITIES
+    for _ in range(repeat):
+        # One fresh interpreter per run: imports are not timed and RSS starts from scratch
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            timings, rss = executor.submit(_run_case, cities, years, replicates, with_report).result()
+        for metric, seconds in timings.items():
+            best[metric] = min(seconds, best.get(metric, seconds))
+        peak_rss_mb = max(peak_rss_mb, rss)
+    return {'cities': cities, 'years': years, 'replicates': replicates,
+            'seconds': best, 'peak_rss_mb': round(peak_rss_mb, 1)}
+
+
+def _case_key(case):
+    return (case['cities'], case['years'], case['replicates'])
+
+
+def compare(report, baseline, threshold, min_delta=0.0):
+    """Regressions as (case key, metric, baseline value, new value) where new > baseline * (1 + threshold).
+
+    Timings must also have grown by more than `min_delta` seconds, so that jitter on
+    millisecond-scale phases is not reported.
+    """
+    previous = {_case_key(case): case for case in baseline['cases']}
+    regressions = []
+    for case in report['cases']:
+        old = previous.get(_case_key(case))
+        if old is None:
+            continue
+        metrics = dict(case['seconds'], peak_rss_mb=case['peak_rss_mb'])
+        old_metrics = dict(old['seconds'], peak_rss_mb=old['peak_rss_mb'])
+        for metric, value in metrics.items():
+            reference = old_metrics.get(metric)
+            floor = 0.0 if metric == 'peak_rss_mb' else min_delta
+            if reference and value > reference * (1 + threshold) and value - reference > floor:
+                regressions.append((_case_key(case), metric, reference, value))
+    return regressions
+
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import numpy
+    return {'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'commit': commit, 'python': platform.python_version(), 'numpy': numpy.__version__,
+            'machine': platform.machine(), 'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the simulation across cities, horizon and replicates.")
+    parser.add_argument('--matrix', choices=sorted(MATRICES), default='quick')
+    parser.add_argument('--cities', type=int, nargs='+', help="Override the matrix's city counts")
+    parser.add_argument('--years', type=int, nargs='+', help="Override the matrix's horizons")
+    parser.add_argument('--replicates', type=int, nargs='+', help="Override the matrix's replicate counts")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per case (fastest kept)")
+    parser.add_argument('--output', default='benchmark_report.json')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline report to compare against (if present)")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument('--min-delta', type=float, default=0.01, help="Ignore slowdowns below this many seconds")
+    parser.add_argument('--save-baseline', action='store_true', help="Also store this report as the baseline")
+    args = parser.parse_args()
+
+    matrix = dict(MATRICES[args.matrix])
+    for axis in ('cities', 'years', 'replicates'):
+        if getattr(args, axis):
+            matrix[axis] = getattr(args, axis)
+
+    cases = []
+    print(f"{'cities':>7} {'years':>6} {'reps':>5} {'run (s)':>9} {'record (s)':>11} {'plots (s)':>10} {'report (s)':>11} {'rss (MB)':>9}")
+    for cities in matrix['cities']:
+        for years in matrix['years']:
+            for replicates in matrix['replicates']:
+                case = run_case(cities, years, replicates, repeat=args.repeat)
+                cases.append(case)
+                seconds = case['seconds']
+                plots = f"{seconds['generate_plots']:.3f}" if 'generate_plots' in seconds else '-'
+                report_time = f"{seconds['generate_html_report']:.3f}" if 'generate_html_report' in seconds else '-'
+                print(f"{cities:>7} {years:>6} {replicates:>5} {seconds['run_simulation']:>9.3f} "
+                      f"{seconds['record_state']:>11.4f} {plots:>10} {report_time:>11} {case['peak_rss_mb']:>9.1f}")
+
+    report = {'environment': _environment(), 'matrix': matrix, 'repeat': args.repeat, 'cases': cases}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline stored in {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold, args.min_delta)
+        for (cities, years, replicates), metric, old, new in regressions:
+            print(f"REGRESSION cities={cities} years={years} replicates={replicates} {metric}: {old:.4g} -> {new:.4g}")
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%} against {args.baseline}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,71 @@
+"""Startup budget: fresh interpreter -> import the simulation core -> 10-city/10-year run.
+
+The core must not import pandas or matplotlib (plots load matplotlib lazily), and
+the median of `--runs` fresh processes must stay within `--budget-ms`. The import of
+NumPy alone is measured the same way for reference. Exits with status 1 when over budget.
+
+    python benchmarks/bench_startup.py --budget-ms 750
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_MS = 750
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from main_simulation import BangladeshUrbanDevelopmentSimulation, generate_synthetic_config
+imported = time.perf_counter()
+
+class _NullRecorder:
+    def record_state(self, year):
+        pass
+
+BangladeshUrbanDevelopmentSimulation(generate_synthetic_config(), seed=0).run_simulation(_NullRecorder(), years=10)
+finished = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1e3, 'run_ms': (finished - imported) * 1e3,
+                  'heavy_modules': sorted(m for m in ('pandas', 'matplotlib') if m in sys.modules)}))
+"""
+
+NUMPY_PROBE = """
+import json, time
+start = time.perf_counter()
+import numpy
+print(json.dumps({'import_ms': (time.perf_counter() - start) * 1e3}))
+"""
+
+def _probe(code):
+    output = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the import + 10-city/10-year run startup budget.")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [_probe(PROBE) for _ in range(args.runs)]
+    numpy_ms = statistics.median(_probe(NUMPY_PROBE)['import_ms'] for _ in range(args.runs))
+    import_ms = statistics.median(sample['import_ms'] for sample in samples)
+    run_ms = statistics.median(sample['run_ms'] for sample in samples)
+    total_ms = statistics.median(sample['import_ms'] + sample['run_ms'] for sample in samples)
+    heavy = sorted({module for sample in samples for module in sample['heavy_modules']})
+
+    print(f"numpy import:            {numpy_ms:7.1f} ms (reference)")
+    print(f"simulation core import:  {import_ms:7.1f} ms")
+    print(f"10-city / 10-year run:   {run_ms:7.1f} ms")
+    print(f"import + run (median):   {total_ms:7.1f} ms  (budget {args.budget_ms:.0f} ms)")
+    failures = []
+    if heavy:
+        failures.append(f"core import pulled in {', '.join(heavy)}")
+    if total_ms > args.budget_ms:
+        failures.append(f"startup {total_ms:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,193 @@
+import json
+
+import numpy as np
+
+# Container layout: magic | header length (uint64, little-endian) | JSON header | arrays.
+# Every array starts on a 64-byte boundary of the data section so it can be mapped in place.
+MAGIC = b'BDUSCKPT'
+VERSION = 2 # Raised whenever the header or the stored arrays change
+ALIGNMENT = 64
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _layout(magic, header, specs):
+    """Lays out arrays given as {name: (shape, dtype)}: (encoded header, data start, array specs, data size)."""
+    arrays = {}
+    offset = 0
+    for name, (shape, dtype) in specs.items():
+        dtype = np.dtype(dtype)
+        offset = _aligned(offset)
+        arrays[name] = {'offset': offset, 'shape': list(shape), 'dtype': dtype.str}
+        offset += int(np.prod(shape)) * dtype.itemsize
+    encoded = json.dumps(dict(header, arrays=arrays)).encode('utf-8')
+    return encoded, _aligned(len(magic) + 8 + len(encoded)), arrays, offset
+
+
+def _write_header(f, magic, encoded):
+    f.write(magic)
+    f.write(len(encoded).to_bytes(8, 'little'))
+    f.write(encoded)
+
+
+def write_array_file(path, magic, header, arrays):
+    """Writes `header` (JSON-serialisable dict) and named arrays in the aligned container format.
+
+    The header gains an 'arrays' entry with each array's offset, shape and dtype.
+    """
+    encoded, data_start, specs, size = _layout(magic, header, {name: (array.shape, array.dtype)
+                                                                for name, array in arrays.items()})
+    with open(path, 'wb') as f:
+        _write_header(f, magic, encoded)
+        for name, array in arrays.items():
+            f.seek(data_start + specs[name]['offset']) # Padding reads back as zeros
+            f.write(np.ascontiguousarray(array).data)
+        f.truncate(data_start + size)
+
+
+def create_array_file(path, magic, header, specs):
+    """Creates a container file with uninitialised arrays ({name: (shape, dtype)}) to be filled in place.
+
+    Returns {name: writable np.memmap}, so arrays larger than memory can be written piecewise.
+    """
+    encoded, data_start, arrays, size = _layout(magic, header, specs)
+    with open(path, 'wb') as f:
+        _write_header(f, magic, encoded)
+        f.truncate(data_start + size) # Sparse on most filesystems until written
+    return {name: np.memmap(path, dtype=np.dtype(spec['dtype']), mode='r+', offset=data_start + spec['offset'],
+                            shape=tuple(spec['shape']))
+            for name, spec in arrays.items()}
+
+
+class ArrayFile:
+    """Header and named arrays of an aligned container file, memory-mapped read-only by default"""
+    def __init__(self, path, magic, mmap=True):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(magic)) != magic:
+                raise ValueError(f"{path} is not a {magic.decode('ascii')} file")
+            header_length = int.from_bytes(f.read(8), 'little')
+            self.header = json.loads(f.read(header_length))
+        data_start = _aligned(len(magic) + 8 + header_length)
+        raw = np.memmap(path, dtype=np.uint8, mode='r') if mmap else np.fromfile(path, dtype=np.uint8)
+        self._data = raw[data_start:]
+        if not mmap:
+            self._data.flags.writeable = False
+
+    def array(self, name):
+        """One array as a view into the file (no copy)."""
+        spec = self.header['arrays'][name]
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape']))
+        start = spec['offset']
+        return self._data[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+
+
+def save_checkpoint(simulation, path):
+    """Writes every model's published state, each model's RNG state and the current year to `path`."""
+    models = {}
+    arrays = {}
+    for name in simulation.MODEL_ATTRIBUTES:
+        model = getattr(simulation, name)
+        table = model.state
+        if table.in_step:
+            raise RuntimeError(f"Cannot checkpoint {name} in the middle of a step")
+        bit_generator = model.rng.bit_generator
+        models[name] = {
+            'class': type(model).__name__,
+            'layout': table.layout(),
+            'rng': {'bit_generator': type(bit_generator).__name__, 'state': bit_generator.state},
+        }
+        arrays[f"{name}/values"] = table.front
+        arrays[f"{name}/mask"] = table.front_mask
+        grid = getattr(model, 'grid', None) # Land use rasters of a gridded growth model
+        if grid is not None:
+            models[name]['grid'] = {'positions': grid.positions.tolist(), 'categories': list(grid.categories)}
+            for i, raster in enumerate(grid.rasters):
+                arrays[f"{name}/grid/{i}"] = raster
+        networks = getattr(model, 'networks', None) # Road networks of the transport model (links may have changed)
+        if networks:
+            models[name]['networks'] = [network.city for network in networks]
+            if model.commute_scale is not None:
+                models[name]['commute_scale'] = model.commute_scale.tolist()
+                models[name]['network_population'] = model.network_population.tolist()
+            for i, network in enumerate(networks):
+                for field, array in network.link_arrays().items():
+                    arrays[f"{name}/network/{i}/{field}"] = array
+    write_array_file(path, MAGIC, {
+        'version': VERSION,
+        'current_year': simulation.current_year,
+        'replicates': simulation.replicates,
+        'cities': list(simulation.city_index.names),
+        'models': models,
+    }, arrays)
+
+
+class Checkpoint(ArrayFile):
+    """A checkpoint file's header and its arrays, memory-mapped read-only by default"""
+    def __init__(self, path, mmap=True):
+        super().__init__(path, MAGIC, mmap=mmap)
+        if self.header['version'] != VERSION:
+            raise ValueError(f"Unsupported checkpoint version {self.header['version']}")
+
+    @property
+    def current_year(self):
+        return self.header['current_year']
+
+    @property
+    def replicates(self):
+        return self.header['replicates']
+
+    @property
+    def cities(self):
+        return tuple(self.header['cities'])
+
+    def state(self, model_name):
+        """(values, mask) arrays of one model's state table (views into the file, no copies)."""
+        return self.array(f"{model_name}/values"), self.array(f"{model_name}/mask")
+
+
+def load_checkpoint(path, mmap=True):
+    return Checkpoint(path, mmap=mmap)
+
+
+def restore_checkpoint(simulation, checkpoint):
+    """Loads a checkpoint into a simulation built from the same configuration.
+
+    The state tables adopt the checkpoint's arrays directly; the first step after the
+    restore copies them into fresh write buffers, so the file is never written to.
+    """
+    if checkpoint.cities != simulation.city_index.names:
+        raise ValueError("Checkpoint was written for a different set of cities")
+    for name in simulation.MODEL_ATTRIBUTES:
+        model = getattr(simulation, name)
+        entry = checkpoint.header['models'].get(name)
+        if entry is None or entry['layout'] != model.state.layout():
+            raise ValueError(f"Checkpoint state for {name} does not match this configuration")
+        values, mask = checkpoint.state(name)
+        model.state.restore(values, mask)
+        grid = getattr(model, 'grid', None)
+        saved_grid = entry.get('grid')
+        if (grid is None) != (saved_grid is None) or (grid is not None and saved_grid['positions'] != grid.positions.tolist()):
+            raise ValueError(f"Checkpoint land use grid for {name} does not match this simulation")
+        if grid is not None:
+            # Grid steps write into fresh rasters, so they can keep reading the file's arrays
+            grid.rasters = [checkpoint.array(f"{name}/grid/{i}") for i in range(len(grid.rasters))]
+        networks = getattr(model, 'networks', None) or []
+        if [network.city for network in networks] != entry.get('networks', []):
+            raise ValueError(f"Checkpoint road networks for {name} do not match this simulation")
+        for i, network in enumerate(networks):
+            prefix = f"{name}/network/{i}/" # Link fields, plus the equilibrium flows once assigned
+            network.restore({key[len(prefix):]: checkpoint.array(key) for key in checkpoint.header['arrays']
+                             if key.startswith(prefix)})
+        if networks and 'commute_scale' in entry: # Saved calibration: no cold-start equilibrium after the restore
+            model.commute_scale = np.array(entry['commute_scale'])
+            model.network_population = np.array(entry['network_population'])
+        rng = entry['rng']
+        if type(model.rng.bit_generator).__name__ != rng['bit_generator']:
+            model.rng = np.random.Generator(getattr(np.random, rng['bit_generator'])())
+        model.rng.bit_generator.state = rng['state']
+        model.current_year = checkpoint.current_year
+    simulation.replicates = checkpoint.replicates
+    simulation.current_year = checkpoint.current_year
@@ -0,0 +1,176 @@
+import argparse
+import copy
+import csv
+import time
+from collections.abc import Mapping
+
+import numpy as np
+
+from state_store import CityIndex
+
+def per_city_tables(config):
+    """Yields (section, indicator, {city: value or {category: value}}) for every per-city mapping in a config."""
+    for section, entries in config.items():
+        if not isinstance(entries, Mapping):
+            continue
+        for indicator, values in entries.items():
+            if isinstance(values, Mapping):
+                yield section, indicator, values
+
+
+class CityRegistry(CityIndex):
+    """City index with integer IDs, per-city attributes and per-indicator coverage masks.
+
+    `coverage[(section, indicator)]` is a boolean array over the registry's IDs marking
+    which cities the configuration provides that indicator for; models fill every other
+    city with their explicit default once, when their state tables are loaded.
+    """
+    def __init__(self, names, attributes=None):
+        super().__init__(names)
+        self.ids = np.arange(len(self.names))
+        self.attributes = {name: np.asarray(values) for name, values in (attributes or {}).items()}
+        self.coverage = {}
+
+    @classmethod
+    def from_config(cls, config, names=(), attributes=None):
+        """Registers `names` (e.g. every row of a city table) followed by any other city the config mentions."""
+        registered = dict.fromkeys(names)
+        for _, _, values in per_city_tables(config):
+            registered.update(dict.fromkeys(city for city in values if city not in registered))
+        registry = cls(registered, attributes)
+        for section, indicator, values in per_city_tables(config):
+            registry.coverage[(section, indicator)] = registry.mask(values)
+        return registry
+
+    def mask(self, cities):
+        covered = np.zeros(len(self), dtype=bool)
+        covered[[self.positions[city] for city in cities if city in self.positions]] = True
+        return covered
+
+    def coverage_summary(self):
+        """{(section, indicator): number of cities covered}."""
+        return {key: int(mask.sum()) for key, mask in self.coverage.items()}
+
+
+# --- Tabular city files ---
+# One row per city. Columns named 'section.indicator' (or 'section.indicator.category'
+# for nested indicators such as land use shares) hold config values, an empty cell means
+# the indicator is not available for that city; any other column is a city attribute.
+
+def _parse_number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def load_city_table(path, base_config=None):
+    """Reads a city table into a configuration and its CityRegistry.
+
+    Values from the table are merged into a copy of `base_config` (which supplies any
+    section or non per-city setting the table does not cover).
+    """
+    config = copy.deepcopy(base_config) if base_config else {}
+    names = []
+    attributes = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        indicator_columns = [column for column in reader.fieldnames if '.' in column]
+        attribute_columns = [column for column in reader.fieldnames if '.' not in column and column != 'city']
+        for column in attribute_columns:
+            attributes[column] = []
+        for row in reader:
+            city = row['city']
+            names.append(city)
+            for column in attribute_columns:
+                attributes[column].append(row[column])
+            for column in indicator_columns:
+                text = row[column].strip()
+                if not text:
+                    continue
+                section, indicator, *category = column.split('.', 2)
+                values = config.setdefault(section, {}).setdefault(indicator, {})
+                if category:
+                    values.setdefault(city, {})[category[0]] = _parse_number(text)
+                else:
+                    values[city] = _parse_number(text)
+    return config, CityRegistry.from_config(config, names, attributes)
+
+
+def save_city_table(config, path, registry=None):
+    """Writes every per-city indicator of a config as a city table (the inverse of load_city_table)."""
+    registry = registry or CityRegistry.from_config(config)
+    columns = {}
+    for section, indicator, values in per_city_tables(config):
+        for city, value in values.items():
+            if isinstance(value, dict):
+                for category in value:
+                    columns.setdefault(f"{section}.{indicator}.{category}", {})[city] = value[category]
+            else:
+                columns.setdefault(f"{section}.{indicator}", {})[city] = value
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['city'] + list(registry.attributes) + list(columns))
+        for city in registry:
+            pos = registry.position(city)
+            writer.writerow([city] + [registry.attributes[name][pos] for name in registry.attributes] +
+                            [columns[column].get(city, '') for column in columns])
+
+
+# --- Synthetic scale-out configurations ---
+def synthetic_city_config(template, n_cities, seed=0):
+    """Config with `n_cities` cities drawn to resemble `template`.
+
+    The template's own cities are kept unchanged. Generated cities ("Town 00011", ...)
+    are covered by each per-city indicator with the same probability as the template's
+    cities are, and take values drawn uniformly from the template's range for that
+    indicator (per category for nested ones), so coverage stays ragged as in the
+    hand-written config.
+    """
+    rng = np.random.default_rng(seed)
+    config = copy.deepcopy(template)
+    template_cities = CityIndex.from_config(template)
+    names = [f"Town {i:05d}" for i in range(len(template_cities), n_cities)]
+    for section, indicator, values in per_city_tables(config):
+        covered = [names[i] for i in np.flatnonzero(rng.random(len(names)) < len(values) / len(template_cities))]
+        rows = list(values.values())
+        if rows and isinstance(rows[0], dict):
+            categories = list(dict.fromkeys(category for row in rows for category in row))
+            draws = {category: _draw_like([row[category] for row in rows if category in row], len(covered), rng)
+                     for category in categories}
+            for i, city in enumerate(covered):
+                values[city] = {category: draws[category][i] for category in categories}
+        else:
+            values.update(zip(covered, _draw_like(rows, len(covered), rng)))
+    return config
+
+
+def _draw_like(examples, size, rng):
+    low, high = min(examples), max(examples)
+    draws = rng.uniform(low, high, size)
+    return draws.round().astype(int).tolist() if all(isinstance(x, int) for x in examples) else draws.tolist()
+
+
+if __name__ == "__main__":
+    from main_simulation import BangladeshUrbanDevelopmentSimulation, generate_synthetic_config
+
+    parser = argparse.ArgumentParser(description="Time the simulation on synthetic configs of growing size.")
+    parser.add_argument('--cities', type=int, nargs='+', default=[1000, 2500, 5000, 10000])
+    parser.add_argument('--years', type=int, default=5)
+    args = parser.parse_args()
+
+    class _NullRecorder:
+        def record_state(self, year):
+            pass
+
+    print(f"{'cities':>8} {'load (s)':>10} {'run (s)':>10} {'us/city-year':>14}")
+    for n_cities in args.cities:
+        config = synthetic_city_config(generate_synthetic_config(), n_cities)
+        start = time.perf_counter()
+        registry = CityRegistry.from_config(config)
+        simulation = BangladeshUrbanDevelopmentSimulation(config, seed=0, city_index=registry)
+        loaded = time.perf_counter()
+        simulation.run_simulation(_NullRecorder(), years=args.years)
+        finished = time.perf_counter()
+        per_city_year = (finished - loaded) / (len(registry) * args.years) * 1e6
+        print(f"{len(registry):>8} {loaded - start:>10.3f} {finished - loaded:>10.3f} {per_city_year:>14.2f}")
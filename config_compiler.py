@@ -0,0 +1,280 @@
+import hashlib
+import json
+import math
+import numbers
+import os
+from collections.abc import Mapping
+from types import MappingProxyType
+
+import numpy as np
+
+from checkpoint import ArrayFile, write_array_file
+from city_registry import CityRegistry
+
+MAGIC = b'BDUSCCFG'
+VERSION = 1 # Part of every digest: bumping it invalidates all cached configs
+
+# Every input the models read: 'per_city' is {city: number}, 'nested' is
+# {city: {category: number}} and 'names' is a list of city names
+SCHEMA = {
+    'urban_growth': {'initial_population': 'per_city', 'annual_growth_rate': 'per_city',
+                     'land_use': 'nested', 'peri_urban_areas': 'names'},
+    'housing': {'initial_housing_stock': 'nested', 'avg_house_price': 'per_city',
+                'avg_rent': 'per_city', 'affordability_ratio': 'per_city'},
+    'infrastructure': {'water_coverage': 'per_city', 'sanitation_coverage': 'per_city',
+                       'power_reliability': 'per_city', 'waste_collection': 'per_city',
+                       'internet_penetration': 'per_city'},
+    'transport': {'modal_split': 'nested', 'avg_commute_time': 'per_city', 'road_density': 'per_city',
+                  'public_transit_coverage': 'per_city'},
+    'economy': {'gdp_per_capita': 'per_city', 'unemployment_rate': 'per_city',
+                'sectoral_employment': 'nested', 'informal_economy_share': 'per_city'},
+    'governance': {'municipal_own_revenue': 'per_city', 'citizen_satisfaction': 'per_city',
+                   'planning_compliance': 'per_city'},
+    'environment': {'air_quality_index': 'per_city', 'green_space_ratio': 'per_city',
+                    'flood_prone_area': 'per_city', 'waste_recycling_rate': 'per_city'},
+    'social': {'literacy_rate': 'per_city', 'access_to_healthcare': 'per_city',
+               'social_cohesion_index': 'per_city', 'crime_rate': 'per_city'},
+    'urban_rural': {'remittance_dependency': 'per_city', 'rural_migration_rate': 'per_city',
+                    'commuter_percentage': 'per_city'},
+    'service_delivery': {'school_density': 'per_city', 'hospital_beds_per_1000': 'per_city',
+                         'public_space_per_capita': 'per_city'},
+    'smart_city': {'digital_literacy': 'per_city', 'smart_service_adoption': 'per_city',
+                   'iot_sensor_density': 'per_city'},
+    'resilience': {'early_warning_coverage': 'per_city', 'building_code_compliance': 'per_city',
+                   'disaster_recovery_speed': 'per_city'},
+    # Age-sex schedules of the cohort projection (see demography.py)
+    'demography': {'age_structure': 'nested', 'fertility': 'nested', 'mortality': 'nested',
+                   'migration_profile': 'nested'},
+}
+# Sections a config may leave out; the models then run without the feature they configure
+OPTIONAL_SECTIONS = {'demography'}
+
+def _is_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def validate_config(config):
+    """Checks a raw config against SCHEMA; raises ValueError listing every problem found."""
+    problems = []
+    for section in config:
+        if section not in SCHEMA:
+            problems.append(f"unknown section '{section}'")
+    for section, indicators in SCHEMA.items():
+        entries = config.get(section)
+        if entries is None and section in OPTIONAL_SECTIONS:
+            continue
+        if not isinstance(entries, Mapping):
+            problems.append(f"missing section '{section}'")
+            continue
+        for indicator in entries:
+            if indicator not in indicators:
+                problems.append(f"unknown indicator '{section}.{indicator}'")
+        for indicator, kind in indicators.items():
+            key = f"{section}.{indicator}"
+            values = entries.get(indicator)
+            if values is None:
+                problems.append(f"missing indicator '{key}'")
+            elif kind == 'names':
+                if isinstance(values, (str, Mapping)) or not all(isinstance(name, str) for name in values):
+                    problems.append(f"'{key}' must be a list of city names")
+            elif not isinstance(values, Mapping):
+                problems.append(f"'{key}' must map cities to values")
+            else:
+                for city, value in values.items():
+                    if kind == 'nested':
+                        if not isinstance(value, Mapping):
+                            problems.append(f"'{key}' for {city} must map categories to numbers")
+                        elif not all(_is_number(share) for share in value.values()):
+                            problems.append(f"'{key}' for {city} has a non-numeric category value")
+                    elif not _is_number(value):
+                        problems.append(f"'{key}' for {city} is not a finite number: {value!r}")
+    if problems:
+        raise ValueError("Invalid configuration:\n  " + "\n  ".join(problems))
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot hash config value {value!r}")
+
+
+def config_digest(config, names=()):
+    """Content hash of a raw config (and of any explicit city order) under this compiler version."""
+    payload = json.dumps({'version': VERSION, 'names': list(names), 'config': config},
+                         sort_keys=True, separators=(',', ':'), default=_json_default)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def default_cache_dir():
+    """$BD_URBAN_SIM_CACHE, else bd_urban_sim under the user cache directory."""
+    if os.environ.get('BD_URBAN_SIM_CACHE'):
+        return os.environ['BD_URBAN_SIM_CACHE']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'bd_urban_sim')
+
+
+class ParameterTable(Mapping):
+    """Frozen, array-backed {city: value} (or {city: {category: value}}) parameter table.
+
+    `values` has shape (cities,) or (cities, categories) over `index`, and `mask` marks the
+    cells the source config provided. Both are read-only, typically memory-mapped from the
+    compiled config file. The Mapping interface returns plain numbers (and fresh dicts for
+    nested tables) so existing dict-walking code keeps working; StateTable.load and dense()
+    take the arrays directly when the indices match.
+    """
+    def __init__(self, index, values, mask, categories=None, integer=False):
+        self.index = index
+        self.values = values
+        self.mask = mask
+        self.categories = tuple(categories) if categories is not None else None
+        self.integer = integer
+        self._covered = mask if self.categories is None else mask.any(axis=1)
+
+    def _cast(self, value):
+        return int(value) if self.integer else float(value)
+
+    def covered(self):
+        return self._covered
+
+    def __getitem__(self, city):
+        pos = self.index.positions.get(city)
+        if pos is None or not self._covered[pos]:
+            raise KeyError(city)
+        if self.categories is None:
+            return self._cast(self.values[pos])
+        return {category: self._cast(self.values[pos, i])
+                for i, category in enumerate(self.categories) if self.mask[pos, i]}
+
+    def __iter__(self):
+        names = self.index.names
+        return (names[pos] for pos in np.flatnonzero(self._covered))
+
+    def __len__(self):
+        return int(self._covered.sum())
+
+    def __repr__(self):
+        return f"ParameterTable({dict(self)!r})"
+
+    def dense(self, default):
+        """Per-city array with `default` wherever the config has no value."""
+        if self.categories is not None:
+            raise TypeError("dense() needs a flat table; select a category first")
+        return np.where(self.mask, self.values, default)
+
+    def category(self, category):
+        """Flat table of one category of a nested table."""
+        i = self.categories.index(category)
+        return ParameterTable(self.index, self.values[:, i], self.mask[:, i], integer=self.integer)
+
+
+class CompiledConfig(Mapping):
+    """Validated, immutable configuration: {section: read-only {indicator: ParameterTable or tuple}}.
+
+    `registry` is the CityRegistry every table is indexed by, `digest` the content hash
+    of the source config and `path` the cache file backing the arrays. Pickling sends
+    only the path, so worker processes memory-map the same file instead of receiving
+    (and rebuilding) the dicts.
+    """
+    def __init__(self, sections, registry, digest, path):
+        self._sections = {name: MappingProxyType(entries) for name, entries in sections.items()}
+        self.registry = registry
+        self.digest = digest
+        self.path = path
+
+    def __getitem__(self, section):
+        return self._sections[section]
+
+    def __iter__(self):
+        return iter(self._sections)
+
+    def __len__(self):
+        return len(self._sections)
+
+    def __repr__(self):
+        return f"CompiledConfig({self.digest[:12]}, {len(self.registry)} cities, {self.path!r})"
+
+    def __reduce__(self):
+        return (load_compiled, (self.path,))
+
+
+def _write_compiled(config, names, digest, path):
+    registry = CityRegistry.from_config(config, names)
+    sections = {}
+    arrays = {}
+    for section, indicators in SCHEMA.items():
+        if section not in config and section in OPTIONAL_SECTIONS:
+            continue
+        sections[section] = {}
+        for indicator, kind in indicators.items():
+            values = config[section][indicator]
+            if kind == 'names':
+                sections[section][indicator] = {'kind': kind, 'names': list(values)}
+                continue
+            positions = [registry.position(city) for city in values]
+            rows = list(values.values())
+            if kind == 'nested':
+                categories = list(dict.fromkeys(category for row in rows for category in row))
+                data = np.zeros((len(registry), len(categories)))
+                mask = np.zeros(data.shape, dtype=bool)
+                for pos, row in zip(positions, rows):
+                    for i, category in enumerate(categories):
+                        if category in row:
+                            data[pos, i] = row[category]
+                            mask[pos, i] = True
+                scalars = [value for row in rows for value in row.values()]
+            else:
+                categories = None
+                data = np.zeros(len(registry))
+                mask = np.zeros(len(registry), dtype=bool)
+                data[positions] = rows
+                mask[positions] = True
+                scalars = rows
+            sections[section][indicator] = {'kind': kind, 'categories': categories,
+                                            'integer': all(isinstance(value, numbers.Integral) for value in scalars)}
+            arrays[f"{section}/{indicator}/values"] = data
+            arrays[f"{section}/{indicator}/mask"] = mask
+    # Written under a temporary name and renamed, so concurrent compiles never see a partial file
+    temporary = f"{path}.{os.getpid()}.tmp"
+    write_array_file(temporary, MAGIC, {'version': VERSION, 'digest': digest, 'cities': list(registry.names),
+                                        'sections': sections}, arrays)
+    os.replace(temporary, path)
+
+
+def load_compiled(path, mmap=True):
+    """Opens a compiled config file; its arrays stay memory-mapped and read-only."""
+    source = ArrayFile(path, MAGIC, mmap=mmap)
+    header = source.header
+    if header['version'] != VERSION:
+        raise ValueError(f"Unsupported compiled config version {header['version']}")
+    registry = CityRegistry(header['cities'])
+    sections = {}
+    for section, indicators in header['sections'].items():
+        sections[section] = {}
+        for indicator, spec in indicators.items():
+            if spec['kind'] == 'names':
+                sections[section][indicator] = tuple(spec['names'])
+                continue
+            table = ParameterTable(registry, source.array(f"{section}/{indicator}/values"),
+                                   source.array(f"{section}/{indicator}/mask"), spec['categories'], spec['integer'])
+            sections[section][indicator] = table
+            registry.coverage[(section, indicator)] = table.covered()
+    return CompiledConfig(sections, registry, header['digest'], path)
+
+
+def compile_config(config, cache_dir=None, names=()):
+    """Validates `config` and returns its CompiledConfig, reusing the on-disk cache when possible.
+
+    The cache file is keyed by the config's content hash, so an unchanged config is
+    compiled once and then only memory-mapped. `names` fixes the city order (as with
+    CityRegistry.from_config); an already compiled config is returned unchanged.
+    """
+    if isinstance(config, CompiledConfig):
+        return config
+    digest = config_digest(config, names)
+    cache_dir = cache_dir or default_cache_dir()
+    path = os.path.join(cache_dir, f"config-{digest}.bin")
+    if not os.path.exists(path):
+        validate_config(config)
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_compiled(config, names, digest, path)
+    return load_compiled(path)
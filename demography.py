@@ -0,0 +1,180 @@
+import argparse
+
+import numpy as np
+
+# Five-year age groups and the (sex, age group) cohorts the projection tracks, e.g. 'f20-24'
+AGE_GROUPS = ('0-4', '5-9', '10-14', '15-19', '20-24', '25-29', '30-34', '35-39', '40-44',
+              '45-49', '50-54', '55-59', '60-64', '65+')
+SEXES = ('f', 'm')
+COHORTS = tuple(sex + age for sex in SEXES for age in AGE_GROUPS)
+FERTILE_AGES = AGE_GROUPS[3:10] # 15-19 .. 45-49
+
+# Share of each age group counted as working age (15-64) and school age (5-16: all of 5-9
+# and 10-14, and the 15- and 16-year-olds of 15-19)
+WORKING_AGE = {age: 1.0 for age in AGE_GROUPS[3:13]}
+SCHOOL_AGE = {'5-9': 1.0, '10-14': 1.0, '15-19': 0.4}
+
+# Extra state columns of a growth model that projects cohorts (published as 'demography')
+DEMOGRAPHY_COLUMNS = ('working_age', 'school_age', 'working_age_growth', 'school_age_growth')
+
+FEMALE_SHARE_AT_BIRTH = 1 / 2.05 # 105 boys per 100 girls
+
+# Placeholder schedules for cities the config has none for (roughly urban Bangladesh):
+# population shares by cohort, births per woman per year by age group (TFR about 2.1),
+# yearly death probabilities by cohort, and how net migrants are spread over cohorts
+_AGE_SHARES = (8.5, 8.5, 9, 9.5, 10.5, 10, 9, 8, 6.5, 5.5, 4.5, 3.5, 3, 4)
+_DEATH_RATES = (0.006, 0.0005, 0.0005, 0.0008, 0.001, 0.0012, 0.0015, 0.002, 0.003, 0.0045,
+                0.007, 0.011, 0.017, 0.05)
+_MIGRANT_SHARES = (0.08, 0.06, 0.06, 0.14, 0.22, 0.18, 0.1, 0.06, 0.04, 0.02, 0.015, 0.01, 0.005, 0.01)
+DEFAULT_AGE_STRUCTURE = {sex + age: share * weight for sex, weight in (('f', 0.48), ('m', 0.52))
+                         for age, share in zip(AGE_GROUPS, _AGE_SHARES)}
+DEFAULT_FERTILITY = dict(zip(FERTILE_AGES, (0.083, 0.14, 0.1, 0.06, 0.025, 0.008, 0.002)))
+DEFAULT_MORTALITY = {sex + age: rate * factor for sex, factor in (('f', 1.0), ('m', 1.15))
+                     for age, rate in zip(AGE_GROUPS, _DEATH_RATES)}
+DEFAULT_MIGRATION_PROFILE = {sex + age: share * weight for sex, weight in (('f', 0.45), ('m', 0.55))
+                             for age, share in zip(AGE_GROUPS, _MIGRANT_SHARES)}
+
+def _schedule(table, index, categories, default):
+    """(city, category) array of a nested config table; cities or categories it lacks take `default`."""
+    result = np.tile(np.array([default[category] for category in categories], dtype=float), (len(index), 1))
+    if getattr(table, 'categories', None) is not None and index.same_as(getattr(table, 'index', None)):
+        # Compiled ParameterTable: copy whole category columns
+        for j, category in enumerate(categories):
+            if category in table.categories:
+                i = table.categories.index(category)
+                np.copyto(result[:, j], table.values[:, i], where=table.mask[:, i])
+        return result
+    for city, row in table.items():
+        if city in index:
+            for j, category in enumerate(categories):
+                if category in row:
+                    result[index.position(city), j] = row[category]
+    return result
+
+
+def _normalised(shares):
+    total = shares.sum(axis=-1, keepdims=True)
+    return np.divide(shares, total, out=np.zeros_like(shares), where=total > 0)
+
+
+def synthetic_demography(config):
+    """A 'demography' config section giving every city with a population the default schedules.
+
+    The largest cities get the lower fertility of the metropolitan areas; like the rest of
+    the synthetic configuration, the numbers are placeholders.
+    """
+    fertility_factor = {'Dhaka': 0.9, 'Chattogram': 0.95}
+    cities = list(config['urban_growth']['initial_population'])
+    return {
+        'age_structure': {city: dict(DEFAULT_AGE_STRUCTURE) for city in cities},
+        'fertility': {city: {age: rate * fertility_factor.get(city, 1.0) for age, rate in DEFAULT_FERTILITY.items()}
+                      for city in cities},
+        'mortality': {city: dict(DEFAULT_MORTALITY) for city in cities},
+        'migration_profile': {city: dict(DEFAULT_MIGRATION_PROFILE) for city in cities},
+    }
+
+
+class CohortProjection:
+    """Yearly cohort-component projection of every city's age-sex structure as one batched product.
+
+    Each city gets a (cohort, cohort + 3) projection matrix, so a year for all replicates of
+    a block of cities is a single `matmul` of their (replicate, cohort) rows:
+      - survivors: cohort c keeps (1 - mortality) of its members, a fifth of whom move up
+        to the next age group (uniform ages within five-year groups; 65+ is open-ended);
+      - column `births`: live births from the start-of-year women (fertility schedule);
+      - columns `working` and `school`: the working-age and school-age survivors, folded
+        into the matrix so these totals cost no extra pass over the cohorts.
+    Net migrants, `migration_rate` of the population, are then spread by the migration
+    profile and births are split by sex into the 0-4 cohorts. Cities are projected in
+    blocks of about `block_rows` (replicate, city) rows, bounding the temporaries.
+    """
+    def __init__(self, section, index, block_rows=65536):
+        self.index = index
+        self.block_rows = block_rows
+        cohorts = len(COHORTS)
+        self.age_structure = _normalised(_schedule(section['age_structure'], index, COHORTS, DEFAULT_AGE_STRUCTURE))
+        self.migration_profile = _normalised(_schedule(section['migration_profile'], index, COHORTS,
+                                                       DEFAULT_MIGRATION_PROFILE))
+        survival = 1 - np.clip(_schedule(section['mortality'], index, COHORTS, DEFAULT_MORTALITY), 0, 1)
+        fertility = _schedule(section['fertility'], index, FERTILE_AGES, DEFAULT_FERTILITY)
+
+        # (cohort, summary) weights of the working-age and school-age totals
+        self.weights = np.array([[WORKING_AGE.get(cohort[1:], 0.0), SCHOOL_AGE.get(cohort[1:], 0.0)]
+                                 for cohort in COHORTS])
+        matrix = np.zeros((len(index), cohorts, cohorts + 3))
+        last = len(AGE_GROUPS) - 1
+        for c in range(cohorts):
+            if c % len(AGE_GROUPS) == last:
+                matrix[:, c, c] = survival[:, c]
+            else:
+                matrix[:, c, c] = survival[:, c] * 0.8
+                matrix[:, c, c + 1] = survival[:, c] * 0.2
+        for j, age in enumerate(FERTILE_AGES):
+            matrix[:, COHORTS.index('f' + age), cohorts] = fertility[:, j]
+        matrix[:, :, cohorts + 1:] = matrix[:, :, :cohorts] @ self.weights
+        self.matrix = matrix
+        self.migrant_weights = self.migration_profile @ self.weights # Summaries of one migrant
+        self._newborn = (COHORTS.index('f0-4'), COHORTS.index('m0-4'))
+
+    def initial(self, population):
+        """(replicate, city, cohort) counts that split `population` by each city's age structure."""
+        return population[..., None] * self.age_structure
+
+    def summaries(self, cohorts):
+        """Working-age and school-age totals of (replicate, city, cohort) counts."""
+        totals = cohorts @ self.weights
+        return totals[..., 0], totals[..., 1]
+
+    def advance(self, cohorts, migration_rate, variation):
+        """Projects (replicate, city, cohort) counts one year ahead, in place.
+
+        `migration_rate` is per city; `variation` (replicate, city) scales births and net
+        migration. Returns the new (replicate, city) population, working-age and
+        school-age totals.
+        """
+        replicates, cities, n = cohorts.shape
+        population, working, school = (np.empty((replicates, cities)) for _ in range(3))
+        step = max(1, self.block_rows // replicates)
+        for lo in range(0, cities, step):
+            block = slice(lo, min(lo + step, cities))
+            current = cohorts[:, block]
+            # (city, replicate, cohort) @ (city, cohort, cohort + 3): one small GEMM per city
+            projected = np.matmul(current.transpose(1, 0, 2), self.matrix[block]).transpose(1, 0, 2)
+            migrants = current.sum(axis=-1) * migration_rate[block] * variation[:, block]
+            births = projected[..., n] * variation[:, block]
+            new = projected[..., :n]
+            new += migrants[..., None] * self.migration_profile[block]
+            new[..., self._newborn[0]] += births * FEMALE_SHARE_AT_BIRTH
+            new[..., self._newborn[1]] += births * (1 - FEMALE_SHARE_AT_BIRTH)
+            np.maximum(new, 0, out=new) # Emigration cannot take a cohort below zero
+            cohorts[:, block] = new
+            population[:, block] = new.sum(axis=-1)
+            working[:, block] = projected[..., n + 1] + migrants * self.migrant_weights[block, 0]
+            school[:, block] = projected[..., n + 2] + migrants * self.migrant_weights[block, 1]
+        return population, working, school
+
+
+if __name__ == "__main__":
+    import time
+
+    from state_store import CityIndex
+
+    parser = argparse.ArgumentParser(description="Time yearly cohort projections of a synthetic city ensemble.")
+    parser.add_argument('--cities', type=int, default=10000)
+    parser.add_argument('--replicates', type=int, default=100)
+    parser.add_argument('--years', type=int, default=3)
+    args = parser.parse_args()
+
+    index = CityIndex([f"City {i}" for i in range(args.cities)])
+    projection = CohortProjection({'age_structure': {}, 'fertility': {}, 'mortality': {}, 'migration_profile': {}}, index)
+    rng = np.random.default_rng(0)
+    cohorts = projection.initial(rng.uniform(1e4, 1e6, size=(args.replicates, args.cities)))
+    migration_rate = np.full(args.cities, 0.012)
+    print(f"{args.replicates} replicates x {args.cities} cities x {len(COHORTS)} cohorts "
+          f"({cohorts.nbytes / 2**20:.0f} MB)")
+    for year in range(args.years):
+        start = time.perf_counter()
+        population, working, school = projection.advance(cohorts, migration_rate,
+                                                         rng.normal(1, 0.05, size=(args.replicates, args.cities)))
+        print(f"year {year + 1}: {time.perf_counter() - start:.2f} s, mean population {population.mean():,.0f}, "
+              f"working age {working.sum() / population.sum():.1%}, school age {school.sum() / population.sum():.1%}")
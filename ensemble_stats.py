@@ -0,0 +1,275 @@
+import argparse
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from results_store import INDICATORS, RECORDED_GROUPS, ResultsStore
+
+class EnsembleStats:
+    """Running per-(year, city, indicator) ensemble statistics whose memory does not grow with replicates.
+
+    Moments use Welford's algorithm in its batched (Chan et al.) form, so a whole replicate
+    axis is folded in per update. Quantiles come from a log-bucketed sketch in the style
+    of DDSketch: a value x > 0 falls in bucket ceil(log_gamma(x)) with
+    gamma = (1 + a) / (1 - a), so any quantile is returned within relative error `a`.
+    Each cell keeps `bins` consecutive buckets anchored on the first values it sees; the
+    window slides when later values fall outside it. Only when a cell's values span more
+    than `bins` buckets (a factor gamma ** bins) are its lowest buckets collapsed into the
+    first one, as DDSketch does: quantiles falling there are overestimated, the others keep
+    their accuracy. Values <= 0 are counted as zero (every recorded indicator is non-negative). Two aggregates built
+    from disjoint replicates, e.g. in different worker processes, combine with `merge`.
+    """
+    QUANTILES = (0.05, 0.5, 0.95)
+
+    def __init__(self, cities, columns, relative_accuracy=0.02, bins=64, capacity=16):
+        self.cities = tuple(cities)
+        self.columns = dict(columns)
+        self.relative_accuracy = relative_accuracy
+        self.bins = bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._slots = {} # year -> slot
+        shape = (capacity, len(self.cities), len(self.columns))
+        self._count = np.zeros(shape, dtype=np.int64)
+        self._mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)
+        self._zeros = np.zeros(shape, dtype=np.int64)
+        self._offset = np.zeros(shape, dtype=np.int64) # Bucket key of each cell's first bin
+        self._sketch = np.zeros(shape + (bins,), dtype=np.int64)
+
+    @classmethod
+    def for_simulation(cls, simulation, indicators=INDICATORS, groups=RECORDED_GROUPS, **options):
+        """Statistics over the same columns a ResultsStore records for `simulation`."""
+        layout = ResultsStore(simulation, indicators, groups, capacity=1)
+        return cls(layout.cities, layout.columns, **options)
+
+    def recorder(self, simulation, indicators=INDICATORS, groups=RECORDED_GROUPS):
+        """Recorder to pass to `run_simulation`: updates the statistics without keeping trajectories."""
+        return EnsembleRecorder(self, simulation, indicators, groups)
+
+    # --- Storage ---
+    @property
+    def years(self):
+        return sorted(self._slots)
+
+    def _slot(self, year):
+        slot = self._slots.get(year)
+        if slot is None:
+            slot = len(self._slots)
+            if slot == len(self._count):
+                for name in ('_count', '_mean', '_m2', '_zeros', '_offset', '_sketch'):
+                    array = getattr(self, name)
+                    grown = np.zeros((2 * len(array),) + array.shape[1:], dtype=array.dtype)
+                    grown[:len(array)] = array
+                    setattr(self, name, grown)
+            self._slots[year] = slot
+        return slot
+
+    def _keys(self, values):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.ceil(np.log(values) / self._log_gamma)
+
+    # --- Updating ---
+    def update(self, year, values, mask=None):
+        """Folds one year of (replicate, city, column) values in; `mask` (city, column) marks covered cells."""
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 2:
+            values = values[None]
+        valid = np.isfinite(values)
+        if mask is not None:
+            valid &= mask
+        slot = self._slot(year)
+
+        # Moments: Welford/Chan merge of the batch into the running (count, mean, M2)
+        n_b = valid.sum(axis=0)
+        sums = np.where(valid, values, 0.0).sum(axis=0)
+        mean_b = np.divide(sums, n_b, out=np.zeros(n_b.shape), where=n_b > 0)
+        m2_b = np.where(valid, (values - mean_b) ** 2, 0.0).sum(axis=0)
+        self._combine(slot, n_b, mean_b, m2_b)
+
+        # Sketch: new cells are anchored so that the batch median key sits mid-window
+        positive = valid & (values > 0)
+        keys = self._keys(np.where(positive, values, np.nan))
+        new = ~self._sketch[slot].any(axis=-1) & positive.any(axis=0)
+        if new.any():
+            with np.errstate(all='ignore'):
+                centre = np.nanmedian(np.where(positive, keys, np.nan)[:, new], axis=0)
+            self._offset[slot][new] = centre.astype(np.int64) - self.bins // 2
+        self._zeros[slot] += (valid & ~positive).sum(axis=0)
+        batch = np.where(positive, keys, np.nan)
+        self._reanchor(slot, np.fmin.reduce(batch, axis=0), np.fmax.reduce(batch, axis=0))
+        index = np.clip(keys - self._offset[slot], 0, self.bins - 1)
+        self._add_to_sketch(slot, index[positive].astype(np.int64), np.nonzero(positive)[1:], None)
+        self._count[slot] += n_b
+
+    def _key_range(self, sketch, offset):
+        """First and last occupied bucket key of every cell (NaN for cells without buckets)."""
+        filled = sketch.any(axis=-1)
+        first = offset + np.argmax(sketch > 0, axis=-1)
+        last = offset + self.bins - 1 - np.argmax(sketch[..., ::-1] > 0, axis=-1)
+        return np.where(filled, first, np.nan), np.where(filled, last, np.nan)
+
+    def _reanchor(self, slot, lo, hi):
+        """Slides each cell's window to also cover bucket keys lo..hi (NaN: nothing to add).
+
+        The window moves as little as needed; if the cell's keys then span more than
+        `bins` buckets it keeps the highest ones, folding the lowest into its first bucket.
+        """
+        sketch, offset = self._sketch[slot], self._offset[slot]
+        first, last = self._key_range(sketch, offset)
+        lo, hi = np.fmin(lo, first), np.fmax(hi, last)
+        with np.errstate(invalid='ignore'):
+            moving = np.isfinite(hi) & ((lo < offset) | (hi > offset + self.bins - 1))
+        if not moving.any():
+            return
+        lo, hi, old = lo[moving], hi[moving], offset[moving]
+        fits = hi - lo < self.bins
+        top = hi - self.bins + 1 # Lowest anchor that still covers hi
+        anchor = np.where(fits, np.minimum(np.maximum(old, top), lo), top).astype(np.int64)
+        block = sketch[moving]
+        target = np.clip(np.arange(self.bins) - (anchor - old)[:, None], 0, self.bins - 1)
+        shifted = np.zeros_like(block)
+        np.add.at(shifted, (np.arange(len(block))[:, None], target), block)
+        sketch[moving] = shifted
+        offset[moving] = anchor
+
+    def _combine(self, slot, n_b, mean_b, m2_b):
+        n_a = self._count[slot]
+        n = n_a + n_b
+        delta = mean_b - self._mean[slot]
+        ratio = np.divide(n_b, n, out=np.zeros(n.shape), where=n > 0)
+        self._mean[slot] += delta * ratio
+        self._m2[slot] += m2_b + delta ** 2 * n_a * ratio
+
+    def _add_to_sketch(self, slot, bins, cells, weights):
+        cities, columns = cells
+        flat = (cities * len(self.columns) + columns) * self.bins + bins
+        counts = np.bincount(flat, weights=weights, minlength=self._sketch[slot].size)
+        self._sketch[slot] += counts.reshape(self._sketch[slot].shape).astype(np.int64)
+
+    def merge(self, other):
+        """Adds another aggregate over the same cities and columns (built from other replicates)."""
+        if other.cities != self.cities or other.columns != self.columns or other.bins != self.bins \
+                or other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only statistics over the same cities, columns and sketch parameters can be merged")
+        for year, other_slot in other._slots.items():
+            slot = self._slot(year)
+            n_b = other._count[other_slot]
+            fresh = ~self._sketch[slot].any(axis=-1) # Cells without buckets yet adopt the other side's anchor
+            self._offset[slot][fresh] = other._offset[other_slot][fresh]
+            self._reanchor(slot, *other._key_range(other._sketch[other_slot], other._offset[other_slot]))
+            shift = other._offset[other_slot] - self._offset[slot]
+            cities, columns, bins = np.nonzero(other._sketch[other_slot])
+            target = np.clip(bins + shift[cities, columns], 0, self.bins - 1)
+            self._add_to_sketch(slot, target, (cities, columns), other._sketch[other_slot][cities, columns, bins])
+            self._zeros[slot] += other._zeros[other_slot]
+            self._combine(slot, n_b, other._mean[other_slot], other._m2[other_slot])
+            self._count[slot] += n_b
+        return self
+
+    # --- Queries: (year, city) arrays over `years`, NaN where a cell has no values ---
+    def _select(self, array, key):
+        slots = [self._slots[year] for year in self.years]
+        return array[:, :, self.columns[key]][slots]
+
+    def count(self, key):
+        return self._select(self._count, key)
+
+    def mean(self, key):
+        count = self.count(key)
+        return np.where(count > 0, self._select(self._mean, key), np.nan)
+
+    def variance(self, key, ddof=1):
+        count = self.count(key)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(count > ddof, self._select(self._m2, key) / (count - ddof), np.nan)
+
+    def std(self, key, ddof=1):
+        return np.sqrt(self.variance(key, ddof))
+
+    def quantile(self, key, q):
+        """Sketch estimate of the q-quantile (0 <= q <= 1), within `relative_accuracy` of the true value.
+
+        Holds unless the quantile lies in a cell's collapsed lowest bucket (see the class notes).
+        """
+        count = self.count(key)
+        zeros = self._select(self._zeros, key)
+        sketch = self._select(self._sketch, key)
+        rank = q * (count - 1)
+        cumulative = np.cumsum(sketch, axis=-1)
+        # First bucket whose cumulative count passes the rank (ranks within the zero count are 0)
+        bucket = np.argmax(cumulative > (rank - zeros)[..., None], axis=-1)
+        keys = self._select(self._offset, key) + bucket
+        value = 2 * self.gamma ** keys / (self.gamma + 1)
+        value = np.where(rank < zeros, 0.0, value)
+        return np.where(count > 0, value, np.nan)
+
+    def summary(self, key, quantiles=QUANTILES):
+        """{'mean', 'std', 'q05', ...: (year, city) array} for one indicator."""
+        result = {'mean': self.mean(key), 'std': self.std(key)}
+        for q in quantiles:
+            result[f"q{round(q * 100):02d}"] = self.quantile(key, q)
+        return result
+
+
+class EnsembleRecorder:
+    """Feeds each recorded year of a simulation into an EnsembleStats and keeps nothing else"""
+    def __init__(self, stats, simulation, indicators, groups):
+        self.stats = stats
+        self.store = ResultsStore(simulation, indicators, groups, capacity=1)
+
+    def record_state(self, year):
+        self.store.record(year)
+        self.stats.update(year, self.store.values[0], self.store.mask[0])
+        self.store.clear()
+
+
+# --- Parallel ensembles: one partial aggregate per worker, merged in the parent ---
+def _run_stats_job(config, scenario, seed_sequence, years, replicates, options):
+    from main_simulation import BangladeshUrbanDevelopmentSimulation
+    simulation = BangladeshUrbanDevelopmentSimulation(config, seed=seed_sequence)
+    stats = EnsembleStats.for_simulation(simulation, **options)
+    simulation.run_simulation(stats.recorder(simulation), years=years, scenarios=scenario, replicates=replicates)
+    return stats
+
+
+def run_ensemble_stats(config, scenario=None, seeds=1, years=10, replicates=1, root_seed=0, max_workers=None, **options):
+    """Runs `seeds` jobs of `replicates` members each and merges their statistics.
+
+    Workers return only their partial aggregates, so nothing proportional to the total
+    replicate count is ever pickled or held in one place.
+    """
+    from config_compiler import compile_config
+    from scenario_runner import job_seed
+    from scenarios import BASELINE
+    scenario = scenario or BASELINE
+    config = compile_config(config)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_run_stats_job, config, scenario, job_seed(root_seed, scenario.name, k),
+                                   years, replicates, options) for k in range(seeds)]
+        stats = futures[0].result()
+        for future in futures[1:]:
+            stats.merge(future.result())
+    return stats
+
+
+if __name__ == "__main__":
+    from main_simulation import generate_synthetic_config
+
+    parser = argparse.ArgumentParser(description="Ensemble mean, spread and quantiles via mergeable running statistics.")
+    parser.add_argument('--seeds', type=int, default=4, help="Worker jobs")
+    parser.add_argument('--replicates', type=int, default=250, help="Ensemble members per job")
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    stats = run_ensemble_stats(generate_synthetic_config(), seeds=args.seeds, years=args.years,
+                               replicates=args.replicates, max_workers=args.workers)
+    dhaka = stats.cities.index('Dhaka')
+    print(f"AQI in Dhaka over {args.seeds * args.replicates} replicates:")
+    print(f"{'year':>6} {'mean':>8} {'std':>7} {'q05':>8} {'q50':>8} {'q95':>8}")
+    summary = stats.summary('aqi')
+    for i, year in enumerate(stats.years):
+        print(f"{year:>6} {summary['mean'][i, dhaka]:>8.1f} {summary['std'][i, dhaka]:>7.1f} "
+              f"{summary['q05'][i, dhaka]:>8.1f} {summary['q50'][i, dhaka]:>8.1f} {summary['q95'][i, dhaka]:>8.1f}")
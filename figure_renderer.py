@@ -0,0 +1,239 @@
+import argparse
+import collections
+import contextlib
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from results_store import INDICATORS
+
+# Bumping this re-renders every figure (change it whenever the drawing code changes)
+RENDER_VERSION = 1
+
+# One figure: a grid of panels, each a list of (label, bands) series over `years`. `bands` is a
+# (1, year) line or a (5, year) fan of the FAN_QUANTILES of an ensemble
+FigureJob = collections.namedtuple('FigureJob', 'filename title years panels columns size markers dpi')
+Panel = collections.namedtuple('Panel', 'title ylabel series')
+
+FAN_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+def _slug(name):
+    return ''.join(c if c.isalnum() else '_' for c in name).strip('_').lower()
+
+
+def _bands(results, key):
+    """(band, year, city) array: the fan quantiles over replicates for ensembles, the estimate otherwise.
+
+    Years a city has no data for are NaN, so they show as gaps.
+    """
+    covered = results.covered(key)
+    if results.replicates > 1:
+        bands = np.quantile(results.series(key), FAN_QUANTILES, axis=1)
+    else:
+        bands = results.estimates(key)[None]
+    return np.where(covered, bands, np.nan)
+
+
+# --- Chart sets built from a ResultsStore ---
+def overview_job(results, filename='key_indicators_plot.png'):
+    """The four-panel overview embedded in the HTML report (cities with data in the first year)."""
+    years = results.years
+    panels = []
+    for key, title, ylabel in (('population', f"Population Growth (2025-{years[-1]})", 'Population'),
+                               ('aqi', 'Air Quality Index (AQI)', 'AQI (Higher=Worse)'),
+                               ('affordability_ratio', 'Housing Affordability Ratio', 'Price-to-Income Ratio'),
+                               ('citizen_satisfaction', 'Citizen Satisfaction Index', 'Satisfaction (0-1)')):
+        covered = results.covered(key)
+        trends = np.where(covered, results.estimates(key), 0) # Years without data plot as 0
+        panels.append(Panel(title, ylabel, [(results.cities[pos], trends[None, :, pos])
+                                            for pos in np.flatnonzero(covered[0])]))
+    return FigureJob(filename, '', years, panels, 2, (12, 8), True, 100)
+
+
+def indicator_jobs(results, indicators=INDICATORS, per_figure=25, directory='figures'):
+    """Small multiples of each indicator: one panel per city with data, `per_figure` cities per figure."""
+    jobs = []
+    for key in indicators:
+        spec = INDICATORS[key]
+        bands = _bands(results, key)
+        positions = sorted(np.flatnonzero(results.covered(key).any(axis=0)), key=lambda pos: results.cities[pos])
+        for page, first in enumerate(range(0, len(positions), per_figure), start=1):
+            panels = [Panel(results.cities[pos], '', [('', bands[:, :, pos])])
+                      for pos in positions[first:first + per_figure]]
+            jobs.append(FigureJob(os.path.join(directory, f"indicator_{key}_{page}.png"), f"{spec.label} ({page})",
+                                  results.years, panels, 5, (15, 2.4 * -(-len(panels) // 5) + 0.6), False, 80))
+    return jobs
+
+
+def city_jobs(results, indicators=INDICATORS, directory='figures'):
+    """One figure per city with a panel (a fan chart for ensembles) for every indicator it has data for."""
+    bands = {key: _bands(results, key) for key in indicators}
+    covered = {key: results.covered(key).any(axis=0) for key in indicators}
+    jobs = []
+    for pos, city in enumerate(results.cities):
+        panels = [Panel(INDICATORS[key].label, '', [('', bands[key][:, :, pos])])
+                  for key in indicators if covered[key][pos]]
+        if panels:
+            jobs.append(FigureJob(os.path.join(directory, f"city_{_slug(city)}.png"), city, results.years,
+                                  panels, 5, (15, 2.4 * -(-len(panels) // 5) + 0.6), False, 80))
+    return jobs
+
+
+def chart_set(results, indicators=INDICATORS):
+    """The overview, every indicator's small multiples and every city's (fan) charts."""
+    return [overview_job(results)] + indicator_jobs(results, indicators) + city_jobs(results, indicators)
+
+
+# --- Drawing (runs in the worker processes) ---
+def _draw(job, path):
+    # The object-oriented API renders on the Agg canvas directly: no pyplot state, no GUI backend
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=job.size)
+    rows = -(-len(job.panels) // job.columns)
+    # Small multiples share the year axis, so only the bottom row labels it
+    axes = fig.subplots(rows, job.columns, squeeze=False, sharex=not job.markers).ravel()
+    for ax, panel in zip(axes, job.panels):
+        for label, bands in panel.series:
+            if len(bands) == len(FAN_QUANTILES):
+                ax.fill_between(job.years, bands[0], bands[4], alpha=0.2, color='tab:blue', linewidth=0)
+                ax.fill_between(job.years, bands[1], bands[3], alpha=0.4, color='tab:blue', linewidth=0)
+                ax.plot(job.years, bands[2], color='tab:blue')
+            elif job.markers:
+                ax.plot(job.years, bands[0], marker='o', linestyle='-', label=label)
+            else:
+                ax.plot(job.years, bands[0], color='tab:blue')
+        ax.grid(True)
+        if job.markers:
+            ax.set_title(panel.title)
+            ax.set_xlabel('Year')
+            ax.set_ylabel(panel.ylabel)
+            if len(panel.series) <= 20: # A legend of hundreds of cities would swamp the plot
+                ax.legend(fontsize='small')
+        else:
+            ax.set_title(panel.title, fontsize='small')
+            ax.locator_params(nbins=4)
+            ax.locator_params(axis='x', integer=True) # Whole years
+            ax.tick_params(labelsize='x-small')
+    for i in range(len(job.panels), len(axes)):
+        axes[i].set_visible(False)
+        if i >= job.columns:
+            axes[i - job.columns].tick_params(labelbottom=True) # Now the bottom panel of its column
+    if job.markers:
+        fig.tight_layout()
+    else:
+        # Fixed margins: tight_layout would measure every tick label of every panel first
+        width, height = job.size
+        fig.subplots_adjust(left=0.6 / width, right=1 - 0.2 / width, bottom=0.4 / height,
+                            top=1 - 0.6 / height, wspace=0.35, hspace=0.5)
+        fig.suptitle(job.title)
+    fig.savefig(path, dpi=job.dpi)
+
+
+def _render_batch(jobs, output_dir):
+    for job in jobs:
+        _draw(job, os.path.join(output_dir, job.filename))
+    return len(jobs)
+
+
+class FigureRenderer:
+    """Renders FigureJobs into `output_dir`, in a process pool, skipping figures whose input is unchanged.
+
+    Every job is hashed over everything its figure depends on (data slice, layout, labels,
+    resolution and RENDER_VERSION); the hashes of the last render are kept in a manifest next to
+    the figures, and a figure whose hash matches and whose file exists is not drawn again.
+    A rerun with no changes therefore only hashes its inputs and never imports matplotlib.
+    Figures of the last render that are not in the new one are deleted if they lie in a
+    directory the new jobs write to; figures elsewhere (e.g. the full chart set under
+    figures/ when only the overview is redrawn) are left alone and stay in the manifest.
+    """
+    def __init__(self, output_dir, workers=None, manifest_name='.figures.json'):
+        self.output_dir = output_dir
+        self.workers = workers
+        self.manifest_path = os.path.join(output_dir, manifest_name)
+
+    def _load_manifest(self):
+        """Returns the last render's {filename: digest}, with no digests if RENDER_VERSION changed since."""
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        figures = manifest.get('figures', {})
+        return figures if manifest.get('version') == RENDER_VERSION else dict.fromkeys(figures)
+
+    def digest(self, job):
+        h = hashlib.sha1(json.dumps([RENDER_VERSION, job.filename, job.title, job.columns,
+                                     list(job.size), job.markers, job.dpi]).encode('utf-8'))
+        h.update(np.ascontiguousarray(job.years, dtype=np.int64).tobytes())
+        for panel in job.panels:
+            h.update(json.dumps([panel.title, panel.ylabel, [label for label, _ in panel.series]]).encode('utf-8'))
+            for _, bands in panel.series:
+                h.update(np.ascontiguousarray(bands, dtype=np.float64).tobytes())
+        return h.hexdigest()
+
+    def render(self, jobs):
+        """Draws the jobs whose inputs changed; returns {'figures', 'rendered', 'skipped', 'removed'}."""
+        manifest = self._load_manifest()
+        digests = {job.filename: self.digest(job) for job in jobs}
+        owned = {os.path.dirname(job.filename) for job in jobs}
+        kept = {filename: digest for filename, digest in manifest.items()
+                if filename not in digests and os.path.dirname(filename) not in owned}
+        removed = sorted(set(manifest) - set(digests) - set(kept))
+        for filename in removed:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.output_dir, filename))
+        for directory in sorted({os.path.dirname(filename) for filename in removed} - {''}, reverse=True):
+            with contextlib.suppress(OSError): # Kept while it still holds figures
+                os.rmdir(os.path.join(self.output_dir, directory))
+        stale = [job for job in jobs if manifest.get(job.filename) != digests[job.filename]
+                 or not os.path.exists(os.path.join(self.output_dir, job.filename))]
+        for directory in {os.path.dirname(job.filename) for job in stale}:
+            os.makedirs(os.path.join(self.output_dir, directory), exist_ok=True)
+
+        workers = self.workers if self.workers is not None else os.cpu_count() or 1
+        if workers <= 1 or len(stale) <= 2:
+            _render_batch(stale, self.output_dir)
+        else:
+            # A few batches per worker: few round trips, but still balanced when figure costs differ
+            size = -(-len(stale) // (4 * workers))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_render_batch, stale[i:i + size], self.output_dir)
+                           for i in range(0, len(stale), size)]
+                for future in futures:
+                    future.result()
+
+        if stale or set(manifest) != set(digests) | set(kept):
+            with open(self.manifest_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': RENDER_VERSION, 'figures': dict(kept, **digests)}, f)
+        return {'figures': len(jobs), 'rendered': len(stale), 'skipped': len(jobs) - len(stale),
+                'removed': len(removed)}
+
+
+if __name__ == "__main__":
+    import time
+
+    from city_registry import synthetic_city_config
+    from main_simulation import BangladeshUrbanDevelopmentSimulation, UrbanAnalysisEngine, generate_synthetic_config
+
+    parser = argparse.ArgumentParser(description="Render the full chart set of a run, then rerender it unchanged.")
+    parser.add_argument('output_dir')
+    parser.add_argument('--cities', type=int, default=500)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--replicates', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    config = generate_synthetic_config()
+    if args.cities > 10:
+        config = synthetic_city_config(config, args.cities)
+    simulation = BangladeshUrbanDevelopmentSimulation(config, seed=0)
+    engine = UrbanAnalysisEngine(simulation)
+    simulation.run_simulation(engine, years=args.years, replicates=args.replicates)
+    renderer = FigureRenderer(args.output_dir, workers=args.workers)
+    for attempt in ('first render', 'unchanged rerun'):
+        start = time.perf_counter()
+        stats = renderer.render(chart_set(engine.results))
+        print(f"{attempt}: {stats['rendered']} of {stats['figures']} figures drawn in {time.perf_counter() - start:.2f} s")
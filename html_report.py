@@ -0,0 +1,272 @@
+import hashlib
+import html
+import json
+import os
+from datetime import datetime
+from string import Template
+
+import numpy as np
+
+from results_store import INDICATORS, REPORTED_INDICATORS
+
+# Bumping this invalidates every cached fragment (change it whenever a template changes)
+TEMPLATE_VERSION = 1
+
+CSS = """
+<style>
+    body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 20px; line-height: 1.6;
+           background-color: #f9f9f9; color: #333; }
+    .container { max-width: 1000px; margin: auto; background-color: #fff; padding: 30px;
+                 box-shadow: 0 0 10px rgba(0,0,0,0.1); border-radius: 8px; }
+    h1, h2, h3 { color: #2c3e50; border-bottom: 1px solid #eee; padding-bottom: 5px; }
+    h1 { text-align: center; }
+    table { border-collapse: collapse; width: 100%; margin-bottom: 25px; font-size: 0.9em; }
+    th, td { border: 1px solid #ddd; padding: 10px; text-align: left; }
+    th { background-color: #3498db; color: white; text-align: center; }
+    tr:nth-child(even) { background-color: #f2f9fc; }
+    tr:hover { background-color: #eaf4fb; }
+    img { max-width: 100%; height: auto; margin-top: 20px; display: block; margin-left: auto; margin-right: auto;
+          border: 1px solid #ddd; padding: 5px; background-color: #fff; }
+    .summary-table td:nth-child(n+2) { text-align: right; } /* Align numbers right */
+    .percentage-positive { color: green; }
+    .percentage-negative { color: red; }
+    nav ul { columns: 3; }
+    .footer { margin-top: 30px; text-align: center; font-size: 0.8em; color: #777; }
+</style>
+"""
+
+PAGE = Template("""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>$title</title>
+    $css
+</head>
+<body>
+<div class="container">
+<h1>Bangladesh Urban Development Simulation Report</h1>
+$body
+<div class="footer">$footer</div>
+</div>
+</body>
+</html>
+""")
+
+INTRO = Template("""<p>This report summarizes the key outcomes of the urban development simulation for $n_cities cities in Bangladesh, running from $start_year to $final_year. Ensemble runs are summarised by their replicate mean.</p>
+""")
+
+NAVIGATION = Template("""<h2>Contents</h2>
+<nav>
+<h3>Cities</h3>
+<ul>$city_pages</ul>
+<h3>Indicators</h3>
+<ul>$indicator_pages</ul>
+</nav>
+""")
+
+NAV_ITEM = Template("""<li><a href="$href">$text</a></li>""")
+
+PLOT = Template("""<h2 style="margin-top: 40px;">Key Indicator Trends ($start_year-$final_year)</h2>
+$image
+""")
+
+CITY_PAGE_HEADER = Template("""<h2>Final State (Year $final_year) vs Initial State ($start_year): cities $first to $last</h2>
+<p><a href="$index">Back to contents</a>$pager</p>
+""")
+
+CITY_SECTION = Template("""<section id="$anchor">
+<h3>$city</h3>
+<table class="summary-table">
+<tr><th>Indicator</th><th>Initial ($start_year)</th><th>Final ($final_year)</th><th>% Change</th></tr>
+$rows</table>
+</section>
+""")
+
+CITY_ROW = Template("""<tr><td>$label</td><td>$initial</td><td>$final</td><td>$change</td></tr>
+""")
+
+INDICATOR_PAGE = Template("""<h2>$label: Initial ($start_year) vs Final ($final_year)</h2>
+<p><a href="$index">Back to contents</a></p>
+<table class="summary-table">
+<tr><th>City</th><th>Initial ($start_year)</th><th>Final ($final_year)</th><th>% Change</th></tr>
+$rows</table>
+""")
+
+INDICATOR_ROW = Template("""<tr><td><a href="$href">$city</a></td><td>$initial</td><td>$final</td><td>$change</td></tr>
+""")
+
+def _cells(initial, final, spec):
+    """(initial, final, % change) cell contents for one indicator of one city."""
+    if initial is None or final is None:
+        return (format(initial, spec.format) if initial is not None else "N/A",
+                format(final, spec.format) if final is not None else "N/A", "N/A")
+    change_class = ""
+    if initial != 0:
+        change = (final / initial) - 1
+        change_str = format(change, '.1%')
+        if change > 0:
+            change_class = "percentage-positive" if not spec.higher_is_worse else "percentage-negative"
+        elif change < 0:
+            change_class = "percentage-negative" if not spec.higher_is_worse else "percentage-positive"
+    else:
+        change_str = "Inf" if final > 0 else "0.0%"
+    change_html = f'<span class="{change_class}">{change_str}</span>' if change_class else change_str
+    return format(initial, spec.format), format(final, spec.format), change_html
+
+
+class ReportBuilder:
+    """Renders the HTML report from a ResultsStore as template fragments, reusing cached ones.
+
+    Every city is one fragment: its section (a row per indicator) plus its row in each
+    indicator's table. A fragment is keyed by a hash of exactly the data it shows (the
+    city's initial and final estimates and coverage, the years and the page it lives on),
+    and rendered fragments are kept in a JSON cache next to the report. Rebuilding after
+    a run in which only some cities changed therefore renders only those cities. City
+    sections are split into pages of `page_size` cities; the index links every city
+    page and one page per indicator. Pages are only rewritten when their content changed.
+    """
+    def __init__(self, output_dir, page_size=25, indicators=REPORTED_INDICATORS,
+                 index_name='simulation_report.html', cache_name='.report_cache.json'):
+        self.output_dir = output_dir
+        self.page_size = page_size
+        self.indicators = list(indicators)
+        self.index_name = index_name
+        self.cache_path = os.path.join(output_dir, cache_name)
+        self._cache = self._load_cache()
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return cache['fragments'] if cache.get('version') == TEMPLATE_VERSION else {}
+
+    def _save_cache(self):
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': TEMPLATE_VERSION, 'fragments': self._cache}, f)
+
+    def _page_name(self, page):
+        stem = os.path.splitext(self.index_name)[0]
+        return f"{stem}_cities_{page + 1}.html"
+
+    def _indicator_page_name(self, indicator):
+        stem = os.path.splitext(self.index_name)[0]
+        return f"{stem}_{indicator}.html"
+
+    def _write(self, name, content):
+        """Writes a page unless the file already holds exactly this content; returns True if written."""
+        path = os.path.join(self.output_dir, name)
+        try:
+            with open(path, encoding='utf-8') as f:
+                if f.read() == content:
+                    return False
+        except OSError:
+            pass
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return True
+
+    def _render_city(self, city, anchor, page, start_year, final_year, initial, final):
+        rows = {}
+        section_rows = []
+        for indicator, initial_value, final_value in zip(self.indicators, initial, final):
+            spec = INDICATORS[indicator]
+            initial_str, final_str, change = _cells(initial_value, final_value, spec)
+            section_rows.append(CITY_ROW.substitute(label=html.escape(spec.label), initial=initial_str,
+                                                    final=final_str, change=change))
+            rows[indicator] = INDICATOR_ROW.substitute(href=f"{page}#{anchor}", city=html.escape(city),
+                                                       initial=initial_str, final=final_str, change=change)
+        section = CITY_SECTION.substitute(anchor=anchor, city=html.escape(city), start_year=start_year,
+                                          final_year=final_year, rows=''.join(section_rows))
+        return {'section': section, 'rows': rows}
+
+    def build(self, results, plot_name='key_indicators_plot.png'):
+        """Renders (or reuses) every fragment and writes the pages; returns build statistics."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        years = results.years
+        start_year, final_year = int(years[0]), int(years[-1])
+        columns = [results.columns[indicator] for indicator in self.indicators]
+        # (initial/final, city, indicator) point estimates and coverage
+        estimates = np.stack([results.estimates(indicator)[[0, -1]] for indicator in self.indicators], axis=-1)
+        covered = results.mask[[0, -1]][:, :, columns]
+        positions = np.flatnonzero(results.covered('population')[-1])
+        order = sorted(positions, key=lambda pos: results.cities[pos])
+
+        fragments = {}
+        rendered = 0
+        for rank, pos in enumerate(order):
+            city = results.cities[pos]
+            anchor = f"city-{pos}"
+            page = self.index_name if rank < self.page_size else self._page_name(rank // self.page_size)
+            values = np.where(covered[:, pos], estimates[:, pos], np.nan)
+            key = hashlib.sha1(json.dumps([city, anchor, page, start_year, final_year, self.indicators]).encode('utf-8')
+                               + values.tobytes()).hexdigest()
+            fragment = self._cache.get(key)
+            if fragment is None:
+                initial, final = ([None if np.isnan(v) else float(v) for v in row] for row in values)
+                fragment = self._render_city(city, anchor, page, start_year, final_year, initial, final)
+                rendered += 1
+            fragments[key] = fragment
+
+        keys = list(fragments)
+        pages = [keys[i:i + self.page_size] for i in range(0, len(keys), self.page_size)] or [[]]
+        page_names = [self.index_name] + [self._page_name(p) for p in range(1, len(pages))]
+        cities_sorted = [results.cities[pos] for pos in order]
+        written = 0
+
+        def city_page(p):
+            first = cities_sorted[p * self.page_size] if cities_sorted else '-'
+            last = cities_sorted[min((p + 1) * self.page_size, len(cities_sorted)) - 1] if cities_sorted else '-'
+            links = []
+            if p > 0:
+                links.append(f' | <a href="{page_names[p - 1]}">Previous page</a>')
+            if p + 1 < len(pages):
+                links.append(f' | <a href="{page_names[p + 1]}">Next page</a>')
+            header = CITY_PAGE_HEADER.substitute(final_year=final_year, start_year=start_year,
+                                                 first=html.escape(first), last=html.escape(last),
+                                                 index=self.index_name, pager=''.join(links))
+            return header + ''.join(fragments[key]['section'] for key in pages[p]), first, last
+
+        for p in range(1, len(pages)):
+            body, _, _ = city_page(p)
+            written += self._write(page_names[p], PAGE.substitute(
+                title=f"Bangladesh Urban Simulation Report ({start_year}-{final_year}): cities page {p + 1}",
+                css=CSS, body=body, footer=f"Cities page {p + 1} of {len(pages)}"))
+        for indicator in self.indicators:
+            body = INDICATOR_PAGE.substitute(label=html.escape(INDICATORS[indicator].label), start_year=start_year,
+                                             final_year=final_year, index=self.index_name,
+                                             rows=''.join(fragments[key]['rows'][indicator] for key in keys))
+            written += self._write(self._indicator_page_name(indicator), PAGE.substitute(
+                title=f"{INDICATORS[indicator].label} ({start_year}-{final_year})", css=CSS, body=body,
+                footer="Bangladesh Urban Development Simulation"))
+
+        # The index: introduction, contents, plot and the first page of cities
+        city_links = []
+        for p in range(len(pages)):
+            _, first, last = city_page(p)
+            city_links.append(NAV_ITEM.substitute(href=page_names[p] if p else '#cities',
+                                                  text=html.escape(f"{first} - {last}")))
+        indicator_links = [NAV_ITEM.substitute(href=self._indicator_page_name(indicator),
+                                               text=html.escape(INDICATORS[indicator].label))
+                           for indicator in self.indicators]
+        if os.path.exists(os.path.join(self.output_dir, plot_name)):
+            image = f'<img src="{plot_name}" alt="Key Indicator Trends Plot">'
+        else:
+            image = f'<p>(Plot image not found: {plot_name})</p>'
+        first_page, _, _ = city_page(0)
+        body = (INTRO.substitute(n_cities=len(order), start_year=start_year, final_year=final_year)
+                + NAVIGATION.substitute(city_pages=''.join(city_links), indicator_pages=''.join(indicator_links))
+                + PLOT.substitute(start_year=start_year, final_year=final_year, image=image)
+                + f'<div id="cities">{first_page}</div>')
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        written += self._write(self.index_name, PAGE.substitute(
+            title=f"Bangladesh Urban Simulation Report ({start_year}-{final_year})", css=CSS, body=body,
+            footer=f"Report generated on: {timestamp}"))
+
+        reused = len(fragments) - rendered
+        if rendered or set(self._cache) != set(fragments):
+            self._cache = fragments # Fragments of cities no longer reported are dropped
+            self._save_cache()
+        return {'cities': len(order), 'rendered': rendered, 'reused': reused, 'pages': len(pages) + len(self.indicators),
+                'pages_written': written, 'path': os.path.join(self.output_dir, self.index_name)}
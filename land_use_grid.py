@@ -0,0 +1,267 @@
+import argparse
+import copy
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from state_store import group_categories
+
+# Approximate development-authority areas (km2) of the divisional cities; placeholders like the
+# rest of the synthetic configuration. At 100 m cells Dhaka's is about 153,000 cells; use finer
+# cells or a regional area (e.g. {'Dhaka': 20594}, the division) for millions of cells per city
+DIVISIONAL_CITY_AREAS_KM2 = {'Dhaka': 1528, 'Chattogram': 1152, 'Khulna': 824, 'Rajshahi': 367,
+                             'Rangpur': 205, 'Mymensingh': 91, 'Sylhet': 80, 'Barishal': 58}
+
+# Composition (%) of a gridded city the config has no land use shares for
+DEFAULT_LAND_USE = {'residential': 30, 'commercial': 5, 'industrial': 5, 'informal': 10, 'green': 35, 'water': 15}
+
+# Classes that count as built-up neighbours, and the classes converted green cells become
+URBAN_CLASSES = ('commercial', 'residential', 'informal', 'industrial')
+CONVERSION_SHARES = (('informal', 0.7), ('residential', 0.3))
+
+def _largest_remainder(shares, total):
+    """Integer cell counts proportional to `shares` that add up to `total`."""
+    exact = shares / shares.sum() * total
+    counts = np.floor(exact).astype(np.int64)
+    counts[np.argsort(counts - exact, kind='stable')[:total - counts.sum()]] += 1
+    return counts
+
+
+def synthetic_raster(categories, shares, rows, cols, rng):
+    """A (rows, cols) class raster with the given % shares and a plausible layout.
+
+    Water follows low spots of a coarse random field, built-up classes fill a noisy
+    monocentric core outwards (commercial first) and green land is left at the fringe.
+    """
+    def field(scale):
+        coarse = rng.random((rows // scale + 2, cols // scale + 2))
+        return np.repeat(np.repeat(coarse, scale, axis=0), scale, axis=1)[:rows, :cols].ravel()
+
+    cells = rows * cols
+    counts = _largest_remainder(np.array([shares.get(c, 0.0) for c in categories], dtype=float), cells)
+    raster = np.empty(cells, dtype=np.uint8)
+    remaining = np.arange(cells)
+    if 'water' in categories:
+        water = categories.index('water')
+        lowest = np.argsort(field(16), kind='stable')[:counts[water]]
+        raster[lowest] = water
+        remaining = np.setdiff1d(remaining, lowest, assume_unique=True)
+    y, x = np.mgrid[0:rows, 0:cols]
+    distance = np.hypot((y - rows / 2) / rows, (x - cols / 2) / cols).ravel()
+    remaining = remaining[np.argsort((distance + 0.25 * field(8))[remaining], kind='stable')]
+    fill = [c for c in URBAN_CLASSES if c in categories]
+    fill += [c for c in categories if c not in fill and c not in ('water', 'green')]
+    fill += ['green'] if 'green' in categories else []
+    start = 0
+    for category in fill:
+        count = counts[categories.index(category)]
+        raster[remaining[start:start + count]] = categories.index(category)
+        start += count
+    return raster.reshape(rows, cols)
+
+
+class LandUseGrid:
+    """Cellular-automaton land use on compact uint8 class rasters, one per gridded city.
+
+    `rasters[i]` is a (replicate, row, col) array of indices into `categories` for the city
+    at state position `positions[i]`. Each year `step` converts green cells to built-up
+    classes: the city's demand (a % of its area) is spread over its green cells with
+    probability proportional to the number of built-up cells in their (2 * radius + 1)^2
+    neighbourhood (plus `spontaneous`, so isolated cells can still convert). Probabilities
+    are capped at 1 and the excess spread over the other cells, so the expected number of
+    conversions is the demand. Both passes (suitability histogram, then conversion) work
+    on row tiles of `tile_rows` rows with a halo of `radius` rows, so memory stays bounded
+    by the tile size, and tiles run in a thread pool of `workers` threads. Every tile draws
+    from its own generator keyed by (step seed, city, replicate, tile), so results do not
+    depend on the number of workers. A step writes into fresh rasters, never into the
+    previous ones, which forks can keep sharing.
+    """
+    def __init__(self, categories, positions, rasters, cell_size_m=100, tile_rows=256, radius=1,
+                 spontaneous=0.1, workers=1):
+        self.categories = tuple(categories)
+        if 'green' not in self.categories:
+            raise ValueError("A land use grid needs a 'green' category to convert")
+        if not 1 <= radius <= 7:
+            raise ValueError("radius must be between 1 and 7 (neighbour counts are uint8)")
+        self.positions = np.asarray(positions, dtype=np.intp)
+        self.rasters = list(rasters)
+        self.cell_size_m = cell_size_m
+        self.tile_rows = tile_rows
+        self.radius = radius
+        self.spontaneous = spontaneous
+        self.workers = workers
+        self.green = self.categories.index('green')
+        self._urban = np.zeros(256, dtype=np.uint8) # Class -> 1 if built-up (lookup table)
+        self._urban[[self.categories.index(c) for c in URBAN_CLASSES if c in self.categories]] = 1
+        targets = [(self.categories.index(c), share) for c, share in CONVERSION_SHARES if c in self.categories]
+        if not targets:
+            raise ValueError("A land use grid needs an 'informal' or 'residential' category to convert into")
+        self._target_classes = np.array([c for c, _ in targets], dtype=np.uint8)
+        shares = np.array([share for _, share in targets])
+        self._target_bounds = np.cumsum(shares / shares.sum())[:-1]
+
+    @classmethod
+    def for_cities(cls, config, city_index, areas_km2=DIVISIONAL_CITY_AREAS_KM2, cell_size_m=100, seed=0, **options):
+        """Synthetic rasters for the cities of `areas_km2` that the simulation tracks.
+
+        Cities come with their configured land use shares, or DEFAULT_LAND_USE otherwise.
+        """
+        land_use = config['urban_growth']['land_use']
+        categories = group_categories(land_use)
+        positions, rasters = [], []
+        for city, area in areas_km2.items():
+            if city not in city_index:
+                continue
+            pos = city_index.position(city)
+            cells = area * 1e6 / cell_size_m ** 2
+            rows = max(1, round(math.sqrt(cells)))
+            cols = max(1, round(cells / rows))
+            shares = land_use[city] if city in land_use else DEFAULT_LAND_USE
+            positions.append(pos)
+            rasters.append(synthetic_raster(categories, shares, rows, cols, np.random.default_rng([seed, pos]))[None])
+        return cls(categories, positions, rasters, cell_size_m, **options)
+
+    @property
+    def cells(self):
+        """Cells per gridded city."""
+        return np.array([raster[0].size for raster in self.rasters])
+
+    def fork(self):
+        """Independent grid sharing the current rasters (steps replace rasters rather than write into them)."""
+        twin = copy.copy(self)
+        twin.rasters = list(self.rasters)
+        return twin
+
+    def land_use(self, city_index):
+        """{city: {category: %}} of the first replicate, e.g. to load the state table from."""
+        shares = self.shares()[0]
+        return {city_index.names[pos]: dict(zip(self.categories, row.tolist()))
+                for pos, row in zip(self.positions, shares)}
+
+    def shares(self):
+        """(replicate, gridded city, category) % of each city's cells per class."""
+        return np.stack([np.stack([np.bincount(r.ravel(), minlength=len(self.categories)) for r in raster])
+                         for raster in self.rasters], axis=1) / self.cells[:, None] * 100
+
+    def _match_replicates(self, replicates):
+        for i, raster in enumerate(self.rasters):
+            if len(raster) == replicates:
+                continue
+            if len(raster) != 1:
+                raise ValueError(f"Cannot resize a grid of {len(raster)} replicates to {replicates}")
+            self.rasters[i] = np.repeat(raster, replicates, axis=0)
+
+    # --- Tiles ---
+    def _neighbourhood(self, raster, start):
+        """Built-up neighbour counts for rows start..start + tile_rows of a 2-D raster, and those rows."""
+        r = self.radius
+        stop = min(start + self.tile_rows, raster.shape[0])
+        lo, hi = max(start - r, 0), min(stop + r, raster.shape[0])
+        # Halo rows from the neighbouring tiles; zero padding beyond the raster edges
+        window = np.pad(self._urban[raster[lo:hi]], ((r - (start - lo), r - (hi - stop)), (r, r)))
+        k = 2 * r + 1
+        rows = sum(window[d:d + window.shape[0] - k + 1] for d in range(k)) # Separable box sum
+        counts = sum(rows[:, d:d + rows.shape[1] - k + 1] for d in range(k))
+        return counts, raster[start:stop]
+
+    def _suitability(self, task):
+        """Histogram of the built-up neighbour counts of a tile's green cells."""
+        i, replicate, start = task
+        counts, cells = self._neighbourhood(self.rasters[i][replicate], start)
+        return np.bincount(counts[cells == self.green], minlength=(2 * self.radius + 1) ** 2)
+
+    def _rate(self, histogram, target):
+        """Scale r with sum(histogram * min(1, r * weight)) == target (weight = count + spontaneous).
+
+        The sum is piecewise linear in r, with a kink where each weight saturates at 1 / weight,
+        so r is interpolated on the segment that reaches the target.
+        """
+        weights = np.arange(len(histogram)) + self.spontaneous
+        usable = (histogram > 0) & (weights > 0)
+        if target <= 0 or not usable.any():
+            return 0.0
+        kinks = np.sort(1 / weights[usable])
+        expected = np.minimum(1, kinks[:, None] * weights[usable]) @ histogram[usable]
+        if target >= expected[-1]:
+            return kinks[-1] # Every cell that can convert does
+        m = int(np.searchsorted(expected, target))
+        lo, below = (kinks[m - 1], expected[m - 1]) if m else (0.0, 0.0)
+        return lo + (target - below) * (kinks[m] - lo) / (expected[m] - below)
+
+    def _convert(self, task, new, rates, seed):
+        i, replicate, start = task
+        counts, cells = self._neighbourhood(self.rasters[i][replicate], start)
+        out = new[i][replicate, start:start + len(cells)]
+        out[...] = cells
+        rate = rates[replicate, i]
+        if rate > 0:
+            convertible = np.flatnonzero(cells == self.green)
+            p = np.minimum(1, (counts.ravel()[convertible] + self.spontaneous) * rate)
+            u = np.random.default_rng([seed, i, replicate, start]).random(len(p))
+            converted = u < p
+            # The same draw picks the new class: u / p is uniform on [0, 1) for converted cells
+            classes = self._target_classes[np.searchsorted(self._target_bounds, u[converted] / p[converted], side='right')]
+            out.reshape(-1)[convertible[converted]] = classes
+        return np.bincount(out.ravel(), minlength=len(self.categories))
+
+    def _map(self, function, tasks):
+        if self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                return list(executor.map(function, tasks))
+        return [function(task) for task in tasks]
+
+    def step(self, demand, rng):
+        """Converts `demand` (replicate, gridded city) % of each city's area from green to built-up land.
+
+        Returns the new (replicate, gridded city, category) land use %.
+        """
+        replicates = demand.shape[0]
+        self._match_replicates(replicates)
+        seed = int(rng.integers(2 ** 63))
+        tasks = [(i, replicate, start) for i, raster in enumerate(self.rasters) for replicate in range(replicates)
+                 for start in range(0, raster.shape[1], self.tile_rows)]
+        # Pass 1: suitability histogram of every (replicate, city)'s green cells
+        histograms = np.zeros((replicates, len(self.rasters), (2 * self.radius + 1) ** 2), dtype=np.int64)
+        for (i, replicate, _), histogram in zip(tasks, self._map(self._suitability, tasks)):
+            histograms[replicate, i] += histogram
+        # Pass 2: convert cells with probability proportional to their suitability, capped at 1
+        targets = np.rint(demand / 100 * self.cells)
+        rates = np.array([[self._rate(histograms[replicate, i], targets[replicate, i]) for i in range(len(self.rasters))]
+                          for replicate in range(replicates)])
+        new = [np.empty_like(raster) for raster in self.rasters]
+        counts = np.zeros((replicates, len(self.rasters), len(self.categories)), dtype=np.int64)
+        for (i, replicate, _), tile_counts in zip(tasks, self._map(lambda task: self._convert(task, new, rates, seed), tasks)):
+            counts[replicate, i] += tile_counts
+        self.rasters = new
+        return counts / self.cells[:, None] * 100
+
+
+if __name__ == "__main__":
+    import time
+
+    from city_registry import CityRegistry
+    from synthetic_config import generate_synthetic_config
+
+    parser = argparse.ArgumentParser(description="Time yearly cellular-automaton land use steps for the divisional cities.")
+    parser.add_argument('--cell-size', type=float, default=100, help="Cell size in metres")
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--demand', type=float, default=1.0, help="% of each city's area converted per year")
+    parser.add_argument('--tile-rows', type=int, default=256)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    config = generate_synthetic_config()
+    index = CityRegistry.from_config(config)
+    start = time.perf_counter()
+    grid = LandUseGrid.for_cities(config, index, cell_size_m=args.cell_size, tile_rows=args.tile_rows, workers=args.workers)
+    print(f"{len(grid.rasters)} cities, {grid.cells.sum():,} cells at {args.cell_size:g} m "
+          f"({sum(r.nbytes for r in grid.rasters) / 2**20:.1f} MB), built in {time.perf_counter() - start:.2f} s")
+    dhaka = list(grid.positions).index(index.position('Dhaka'))
+    rng = np.random.default_rng(0)
+    demand = np.full((1, len(grid.rasters)), args.demand)
+    for year in range(args.years):
+        start = time.perf_counter()
+        shares = grid.step(demand, rng)
+        print(f"year {year + 1}: {time.perf_counter() - start:.2f} s, Dhaka green "
+              f"{shares[0, dhaka, grid.green]:.2f}% of {grid.cells[dhaka]:,} cells")
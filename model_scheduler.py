@@ -0,0 +1,91 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from sim_profile import PROFILE
+
+class ModelScheduler:
+    """Run the yearly model pipeline as a dependency graph built from each model's declared state.
+
+    Every model class declares `STATE_READS` (state names passed positionally to
+    `simulate_step` after the year) and `STATE_WRITES` ({state name: getter method}).
+    State tables are double-buffered: during a year every model reads the state other
+    models published at the end of the previous year and writes into its own back
+    buffer, and all tables are committed together once the year is done. Reads therefore
+    never order models; only two models writing the same state do (the later one in the
+    canonical order waits for the earlier). Models with no path between them run
+    concurrently, so a year's critical path grows with the depth of the graph rather
+    than the number of models.
+    """
+    def __init__(self, models):
+        self.models = list(models)
+        self.getters = {}
+        for model in self.models:
+            for state_name, getter_name in model.STATE_WRITES.items():
+                self.getters[state_name] = getattr(model, getter_name)
+        self.consumed_states = [name for name in self.getters
+                                if any(name in model.STATE_READS for model in self.models)]
+        self._step_spans = [f"{type(model).__name__}.simulate_step" for model in self.models]
+        self.dependencies = self._build_graph()
+        self.levels = self._levels()
+
+    def _build_graph(self):
+        dependencies = {i: set() for i in range(len(self.models))}
+        for j, later in enumerate(self.models):
+            later_writes = set(later.STATE_WRITES)
+            for i, earlier in enumerate(self.models[:j]):
+                if set(earlier.STATE_WRITES) & later_writes: # write after write
+                    dependencies[j].add(i)
+        return dependencies
+
+    def _levels(self):
+        """Topological layers: every model in a layer only depends on models in earlier layers."""
+        depth = {}
+        for j in range(len(self.models)): # Canonical order is already a topological order
+            depth[j] = 1 + max((depth[i] for i in self.dependencies[j]), default=-1)
+        levels = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+        for j, level in depth.items():
+            levels[level].append(self.models[j])
+        return levels
+
+    def describe(self):
+        return [[type(model).__name__ for model in level] for level in self.levels]
+
+    def fetch_states(self):
+        """Published value of every state that at least one model reads (unread state is never fetched)."""
+        states = {}
+        for name in self.consumed_states:
+            with PROFILE.span(self.getters[name].__qualname__, 'getter'):
+                states[name] = self.getters[name]()
+        return states
+
+    def _step(self, j, year, states):
+        model = self.models[j]
+        with PROFILE.span(self._step_spans[j], 'model', year=year):
+            model.simulate_step(year, *(states[name] for name in model.STATE_READS))
+
+    def run_year(self, year, states, max_workers=1):
+        """Advances every model by one year; `max_workers > 1` runs independent models in threads."""
+        for model in self.models:
+            model.state.begin_step()
+        if max_workers is None or max_workers <= 1:
+            for j in range(len(self.models)):
+                self._step(j, year, states)
+        else:
+            self._run_parallel(year, states, max_workers)
+        with PROFILE.span('commit', 'state', year=year):
+            for model in self.models: # Publish the whole year at once
+                model.state.commit()
+
+    def _run_parallel(self, year, states, max_workers):
+        remaining = {j: set(deps) for j, deps in self.dependencies.items()}
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while remaining or running:
+                for j in [j for j, deps in remaining.items() if not deps]:
+                    del remaining[j]
+                    running[executor.submit(self._step, j, year, states)] = j
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished = running.pop(future)
+                    future.result() # Re-raise model errors in the engine thread
+                    for deps in remaining.values():
+                        deps.discard(finished)
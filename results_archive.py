@@ -0,0 +1,205 @@
+import argparse
+
+import numpy as np
+
+from checkpoint import ArrayFile, create_array_file
+from results_store import INDICATORS, RECORDED_GROUPS, ResultsStore, column_name
+
+# Values are laid out (scenario, replicate, city, indicator, year), so one city's trajectory
+# of one indicator is a contiguous run of `years` float64s; cells without data are NaN
+MAGIC = b'BDUSARCH'
+VERSION = 1
+
+class ArchiveWriter:
+    """Creates a results archive of fixed shape and fills it in place, year by year or in blocks.
+
+    The file is sized up front and memory-mapped, so archives larger than RAM are
+    written without ever being held in memory.
+    """
+    def __init__(self, path, scenarios, replicates, cities, indicators, years):
+        self.path = path
+        self.scenarios = list(scenarios)
+        self.cities = list(cities)
+        self.indicators = [column_name(key) for key in indicators]
+        self.years = [int(year) for year in years]
+        shape = (len(self.scenarios), replicates, len(self.cities), len(self.indicators), len(self.years))
+        header = {'version': VERSION, 'scenarios': self.scenarios, 'replicates': replicates,
+                  'cities': self.cities, 'indicators': self.indicators, 'years': self.years}
+        self.values = create_array_file(path, MAGIC, header, {'values': (shape, np.float64)})['values']
+        self._year_positions = {year: i for i, year in enumerate(self.years)}
+        self._recorders = []
+
+    def write_years(self, scenario, years, values, mask=None, replicates=slice(None)):
+        """Stores consecutive years of (year, replicate, city, indicator) values; cells outside `mask` become NaN.
+
+        Years are the innermost axis on disk, so writing several at once turns many strided
+        single-value writes into fewer, longer runs.
+        """
+        if mask is not None:
+            values = np.where(mask[:, None], values, np.nan)
+        first = self._year_positions[int(years[0])]
+        self.values[self.scenarios.index(scenario), replicates, :, :, first:first + len(years)] = \
+            np.moveaxis(values, 0, -1)
+
+    def write_block(self, scenario, values, replicates=slice(None)):
+        """Stores a (replicate, city, indicator, year) block covering every archived year."""
+        self.values[self.scenarios.index(scenario), replicates] = values
+
+    def recorder(self, simulation, scenario, indicators=INDICATORS, groups=RECORDED_GROUPS, window=8):
+        """Recorder to pass to `run_simulation`: writes every `window` recorded years into the archive."""
+        return ArchiveRecorder(self, simulation, scenario, indicators, groups, window)
+
+    def close(self):
+        for recorder in self._recorders:
+            recorder.flush()
+        self._recorders = []
+        self.values.flush()
+        del self.values
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class ArchiveRecorder:
+    """Buffers up to `window` recorded years of one simulation and writes them into an archive"""
+    def __init__(self, writer, simulation, scenario, indicators, groups, window):
+        self.writer = writer
+        self.scenario = scenario
+        self.window = window
+        self.store = ResultsStore(simulation, indicators, groups, capacity=window)
+        if [column_name(key) for key in self.store.columns] != writer.indicators:
+            raise ValueError("The simulation records different indicators than the archive holds")
+        writer._recorders.append(self)
+
+    def record_state(self, year):
+        self.store.record(year)
+        if len(self.store) >= self.window:
+            self.flush()
+
+    def flush(self):
+        if self.store:
+            self.writer.write_years(self.scenario, self.store.years, self.store.values, self.store.mask)
+            self.store.clear()
+
+
+class ResultsArchive:
+    """Read-only, memory-mapped results archive with name-based random access.
+
+    Opening only parses the small JSON index; `get` returns views into the mapped file, so
+    a single trajectory touches only the pages that hold it.
+    """
+    def __init__(self, path):
+        self._file = ArrayFile(path, MAGIC, mmap=True)
+        header = self._file.header
+        if header['version'] != VERSION:
+            raise ValueError(f"Unsupported results archive version {header['version']}")
+        self.path = path
+        self.scenarios = header['scenarios']
+        self.replicates = header['replicates']
+        self.cities = header['cities']
+        self.indicators = header['indicators']
+        self.years = np.array(header['years'])
+        self.values = self._file.array('values') # (scenario, replicate, city, indicator, year)
+        self._cities = {city: i for i, city in enumerate(self.cities)}
+        self._indicators = {indicator: i for i, indicator in enumerate(self.indicators)}
+        self._scenarios = {scenario: i for i, scenario in enumerate(self.scenarios)}
+
+    @staticmethod
+    def _lookup(index, key, axis):
+        if key is None:
+            return slice(None)
+        if isinstance(key, (list, tuple)):
+            return [ResultsArchive._lookup(index, item, axis) for item in key]
+        try:
+            return index[key]
+        except KeyError:
+            raise KeyError(f"Unknown {axis} {key!r}") from None
+
+    def _year_positions(self, years):
+        if years is None:
+            return slice(None)
+        if isinstance(years, slice):
+            start = None if years.start is None else int(np.searchsorted(self.years, years.start))
+            stop = None if years.stop is None else int(np.searchsorted(self.years, years.stop))
+            return slice(start, stop, years.step)
+        query = np.asarray(years)
+        positions = np.minimum(np.searchsorted(self.years, query), len(self.years) - 1)
+        missing = self.years[positions] != query # searchsorted alone would pick the next stored year
+        if missing.any():
+            raise KeyError(f"Unknown year {int(query[missing].flat[0])!r}")
+        return int(positions) if query.ndim == 0 else positions
+
+    def get(self, city=None, indicator=None, years=None, scenario=None, replicate=None):
+        """Values of the selection, with an axis for every argument left as None or given as a list.
+
+        Axes come in archive order (scenario, replicate, city, indicator, year). `years`
+        is a year, a list of years, or a slice of years with an exclusive stop, e.g.
+        slice(2030, 2040). Plain names and slices give a view into the file, not a copy.
+        """
+        if scenario is None and len(self.scenarios) == 1:
+            scenario = self.scenarios[0]
+        key = (self._lookup(self._scenarios, scenario, 'scenario'),
+               slice(None) if replicate is None else replicate,
+               self._lookup(self._cities, city, 'city'),
+               self._lookup(self._indicators, indicator, 'indicator'),
+               self._year_positions(years))
+        # Axis by axis from the last one, so integer selections never shift the axes still to come
+        # and list selections never broadcast against each other
+        result = self.values
+        for axis in reversed(range(len(key))):
+            result = result[(slice(None),) * axis + (key[axis],)]
+        return result
+
+    def year_range(self, years=None):
+        """The archived years a `years` selection of `get` refers to."""
+        return self.years[self._year_positions(years)]
+
+
+def open_archive(path):
+    return ResultsArchive(path)
+
+
+# --- Archiving results that are already in memory ---
+def archive_results(path, store, scenario='baseline'):
+    """Writes a ResultsStore (e.g. `UrbanAnalysisEngine.results`) as a one-scenario archive."""
+    with ArchiveWriter(path, [scenario], store.replicates, store.cities, store.columns, store.years) as writer:
+        block = np.where(store.mask[:, None], store.values, np.nan) # (year, replicate, city, indicator)
+        writer.write_block(scenario, block.transpose(1, 2, 3, 0))
+
+
+def archive_scenarios(path, results):
+    """Writes ScenarioResults; each scenario's (seed, replicate) pairs become its archived replicates."""
+    scenarios, seeds, years, replicates, cities, indicators = results.values.shape
+    with ArchiveWriter(path, results.scenario_names, seeds * replicates, results.cities, results.indicators,
+                       results.years) as writer:
+        for s, scenario in enumerate(results.scenario_names):
+            block = np.where(results.coverage, results.values[s], np.nan) # (seed, year, replicate, city, indicator)
+            writer.write_block(scenario, block.transpose(0, 2, 3, 4, 1).reshape(seeds * replicates, cities, indicators, years))
+
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Open a results archive and print one trajectory.")
+    parser.add_argument('path')
+    parser.add_argument('--city', default='Dhaka')
+    parser.add_argument('--indicator', default='aqi')
+    parser.add_argument('--scenario', default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    archive = open_archive(args.path)
+    opened = time.perf_counter()
+    trajectory = archive.get(city=args.city, indicator=args.indicator, scenario=args.scenario or archive.scenarios[0])
+    mean = np.nanmean(np.asarray(trajectory), axis=0)
+    finished = time.perf_counter()
+    print(f"{args.path}: {len(archive.scenarios)} scenario(s) x {archive.replicates} replicate(s) x "
+          f"{len(archive.cities)} cities x {len(archive.indicators)} indicators x {len(archive.years)} years "
+          f"({archive.values.nbytes / 2**20:.1f} MB)")
+    print(f"opened in {(opened - start) * 1e3:.2f} ms, trajectory read in {(finished - opened) * 1e3:.2f} ms")
+    for year, value in zip(archive.years, mean):
+        print(f"  {year} {args.indicator} {args.city}: {value:.2f} (replicate mean)")
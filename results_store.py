@@ -0,0 +1,161 @@
+import collections
+
+import numpy as np
+
+# Metadata of a recorded per-city indicator: where it lives in the simulation (model attribute
+# and state table column) and how reports present it
+IndicatorSpec = collections.namedtuple('IndicatorSpec', 'model column label format higher_is_worse',
+                                       defaults=('.2f', False))
+
+INDICATORS = {
+    'population': IndicatorSpec('urban_growth', 'population', 'Population', ',.0f'),
+    'avg_house_price': IndicatorSpec('urban_housing', 'prices', 'Avg House Price', '.1f', True),
+    'affordability_ratio': IndicatorSpec('urban_housing', 'affordability', 'Housing Affordability Ratio', '.1f', True),
+    'water_coverage': IndicatorSpec('urban_infrastructure', 'water_coverage', 'Water Coverage (%)', '.1%'),
+    'sanitation_coverage': IndicatorSpec('urban_infrastructure', 'sanitation_coverage', 'Sanitation Coverage (%)', '.1%'),
+    'power_reliability': IndicatorSpec('urban_infrastructure', 'power_reliability', 'Power Reliability (%)', '.1%'),
+    'avg_commute_time': IndicatorSpec('urban_transport', 'avg_commute_time', 'Avg Commute Time (min)', '.1f'),
+    'gdp_per_capita': IndicatorSpec('urban_economy', 'gdp_per_capita', 'GDP per Capita (USD)', ',.0f'),
+    'unemployment_rate': IndicatorSpec('urban_economy', 'unemployment', 'Unemployment Rate (%)', '.1%', True),
+    'citizen_satisfaction': IndicatorSpec('urban_governance', 'satisfaction', 'Citizen Satisfaction Index', '.2f'),
+    'aqi': IndicatorSpec('urban_environment', 'aqi', 'Air Quality Index (AQI)', '.0f', True),
+    'green_space': IndicatorSpec('urban_environment', 'green_space', 'Green Space (% Area)', '.1%'),
+    'crime_rate': IndicatorSpec('urban_social', 'crime_rate', 'Crime Rate (per 100k)', ',.0f', True),
+    'migration_rate': IndicatorSpec('urban_rural_linkage', 'migration_rate', 'Rural Migration Rate (%)', '.1%'),
+    'commuter_percentage': IndicatorSpec('urban_rural_linkage', 'commuter_perc', 'Commuter Share (%)', '.1%'),
+    'hospital_beds_per_1000': IndicatorSpec('urban_service', 'hospital_beds', 'Hospital Beds per 1000', '.1f'),
+    'digital_literacy': IndicatorSpec('smart_city', 'digital_literacy', 'Digital Literacy (%)', '.1%'),
+    'building_code_compliance': IndicatorSpec('urban_resilience', 'code_compliance', 'Building Code Compliance (%)', '.1%'),
+    'recovery_speed': IndicatorSpec('urban_resilience', 'recovery_speed', 'Disaster Recovery (Days)', '.1f', True),
+}
+
+# Flat per-city indicators tracked over time: name -> (simulation model attribute, state table column)
+RECORDED_INDICATORS = {name: (spec.model, spec.column) for name, spec in INDICATORS.items()}
+
+# Column groups recorded alongside them: group name -> simulation model attribute
+RECORDED_GROUPS = {'land_use': 'urban_growth', 'housing_stock': 'urban_housing'}
+
+# Rows of the HTML report's summary table, in display order
+REPORTED_INDICATORS = ('population', 'gdp_per_capita', 'avg_commute_time', 'aqi', 'affordability_ratio',
+                       'water_coverage', 'sanitation_coverage', 'power_reliability', 'citizen_satisfaction',
+                       'unemployment_rate', 'crime_rate', 'green_space', 'digital_literacy',
+                       'building_code_compliance', 'recovery_speed')
+
+def column_name(key):
+    """Flat name of a recorded column: an indicator name, or 'group.category' for a (group, category) key."""
+    return f"{key[0]}.{key[1]}" if isinstance(key, tuple) else key
+
+
+class ResultsStore:
+    """Preallocated (year x replicate x city x indicator) array of recorded results.
+
+    Columns are the recorded flat indicators (by name) followed by the categories of the
+    recorded groups (as (group, category) keys, like StateTable columns); `mask` holds the
+    matching per-year coverage. Recording a year copies each model's recorded columns
+    straight out of its published state buffer, one gather per model however many
+    indicators it contributes, into the next year slot. Capacity doubles when it runs
+    out, so appends are amortised O(1). Readers get array slices, not per-city dicts.
+    """
+    def __init__(self, simulation, indicators=INDICATORS, groups=RECORDED_GROUPS, capacity=16):
+        self.sim = simulation
+        self.cities = simulation.city_index.names
+        self.columns = {}
+        self.groups = {}
+        self.integer = set()
+        sources = {} # model attribute -> ([state table columns], [store columns])
+        for name, spec in indicators.items():
+            table = getattr(simulation, spec.model).state
+            self._add(sources, spec.model, name, table.columns[spec.column], spec.column in table.integer)
+        for group, model in groups.items():
+            table = getattr(simulation, model).state
+            start, stop, categories = table.groups[group]
+            first = len(self.columns)
+            for offset, category in enumerate(categories):
+                self._add(sources, model, (group, category), start + offset, group in table.integer)
+            self.groups[group] = (first, len(self.columns), categories)
+        self._sources = [(model, np.array(src), np.array(dest)) for model, (src, dest) in sources.items()]
+        self._capacity = capacity
+        self._years = np.zeros(0, dtype=int)
+        self._values = None # Allocated on the first record, once the replicate count is known
+        self._mask = None
+        self.count = 0
+
+    def _add(self, sources, model, key, source_column, integer):
+        src, dest = sources.setdefault(model, ([], []))
+        src.append(source_column)
+        dest.append(len(self.columns))
+        self.columns[key] = len(self.columns)
+        if integer:
+            self.integer.add(key)
+
+    def _grow(self, replicates):
+        capacity = max(self._capacity, 2 * self.count)
+        values = np.empty((capacity, replicates, len(self.cities), len(self.columns)))
+        mask = np.zeros((capacity, len(self.cities), len(self.columns)), dtype=bool)
+        years = np.zeros(capacity, dtype=int)
+        if self._values is not None:
+            values[:self.count] = self._values[:self.count]
+            mask[:self.count] = self._mask[:self.count]
+            years[:self.count] = self._years[:self.count]
+        self._values, self._mask, self._years = values, mask, years
+
+    def record(self, year):
+        """Copies the published state of every recorded column into the next year slot."""
+        if self._values is None or self.count == len(self._years):
+            self._grow(getattr(self.sim, self._sources[0][0]).state.replicates)
+        slot = self.count
+        values, mask = self._values[slot], self._mask[slot]
+        for model, src, dest in self._sources:
+            table = getattr(self.sim, model).state
+            values[..., dest] = table.front[..., src]
+            mask[:, dest] = table.front_mask[:, src]
+        self._years[slot] = year
+        self.count += 1
+
+    def clear(self):
+        """Forgets the recorded years but keeps the buffers, so the store can serve as a rolling window."""
+        self.count = 0
+
+    # --- Read access (views into the store) ---
+    def __len__(self):
+        return self.count
+
+    @property
+    def years(self):
+        return self._years[:self.count]
+
+    @property
+    def replicates(self):
+        return self._values.shape[1] if self._values is not None else 0
+
+    @property
+    def values(self):
+        """(year, replicate, city, column) array of everything recorded so far."""
+        return self._values[:self.count]
+
+    @property
+    def mask(self):
+        return self._mask[:self.count]
+
+    def series(self, key):
+        """(year, replicate, city) values of one indicator (or (group, category) column)."""
+        return self._values[:self.count, ..., self.columns[key]]
+
+    def covered(self, key):
+        """(year, city) coverage of one indicator."""
+        return self._mask[:self.count, :, self.columns[key]]
+
+    def estimates(self, key):
+        """(year, city) point estimates: the replicate mean of ensembles, the value itself otherwise.
+
+        Single-run integer indicators are truncated the way their state views return them.
+        """
+        series = self.series(key)
+        if series.shape[1] > 1:
+            return series.mean(axis=1)
+        return np.trunc(series[:, 0]) if key in self.integer else series[:, 0]
+
+    def group(self, name):
+        """(year, replicate, city, category) block of one recorded group, and its categories."""
+        start, stop, categories = self.groups[name]
+        return self._values[:self.count, ..., start:stop], categories
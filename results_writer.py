@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from results_store import INDICATORS, RECORDED_GROUPS, ResultsStore, column_name
+
+# pyarrow is optional: it is only imported once a writer or reader is actually used
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as error:
+        raise ImportError("Streaming results to Parquet/Arrow files requires pyarrow (pip install pyarrow)") from error
+    return pyarrow
+
+
+FORMATS = {'.parquet': 'parquet', '.pq': 'parquet', '.arrow': 'arrow', '.ipc': 'arrow', '.feather': 'arrow'}
+
+def _format_of(path, format=None):
+    if format is not None:
+        if format not in ('parquet', 'arrow'):
+            raise ValueError(f"Unknown results format {format!r} (expected 'parquet' or 'arrow')")
+        return format
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Cannot infer the results format from {path!r}; pass format='parquet' or 'arrow'")
+    return FORMATS[extension]
+
+
+class ResultsWriter:
+    """Streams recorded years to one chunked, columnar results file (Parquet or Arrow IPC).
+
+    Rows are (scenario, replicate, year, city) with one nullable float column per recorded
+    indicator (group categories as 'group.category'); cells a city has no data for are
+    null. Each flushed block holds the window's years for one (scenario, replicate) and
+    becomes its own Parquet row group or Arrow record batch, so readers can skip whole
+    blocks by scenario, replicate and year without touching the rest of the file.
+    """
+    def __init__(self, path, format=None, window=4):
+        self.pa = _require_pyarrow()
+        self.path = path
+        self.format = _format_of(path, format)
+        self.window = window
+        self.columns = None
+        self.cities = None
+        self.rows_written = 0
+        self._writer = None
+        self._recorders = []
+
+    def recorder(self, simulation, scenario='baseline', indicators=INDICATORS, groups=RECORDED_GROUPS):
+        """Recorder to pass to `run_simulation` in place of an analysis engine."""
+        recorder = StreamingRecorder(self, simulation, scenario, indicators, groups)
+        if self.columns is None:
+            self.columns = [column_name(key) for key in recorder.store.columns]
+            self.cities = list(recorder.store.cities)
+        elif [column_name(key) for key in recorder.store.columns] != self.columns or list(recorder.store.cities) != self.cities:
+            raise ValueError("Every simulation written to one results file must record the same cities and indicators")
+        self._recorders.append(recorder)
+        return recorder
+
+    def _schema(self):
+        pa = self.pa
+        fields = [pa.field('scenario', pa.string()), pa.field('replicate', pa.int32()), pa.field('year', pa.int32()),
+                  pa.field('city', pa.dictionary(pa.int32(), pa.string()))]
+        fields += [pa.field(name, pa.float64()) for name in self.columns]
+        labels = {name: spec.label for name, spec in INDICATORS.items() if name in self.columns}
+        return pa.schema(fields, metadata={'bd_urban_sim': json.dumps({'cities': self.cities, 'labels': labels})})
+
+    def _open(self):
+        self.schema = self._schema()
+        if self.format == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self.path, self.schema)
+        else:
+            self._writer = self.pa.ipc.new_file(self.path, self.schema)
+        self._city_dictionary = self.pa.array(self.cities)
+
+    def write_block(self, scenario, years, values, mask):
+        """Writes `values` ((year, replicate, city, column)) as one block per replicate."""
+        pa = self.pa
+        if self._writer is None:
+            self._open()
+        n_years, replicates, n_cities, _ = values.shape
+        rows = n_years * n_cities
+        year_column = pa.array(np.repeat(years, n_cities).astype(np.int32))
+        city_column = pa.DictionaryArray.from_arrays(pa.array(np.tile(np.arange(n_cities, dtype=np.int32), n_years)),
+                                                     self._city_dictionary)
+        scenario_column = pa.array([scenario]).take(pa.array(np.zeros(rows, dtype=np.int32)))
+        missing = np.ascontiguousarray(~mask.reshape(rows, -1).T) # Coverage is the same for every replicate
+        for replicate in range(replicates):
+            block = np.ascontiguousarray(values[:, replicate].reshape(rows, -1).T) # One contiguous row per column
+            arrays = [scenario_column, pa.array(np.full(rows, replicate, dtype=np.int32)), year_column, city_column]
+            arrays += [pa.array(column, mask=column_missing) for column, column_missing in zip(block, missing)]
+            batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+            if self.format == 'parquet':
+                self._writer.write_batch(batch, row_group_size=rows)
+            else:
+                self._writer.write_batch(batch)
+            self.rows_written += rows
+
+    def close(self):
+        for recorder in self._recorders:
+            recorder.flush()
+        self._recorders = []
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class StreamingRecorder:
+    """Records a simulation's years into a bounded window and flushes full windows to a ResultsWriter"""
+    def __init__(self, writer, simulation, scenario, indicators, groups):
+        self.writer = writer
+        self.scenario = scenario
+        self.store = ResultsStore(simulation, indicators, groups, capacity=writer.window)
+
+    def record_state(self, year):
+        self.store.record(year)
+        if len(self.store) >= self.writer.window:
+            self.flush()
+
+    def flush(self):
+        if self.store:
+            self.writer.write_block(self.scenario, self.store.years, self.store.values, self.store.mask)
+            self.store.clear()
+
+
+# --- Reading slices back ---
+def read_results(path, indicators=None, scenarios=None, replicates=None, cities=None, years=None, format=None):
+    """Reads the selected slice of a results file as a pyarrow Table.
+
+    `indicators` picks columns; `scenarios`, `replicates` and `cities` are collections of
+    values to keep and `years` a slice (start inclusive, stop exclusive). Parquet row groups
+    and Arrow record batches outside the selection are skipped without being read.
+    """
+    pa = _require_pyarrow()
+    import pyarrow.compute as pc
+    columns = ['scenario', 'replicate', 'year', 'city'] + list(indicators) if indicators is not None else None
+    conditions = []
+    if scenarios is not None:
+        conditions.append(pc.field('scenario').isin(list(scenarios)))
+    if replicates is not None:
+        conditions.append(pc.field('replicate').isin(list(replicates)))
+    if cities is not None:
+        conditions.append(pc.field('city').cast(pa.string()).isin(list(cities)))
+    if years is not None and years.start is not None:
+        conditions.append(pc.field('year') >= years.start)
+    if years is not None and years.stop is not None:
+        conditions.append(pc.field('year') < years.stop)
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    if _format_of(path, format) == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(path, columns=columns, filters=expression)
+
+    # Arrow IPC: memory-map the file and only materialise batches whose keys can match
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        batches = []
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if batch.num_rows == 0 or not _batch_may_match(batch, scenarios, replicates, years):
+                continue
+            table = pa.Table.from_batches([batch])
+            if expression is not None:
+                table = table.filter(expression)
+            batches.append(table.select(columns) if columns else table)
+        if not batches:
+            schema = reader.schema
+            return schema.empty_table().select(columns) if columns else schema.empty_table()
+        return pa.concat_tables(batches)
+
+
+def _batch_may_match(batch, scenarios, replicates, years):
+    # Every batch is one (scenario, replicate) block with its years in ascending order
+    if scenarios is not None and batch.column('scenario')[0].as_py() not in scenarios:
+        return False
+    if replicates is not None and batch.column('replicate')[0].as_py() not in replicates:
+        return False
+    if years is not None:
+        year_column = batch.column('year')
+        first, last = year_column[0].as_py(), year_column[len(year_column) - 1].as_py()
+        if (years.start is not None and last < years.start) or (years.stop is not None and first >= years.stop):
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    import resource
+    import time
+
+    from city_registry import synthetic_city_config
+    from main_simulation import BangladeshUrbanDevelopmentSimulation, generate_synthetic_config
+
+    parser = argparse.ArgumentParser(description="Stream an ensemble run to a Parquet or Arrow results file.")
+    parser.add_argument('path', help="Output file (.parquet or .arrow)")
+    parser.add_argument('--cities', type=int, default=500)
+    parser.add_argument('--years', type=int, default=75)
+    parser.add_argument('--replicates', type=int, default=100)
+    parser.add_argument('--window', type=int, default=4, help="Years buffered in memory between flushes")
+    args = parser.parse_args()
+
+    config = generate_synthetic_config()
+    if args.cities > 10:
+        config = synthetic_city_config(config, args.cities)
+    simulation = BangladeshUrbanDevelopmentSimulation(config, seed=0)
+    start = time.perf_counter()
+    with ResultsWriter(args.path, window=args.window) as writer:
+        simulation.run_simulation(writer.recorder(simulation), years=args.years, replicates=args.replicates)
+    elapsed = time.perf_counter() - start
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{writer.rows_written:,} rows written to {args.path} in {elapsed:.1f} s "
+          f"({os.path.getsize(args.path) / 2**20:.1f} MB on disk, peak RSS {peak_rss_mb:.0f} MB)")
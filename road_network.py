@@ -0,0 +1,554 @@
+import argparse
+import copy
+import csv
+import os
+
+import numpy as np
+
+def _csv_rows(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+class RoadNetwork:
+    """Directed road graph with compressed sparse row (CSR) adjacency arrays.
+
+    Links keep the ids they were created with: `tails`, `heads`, `length_m`, `speed_kmh`
+    and `lanes` are indexed by link id, and adding links appends new ids, so per-link
+    arrays kept elsewhere (e.g. flows) stay valid. The links leaving node u are
+    `csr_links[indptr[u]:indptr[u + 1]]`, with head nodes `csr_heads` in the same order.
+    Changes replace arrays instead of writing into them, so forks can share a network.
+    """
+    def __init__(self, tails, heads, length_m, speed_kmh, lanes=None, nodes=None, node_ids=None):
+        self.tails = np.asarray(tails, dtype=np.intp)
+        self.heads = np.asarray(heads, dtype=np.intp)
+        self.length_m = np.asarray(length_m, dtype=float)
+        self.speed_kmh = np.asarray(speed_kmh, dtype=float)
+        self.lanes = np.ones(len(self.tails)) if lanes is None else np.asarray(lanes, dtype=float)
+        if not len(self.tails) == len(self.heads) == len(self.length_m) == len(self.speed_kmh) == len(self.lanes):
+            raise ValueError("Every link needs a tail, head, length, speed and lane count")
+        if (self.speed_kmh <= 0).any() or (self.length_m < 0).any():
+            raise ValueError("Link speeds must be positive and lengths non-negative")
+        nodes = nodes if nodes is not None else int(max(self.tails.max(initial=-1), self.heads.max(initial=-1))) + 1
+        self.node_ids = list(node_ids) if node_ids is not None else list(range(nodes))
+        self._build()
+
+    def _build(self):
+        self.nodes = len(self.node_ids)
+        self.csr_links = np.argsort(self.tails, kind='stable')
+        self.csr_heads = self.heads[self.csr_links]
+        self.indptr = np.zeros(self.nodes + 1, dtype=np.intp)
+        np.cumsum(np.bincount(self.tails, minlength=self.nodes), out=self.indptr[1:])
+
+    @property
+    def links(self):
+        return len(self.tails)
+
+    def free_flow_time(self):
+        """Seconds to traverse every link at its speed limit."""
+        return self.length_m / (self.speed_kmh / 3.6)
+
+    # --- Changes (each replaces the arrays it touches) ---
+    def add_links(self, tails, heads, length_m, speed_kmh, lanes=1):
+        """Appends links (new node positions extend the network) and returns their ids."""
+        tails, heads = np.atleast_1d(np.asarray(tails, dtype=np.intp)), np.atleast_1d(np.asarray(heads, dtype=np.intp))
+        first = self.links
+        grow = lambda array, values: np.concatenate([array, np.broadcast_to(np.asarray(values, dtype=array.dtype), tails.shape)])
+        self.tails, self.heads = grow(self.tails, tails), grow(self.heads, heads)
+        self.length_m, self.speed_kmh, self.lanes = grow(self.length_m, length_m), grow(self.speed_kmh, speed_kmh), grow(self.lanes, lanes)
+        top = int(max(tails.max(), heads.max())) + 1
+        if top > len(self.node_ids):
+            self.node_ids = list(self.node_ids) + list(range(len(self.node_ids), top))
+        self._build()
+        return np.arange(first, self.links)
+
+    def upgrade_links(self, links, speed_kmh=None, lanes=None):
+        """Sets new speed limits and/or lane counts on existing links."""
+        links = np.atleast_1d(np.asarray(links, dtype=np.intp))
+        if speed_kmh is not None:
+            self.speed_kmh = self.speed_kmh.copy()
+            self.speed_kmh[links] = speed_kmh
+        if lanes is not None:
+            self.lanes = self.lanes.copy()
+            self.lanes[links] = lanes
+
+    def fork(self):
+        return copy.copy(self)
+
+    # --- Edge files ---
+    @classmethod
+    def from_edge_file(cls, path):
+        """Reads a CSV edge list with columns from, to, length_m, speed_kmh and optional lanes and oneway.
+
+        Node ids are any labels (e.g. OSM node ids). Links are directed unless `oneway` is 0,
+        which adds the reverse link as well.
+        """
+        rows = _csv_rows(path)
+        ids = {}
+        for row in rows:
+            ids.setdefault(row['from'], len(ids))
+            ids.setdefault(row['to'], len(ids))
+        tails, heads, length, speed, lanes = [], [], [], [], []
+        for row in rows:
+            ends = [(ids[row['from']], ids[row['to']])]
+            if row.get('oneway', '1').strip() in ('0', 'no', 'false', 'False'):
+                ends.append(ends[0][::-1])
+            for tail, head in ends:
+                tails.append(tail)
+                heads.append(head)
+                length.append(float(row['length_m']))
+                speed.append(float(row['speed_kmh']))
+                lanes.append(float(row.get('lanes') or 1))
+        return cls(tails, heads, length, speed, lanes, node_ids=list(ids))
+
+    def write_edge_file(self, path):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['from', 'to', 'length_m', 'speed_kmh', 'lanes', 'oneway'])
+            for link in range(self.links):
+                writer.writerow([self.node_ids[self.tails[link]], self.node_ids[self.heads[link]],
+                                 f"{self.length_m[link]:g}", f"{self.speed_kmh[link]:g}", f"{self.lanes[link]:g}", 1])
+
+    @classmethod
+    def synthetic(cls, rows=120, cols=120, spacing_m=250, arterial_every=8, seed=0):
+        """A two-way street grid with faster, wider arterials every `arterial_every` streets.
+
+        Local streets run at 10-25 km/h and arterials at 25-40 km/h; about 5% of local
+        street segments are missing, as around water bodies and blocked lanes.
+        """
+        rng = np.random.default_rng(seed)
+        grid = np.arange(rows * cols).reshape(rows, cols)
+        tails = np.concatenate([grid[:, :-1].ravel(), grid[:-1, :].ravel()])
+        heads = np.concatenate([grid[:, 1:].ravel(), grid[1:, :].ravel()])
+        arterial = np.concatenate([np.repeat(np.arange(rows) % arterial_every == 0, cols - 1),
+                                   np.tile(np.arange(cols) % arterial_every == 0, rows - 1)])
+        keep = arterial | (rng.random(len(tails)) > 0.05)
+        tails, heads, arterial = tails[keep], heads[keep], arterial[keep]
+        speed = np.where(arterial, rng.uniform(25, 40, len(tails)), rng.uniform(10, 25, len(tails)))
+        lanes = np.where(arterial, 2.0, 1.0)
+        length = spacing_m * rng.uniform(1.0, 1.2, len(tails)) # Streets are never quite straight
+        both = lambda array: np.concatenate([array, array])
+        return cls(np.concatenate([tails, heads]), np.concatenate([heads, tails]), both(length), both(speed),
+                   both(lanes), nodes=rows * cols, node_ids=range(rows * cols))
+
+
+class ShortestPathTrees:
+    """Shortest-path trees from a fixed set of source nodes, cached and repaired incrementally.
+
+    `dist[s, v]` is the travel time (s) from `sources[s]` to node v and `pred[s, v]` the
+    last link of that path (-1 at the source and at unreachable nodes). All trees are
+    grown together by vectorized label correcting: each round relaxes every link leaving
+    the (tree, node) pairs that improved in the previous round, and keeps the best
+    candidate per pair with `np.minimum.at`. Trees are built `batch` sources at a time
+    to bound the temporaries. After link changes, `update` only propagates improvements
+    from the links that got cheaper, so upgrades and new links touch just the part of
+    each tree they improve; trees that use a link that got dearer are rebuilt. Memory
+    is 16 bytes per (source, node).
+    """
+    REBUILD_SHARE = 0.05 # Rebuild every tree when more than this share of the links changed
+
+    def __init__(self, network, sources, weights=None, batch=256):
+        self.network = network
+        self.sources = np.asarray(sources, dtype=np.intp)
+        self.batch = batch
+        self.weights = network.free_flow_time() if weights is None else np.asarray(weights, dtype=float)
+        self.dist = np.full((len(self.sources), network.nodes), np.inf)
+        self.pred = np.full((len(self.sources), network.nodes), -1, dtype=np.intp)
+        self._shared = False
+        self._build(np.arange(len(self.sources)))
+
+    def fork(self):
+        """Copy that shares the trees until either side updates them."""
+        self._shared = True
+        return copy.copy(self)
+
+    def _build(self, rows):
+        for lo in range(0, len(rows), self.batch):
+            block = rows[lo:lo + self.batch]
+            dist = np.full((len(block), self.network.nodes), np.inf)
+            pred = np.full(dist.shape, -1, dtype=np.intp)
+            seeds = np.arange(len(block)) * self.network.nodes + self.sources[block]
+            self._relax(dist, pred, seeds, np.zeros(len(block)), np.full(len(block), -1))
+            self.dist[block], self.pred[block] = dist, pred
+
+    def _relax(self, dist, pred, keys, candidates, links):
+        """Applies candidate (flat tree * node key, time, link) improvements and propagates them."""
+        nodes = self.network.nodes
+        flat_dist, flat_pred = dist.reshape(-1), pred.reshape(-1)
+        indptr, csr_links, csr_heads, weights = self.network.indptr, self.network.csr_links, self.network.csr_heads, self.weights
+        while len(keys):
+            better = candidates < flat_dist[keys]
+            keys, candidates, links = keys[better], candidates[better], links[better]
+            np.minimum.at(flat_dist, keys, candidates)
+            won = candidates == flat_dist[keys] # Ties are equally short: any winner will do
+            keys, links = keys[won], links[won]
+            flat_pred[keys] = links
+            # Every link leaving an improved node is a candidate for the next round
+            rows, tails = np.divmod(keys, nodes)
+            starts = indptr[tails]
+            counts = indptr[tails + 1] - starts
+            positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            links = csr_links[positions]
+            candidates = np.repeat(flat_dist[keys], counts) + weights[links]
+            keys = np.repeat(rows * nodes, counts) + csr_heads[positions]
+
+    def update(self, weights=None):
+        """Re-weights the links (default: current free-flow times) and repairs the trees.
+
+        Returns {'rebuilt': trees rebuilt, 'repaired': trees improved in place}.
+        """
+        network = self.network
+        weights = network.free_flow_time() if weights is None else np.asarray(weights, dtype=float)
+        old = np.full(network.links, np.inf) # Links added since the last update count as infinitely slow before
+        old[:len(self.weights)] = self.weights
+        if self._shared:
+            self.dist, self.pred = self.dist.copy(), self.pred.copy()
+            self._shared = False
+        if network.nodes > self.dist.shape[1]:
+            extra = network.nodes - self.dist.shape[1]
+            self.dist = np.pad(self.dist, ((0, 0), (0, extra)), constant_values=np.inf)
+            self.pred = np.pad(self.pred, ((0, 0), (0, extra)), constant_values=-1)
+        self.weights = weights
+
+        if (weights != old).sum() > self.REBUILD_SHARE * network.links:
+            # Broad changes (e.g. congested times everywhere): rebuilding is cheaper than repairing
+            self._build(np.arange(len(self.sources)))
+            return {'rebuilt': len(self.sources), 'repaired': 0}
+
+        # A dearer link only matters to the trees that route through it
+        dearer = np.zeros(network.links + 1, dtype=bool) # Index -1 (no predecessor) stays False
+        dearer[:-1] = weights > old
+        rebuild = np.flatnonzero(dearer[self.pred].any(axis=1)) if dearer.any() else np.array([], dtype=np.intp)
+        if len(rebuild):
+            self._build(rebuild)
+
+        # A cheaper link improves the trees that reach its tail sooner than its head
+        cheaper = np.flatnonzero(weights < old)
+        keep = np.ones(len(self.sources), dtype=bool)
+        keep[rebuild] = False
+        rows = np.flatnonzero(keep)
+        repaired = 0
+        if len(cheaper) and len(rows):
+            candidates = self.dist[np.ix_(rows, network.tails[cheaper])] + weights[cheaper]
+            improves = candidates < self.dist[np.ix_(rows, network.heads[cheaper])]
+            tree, link = np.nonzero(improves)
+            repaired = len(np.unique(tree))
+            self._relax(self.dist, self.pred, rows[tree] * network.nodes + network.heads[cheaper[link]],
+                        candidates[tree, link], cheaper[link])
+        return {'rebuilt': len(rebuild), 'repaired': repaired}
+
+    def times(self, targets):
+        """(source, target) travel times in seconds; inf where a target cannot be reached."""
+        return self.dist[:, targets]
+
+
+class CommuteNetwork:
+    """A city's road network with zone centroids and cached zone-to-zone travel times.
+
+    The shortest-path trees from every zone are grown on first use (the warm-up); after
+    that, travel times are lookups into a (zone, zone) matrix of minutes. Link upgrades
+    and additions repair the trees incrementally (see ShortestPathTrees). `equilibrate`
+    assigns a zone OD matrix of vehicles to the network (see TrafficAssignment in
+    traffic_assignment.py, configured by `assignment_options`) and keeps the congested
+    travel times alongside the free-flow ones. `trip_shares` spreads trips over the zone
+    pairs with a gravity model of the zones' population and jobs (see TripDistribution
+    in trip_distribution.py; `distribution_options` may also set `beta` and `cutoff`).
+    """
+    def __init__(self, city, network, zone_nodes, zone_names=None, zone_population=None, zone_jobs=None,
+                 assignment_options=None, distribution_options=None):
+        self.city = city
+        self.network = network
+        self.zone_nodes = np.asarray(zone_nodes, dtype=np.intp)
+        self.zone_names = list(zone_names) if zone_names is not None else [f"zone {i}" for i in range(len(self.zone_nodes))]
+        self._zone_positions = {name: i for i, name in enumerate(self.zone_names)}
+        self.zone_population = self.zone_jobs = np.ones(self.zones) # Equal in every zone unless given
+        self.set_zone_totals(zone_population, zone_jobs)
+        self.assignment_options = dict(assignment_options or {})
+        self.distribution_options = dict(distribution_options or {})
+        self.trees = None
+        self.assignment = None
+        self.distribution = None
+        self._minutes = None
+        self._congested = None
+
+    @classmethod
+    def from_files(cls, city, edge_path, zone_path, **options):
+        """Network from an edge file and zones from a CSV with columns zone and node (an edge file node id).
+
+        Optional zone columns `population` and `jobs` give the gravity model's zone totals.
+        """
+        network = RoadNetwork.from_edge_file(edge_path)
+        positions = {node_id: i for i, node_id in enumerate(network.node_ids)}
+        zones = _csv_rows(zone_path)
+        totals = {column: [float(row[column]) for row in zones] if zones and column in zones[0] else None
+                  for column in ('population', 'jobs')}
+        return cls(city, network, [positions[row['node']] for row in zones], [row['zone'] for row in zones],
+                   zone_population=totals['population'], zone_jobs=totals['jobs'], **options)
+
+    @classmethod
+    def synthetic(cls, city='Dhaka', rows=120, cols=120, zone_every=4, seed=0, **options):
+        """A synthetic street grid with a zone centroid every `zone_every` intersections each way.
+
+        Zone population falls off gently from the centre of the grid and jobs more
+        steeply, as in a monocentric city.
+        """
+        network = RoadNetwork.synthetic(rows, cols, seed=seed, **options)
+        grid = np.arange(rows * cols).reshape(rows, cols)
+        offset = zone_every // 2
+        zone_rows, zone_cols = np.meshgrid(np.arange(offset, rows, zone_every), np.arange(offset, cols, zone_every),
+                                           indexing='ij')
+        centre = np.hypot(zone_rows - rows / 2, zone_cols - cols / 2).ravel() / max(rows, cols)
+        rng = np.random.default_rng(seed)
+        population = rng.lognormal(0, 0.3, len(centre)) * np.exp(-centre / 0.6) * 1e4
+        jobs = rng.lognormal(0, 0.6, len(centre)) * np.exp(-centre / 0.35) * 1e4
+        return cls(city, network, grid[offset::zone_every, offset::zone_every].ravel(),
+                   zone_population=population, zone_jobs=jobs)
+
+    def write_files(self, directory):
+        """Writes edges.csv and zones.csv, e.g. to reload a synthetic network with from_files."""
+        os.makedirs(directory, exist_ok=True)
+        self.network.write_edge_file(os.path.join(directory, 'edges.csv'))
+        with open(os.path.join(directory, 'zones.csv'), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['zone', 'node', 'population', 'jobs'])
+            for name, node, population, jobs in zip(self.zone_names, self.zone_nodes, self.zone_population, self.zone_jobs):
+                writer.writerow([name, self.network.node_ids[node], f"{population:g}", f"{jobs:g}"])
+
+    @property
+    def zones(self):
+        return len(self.zone_nodes)
+
+    def fork(self):
+        twin = copy.copy(self)
+        twin.network = self.network.fork()
+        twin.trees = self.trees.fork() if self.trees is not None else None
+        if twin.trees is not None:
+            twin.trees.network = twin.network
+        if self.assignment is not None: # Its flows are replaced, never written into, so the copies share them
+            twin.assignment = copy.copy(self.assignment)
+            twin.assignment.network = twin.network
+        if self.distribution is not None: # Likewise its balancing factors
+            twin.distribution = copy.copy(self.distribution)
+        return twin
+
+    def warm_up(self):
+        if self.trees is None:
+            self.trees = ShortestPathTrees(self.network, self.zone_nodes)
+            self._minutes = None
+        return self
+
+    def travel_times(self, congested=False):
+        """(origin zone, destination zone) travel times in minutes; inf if unreachable.
+
+        Free-flow times by default; with `congested`, the times at the last equilibrium.
+        """
+        if congested:
+            if self._congested is None:
+                raise ValueError(f"No traffic equilibrium for the {self.city} network since it last changed")
+            return self._congested
+        if self._minutes is None:
+            self._minutes = self.warm_up().trees.times(self.zone_nodes) / 60
+        return self._minutes
+
+    def travel_time(self, origin, destination):
+        """Minutes between two zones, given by name or position."""
+        origin = self._zone_positions.get(origin, origin)
+        destination = self._zone_positions.get(destination, destination)
+        return float(self.travel_times()[origin, destination])
+
+    def mean_travel_time(self, weights=None, congested=False):
+        """Mean minutes over reachable pairs of distinct zones, weighted by a (zone, zone) SparseOD if given."""
+        times = self.travel_times(congested)
+        if weights is None:
+            usable = np.isfinite(times)
+            np.fill_diagonal(usable, False)
+            return float(times[usable].mean())
+        rows = weights.expand_rows(np.arange(self.zones))
+        times = times[rows, weights.columns]
+        usable = np.isfinite(times) & (rows != weights.columns)
+        return float((times[usable] * weights.values[usable]).sum() / weights.values[usable].sum())
+
+    # --- Demand and congestion ---
+    def set_zone_totals(self, population=None, jobs=None):
+        """Sets the zones' population and/or jobs, the gravity model's trip origins and destinations."""
+        if population is not None:
+            self.zone_population = np.asarray(population, dtype=float)
+        if jobs is not None:
+            self.zone_jobs = np.asarray(jobs, dtype=float)
+        if len(self.zone_population) != self.zones or len(self.zone_jobs) != self.zones:
+            raise ValueError("Zone population and jobs need one value per zone")
+
+    def grow(self, factor):
+        """Scales the city's zone population and jobs by `factor` (e.g. a year's city growth).
+
+        Jobs scale uniformly. New residents settle in proportion to each zone's population
+        times its access to jobs (the jobs it reaches, weighted by the gravity model's
+        deterrence), so well-connected zones gain population share, all the more after a
+        road upgrade, and the trip balance drifts. A decline is spread uniformly.
+        """
+        population = self.zone_population
+        growth = population.sum() * (factor - 1)
+        if growth > 0:
+            from trip_distribution import DEFAULT_BETA
+            deterrence = self._distribution().deterrence
+            # Rows are stored relative to each zone's nearest destination (see gravity_deterrence)
+            nearest = (self.travel_times() + np.diag(np.full(self.zones, np.inf))).min(axis=1)
+            beta = self.distribution_options.get('beta', DEFAULT_BETA)
+            scale = np.exp(-beta * np.where(np.isfinite(nearest), nearest, 0))
+            access = deterrence.row_sums(deterrence.values * self.zone_jobs[deterrence.columns]) * scale
+            weights = population * access
+            if weights.sum() > 0:
+                population = population + growth * weights / weights.sum()
+            else:
+                population = population * factor
+        else:
+            population = population * factor
+        self.set_zone_totals(population, self.zone_jobs * factor)
+
+    def _distribution(self):
+        if self.distribution is None:
+            from trip_distribution import TripDistribution
+            options = {key: value for key, value in self.distribution_options.items() if key not in ('beta', 'cutoff')}
+            self.distribution = TripDistribution(self._deterrence(), **options)
+        return self.distribution
+
+    def _deterrence(self):
+        from trip_distribution import gravity_deterrence
+        options = {key: self.distribution_options[key] for key in ('beta', 'cutoff') if key in self.distribution_options}
+        minutes = self.travel_times()
+        return gravity_deterrence(lambda lo, hi: minutes[lo:hi], self.zones, **options)
+
+    def trip_shares(self):
+        """SparseOD of the (origin zone, destination zone) shares of the trips between distinct zones.
+
+        A doubly-constrained gravity model on the free-flow times: trips leave zones in
+        proportion to their population and arrive in proportion to their jobs. The balance
+        is cached until the zone totals' shares drift or the network changes.
+        """
+        trips = self._distribution().balance(self.zone_population, self.zone_jobs)
+        total = trips.values.sum()
+        return trips.with_values(trips.values / total) if total > 0 else trips
+
+    def equilibrate(self, demand):
+        """Assigns a (zone, zone) SparseOD of vehicles (PCU per hour) to the network; returns the Equilibrium.
+
+        Each call starts from the previous equilibrium, so yearly calls take a few iterations.
+        """
+        result = self._assignment().assign(demand)
+        self._congested = result.zone_times / 60
+        return result
+
+    def _assignment(self):
+        if self.assignment is None:
+            from traffic_assignment import TrafficAssignment
+            self.assignment = TrafficAssignment(self.network, self.zone_nodes, **self.assignment_options)
+        self.assignment.network = self.network
+        return self.assignment
+
+    # --- Network changes ---
+    LINK_FIELDS = ('tails', 'heads', 'length_m', 'speed_kmh', 'lanes')
+
+    def link_arrays(self):
+        """{field: per-link array}, e.g. to checkpoint a network that has been changed.
+
+        Also holds the zone totals, the trip distribution's balancing factors and the zone
+        totals they fit, and the last equilibrium's link `flows` and zone `demand` (the
+        values of its SparseOD, with `demand_indptr` and `demand_columns`) once there are ones.
+        """
+        arrays = {field: getattr(self.network, field) for field in self.LINK_FIELDS}
+        arrays['zone_population'], arrays['zone_jobs'] = self.zone_population, self.zone_jobs
+        distribution = self.distribution
+        if distribution is not None and distribution.fitted_origins is not None:
+            arrays['row_factors'], arrays['column_factors'] = distribution.row_factors, distribution.column_factors
+            arrays['fitted_origins'], arrays['fitted_destinations'] = (distribution.fitted_origins,
+                                                                       distribution.fitted_destinations)
+        if self.assignment is not None and self.assignment.flows is not None:
+            demand = self.assignment.demand
+            arrays['flows'], arrays['demand'] = self.assignment.flows, demand.values
+            arrays['demand_indptr'], arrays['demand_columns'] = demand.indptr, demand.columns
+        return arrays
+
+    def restore(self, arrays):
+        """Adopts saved link arrays (from link_arrays) and repairs the travel times."""
+        network = self.network
+        for field in self.LINK_FIELDS:
+            setattr(network, field, np.asarray(arrays[field]))
+        top = int(max(network.tails.max(initial=-1), network.heads.max(initial=-1))) + 1
+        if top > len(network.node_ids):
+            network.node_ids = list(network.node_ids) + list(range(len(network.node_ids), top))
+        network._build()
+        if 'zone_population' in arrays:
+            self.set_zone_totals(np.array(arrays['zone_population']), np.array(arrays['zone_jobs']))
+        stats = self._changed()
+        if 'row_factors' in arrays: # The next balance continues from the saved fit, as it would have
+            distribution = self._distribution()
+            for field in ('row_factors', 'column_factors', 'fitted_origins', 'fitted_destinations'):
+                setattr(distribution, field, np.array(arrays[field]))
+        if 'flows' in arrays or self.assignment is not None:
+            # The next equilibrium starts from the saved one (or from scratch if there was none)
+            from trip_distribution import SparseOD
+            assignment = self._assignment()
+            assignment.flows = np.array(arrays['flows']) if 'flows' in arrays else None
+            assignment.demand = (SparseOD(np.array(arrays['demand_indptr']), np.array(arrays['demand_columns']),
+                                          np.array(arrays['demand']), self.zones) if 'flows' in arrays else None)
+        return stats
+
+    def _changed(self):
+        if self.trees is not None:
+            self.trees.network = self.network
+            stats = self.trees.update()
+        else:
+            stats = {'rebuilt': 0, 'repaired': 0}
+        self._minutes = None
+        self._congested = None
+        if self.distribution is not None: # Rebalanced from its current factors on the next trip_shares
+            self.distribution.set_deterrence(self._deterrence())
+        return stats
+
+    def upgrade_links(self, links, speed_kmh=None, lanes=None):
+        """Upgrades links and repairs the travel times; returns the tree repair counts."""
+        self.network.upgrade_links(links, speed_kmh, lanes)
+        return self._changed()
+
+    def add_links(self, tails, heads, length_m, speed_kmh, lanes=1):
+        """Adds links and repairs the travel times; returns the new link ids and the tree repair counts."""
+        links = self.network.add_links(tails, heads, length_m, speed_kmh, lanes)
+        return links, self._changed()
+
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Time the zone-to-zone travel time engine of a city road network.")
+    parser.add_argument('--edges', help="Edge CSV (from, to, length_m, speed_kmh[, lanes][, oneway])")
+    parser.add_argument('--zones', help="Zone CSV (zone, node)")
+    parser.add_argument('--size', type=int, default=120, help="Intersections per side of the synthetic grid")
+    parser.add_argument('--zone-every', type=int, default=4)
+    parser.add_argument('--write', metavar='DIR', help="Write the network as edges.csv and zones.csv to DIR")
+    args = parser.parse_args()
+
+    if args.edges:
+        city = CommuteNetwork.from_files('Dhaka', args.edges, args.zones)
+    else:
+        city = CommuteNetwork.synthetic(rows=args.size, cols=args.size, zone_every=args.zone_every)
+    if args.write:
+        city.write_files(args.write)
+    print(f"{city.network.nodes:,} nodes, {city.network.links:,} links, {city.zones:,} zones")
+    start = time.perf_counter()
+    city.warm_up()
+    times = city.travel_times()
+    print(f"warm-up (trees from every zone): {time.perf_counter() - start:.2f} s, "
+          f"mean zone-to-zone time {city.mean_travel_time():.1f} min")
+    rng = np.random.default_rng(0)
+    pairs = rng.integers(city.zones, size=(10000, 2))
+    start = time.perf_counter()
+    for origin, destination in pairs:
+        city.travel_time(origin, destination)
+    print(f"10,000 single queries: {(time.perf_counter() - start) * 1e3:.1f} ms")
+    # Upgrade a stretch of street links to a 50 km/h corridor
+    corridor = rng.choice(city.network.links, size=200, replace=False)
+    start = time.perf_counter()
+    stats = city.upgrade_links(corridor, speed_kmh=50)
+    print(f"upgrading {len(corridor)} links: {time.perf_counter() - start:.2f} s "
+          f"({stats['repaired']} trees repaired, {stats['rebuilt']} rebuilt), "
+          f"mean time now {city.mean_travel_time():.1f} min")
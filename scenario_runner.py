@@ -0,0 +1,115 @@
+import argparse
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config_compiler import compile_config
+from main_simulation import BangladeshUrbanDevelopmentSimulation, RECORDED_INDICATORS, generate_synthetic_config
+from scenarios import BASELINE, example_scenarios
+
+def job_seed(root_seed, scenario_name, seed_index):
+    """Independent RNG stream for one (scenario, seed) job.
+
+    The stream is keyed by the scenario name and seed index rather than by job position,
+    so it does not depend on how many workers run the jobs, in which order they finish,
+    or which other scenarios are part of the batch.
+    """
+    return np.random.SeedSequence(root_seed, spawn_key=(zlib.crc32(scenario_name.encode('utf-8')), seed_index))
+
+
+class YearRecorder:
+    """Minimal analysis engine that snapshots the recorded indicators as arrays each year"""
+    def __init__(self, simulation, indicators=RECORDED_INDICATORS):
+        self.sim = simulation
+        self.indicators = indicators
+        self.years = []
+        self.snapshots = []
+
+    def record_state(self, year):
+        columns = [getattr(self.sim, model).state.column(column) for model, column in self.indicators.values()]
+        self.years.append(year)
+        self.snapshots.append(np.stack(columns, axis=-1)) # (replicate, city, indicator) copy
+
+    def coverage(self):
+        return np.stack([getattr(self.sim, model).state.covered(column) for model, column in self.indicators.values()], axis=-1)
+
+    @property
+    def values(self):
+        return np.stack(self.snapshots) # (year, replicate, city, indicator)
+
+
+def _run_job(config, scenario, seed_sequence, years, replicates, land_grid=None, road_networks=()):
+    """Worker entry point: run one scenario with one seed and return its yearly indicator arrays."""
+    simulation = BangladeshUrbanDevelopmentSimulation(config, seed=seed_sequence, land_grid=land_grid,
+                                                      road_networks=road_networks)
+    recorder = YearRecorder(simulation)
+    simulation.run_simulation(recorder, years=years, scenarios=scenario, replicates=replicates)
+    return recorder.years, recorder.values, recorder.coverage(), simulation.city_index.names
+
+
+class ScenarioResults:
+    """Yearly indicator arrays for every (scenario, seed) job gathered into one store.
+
+    `values` has shape (scenario, seed, year, replicate, city, indicator); `coverage`
+    (city x indicator) marks which cities actually carry data for each indicator.
+    """
+    def __init__(self, scenario_names, seeds, years, cities, indicators, values, coverage):
+        self.scenario_names = list(scenario_names)
+        self.seeds = seeds
+        self.years = list(years)
+        self.cities = list(cities)
+        self.indicators = list(indicators)
+        self.values = values
+        self.coverage = coverage
+
+    def trajectory(self, scenario, indicator, city):
+        """(seed, year, replicate) array of one indicator for one city under one scenario."""
+        return self.values[self.scenario_names.index(scenario), :, :, :,
+                           self.cities.index(city), self.indicators.index(indicator)]
+
+
+def run_scenarios(config, scenarios=None, seeds=1, years=10, replicates=1, root_seed=0, max_workers=None,
+                  land_grid=None, road_networks=()):
+    """Fans (scenario, seed) jobs out across a process pool and gathers their results.
+
+    Each job gets its own RNG stream spawned from `root_seed` (see `job_seed`), so the
+    gathered results are bit-for-bit identical for any `max_workers`. An optional
+    `land_grid` and `road_networks` (needed by scenarios with a RoadUpgrade) are sent to
+    every job, which simulates on its own copy.
+    """
+    scenarios = scenarios or [BASELINE]
+    names = [scenario.name for scenario in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Scenario names must be unique: {names}")
+
+    config = compile_config(config) # Workers memory-map the cached file instead of unpickling dicts
+    jobs = [(s, k) for s in range(len(scenarios)) for k in range(seeds)]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_run_job, config, scenarios[s], job_seed(root_seed, names[s], k), years, replicates,
+                                   land_grid, road_networks)
+                   for s, k in jobs]
+        outputs = [future.result() for future in futures]
+
+    year_list, first_values, coverage, cities = outputs[0]
+    values = np.empty((len(scenarios), seeds) + first_values.shape)
+    for (s, k), (_, job_values, _, _) in zip(jobs, outputs):
+        values[s, k] = job_values
+    return ScenarioResults(names, seeds, year_list, cities, RECORDED_INDICATORS, values, coverage)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run policy scenarios x seeds in parallel.")
+    parser.add_argument('--seeds', type=int, default=8, help="Independent seeds per scenario")
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--replicates', type=int, default=1, help="Ensemble members per job")
+    parser.add_argument('--root-seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size (default: CPU count)")
+    args = parser.parse_args()
+
+    results = run_scenarios(generate_synthetic_config(), example_scenarios(), seeds=args.seeds, years=args.years,
+                            replicates=args.replicates, root_seed=args.root_seed, max_workers=args.workers)
+    final_year = results.years[-1]
+    print(f"Mean Dhaka AQI in {final_year} by scenario:")
+    for name in results.scenario_names:
+        print(f"  {name:<16} {results.trajectory(name, 'aqi', 'Dhaka')[:, -1].mean():.1f}")
@@ -0,0 +1,235 @@
+import argparse
+import contextlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config_compiler import compile_config
+from main_simulation import BangladeshUrbanDevelopmentSimulation, RECORDED_INDICATORS, generate_synthetic_config
+from scenario_runner import ScenarioResults, YearRecorder, job_seed
+from scenarios import BASELINE, Scenario, example_scenarios
+
+class ScenarioNode:
+    """One branch of a scenario tree: the interventions applied at `year` and everything that follows"""
+    def __init__(self, year=None, interventions=()):
+        self.year = year
+        self.interventions = list(interventions)
+        self.children = {} # (year, intervention keys) -> ScenarioNode
+        self.scenarios = [] # Scenarios with no further interventions below this node
+
+    def branches(self):
+        return sorted(self.children.values(), key=lambda child: child.year)
+
+    def scenario_names(self):
+        names = list(self.scenarios)
+        for child in self.branches():
+            names.extend(child.scenario_names())
+        return names
+
+
+class ScenarioTree:
+    """Trie of scenarios keyed by their intervention batches, year by year.
+
+    Two scenarios share a node for as long as they apply the same interventions in the
+    same years, so their common prefix is simulated once and the state only branches
+    in the year their interventions first differ. Interventions outside the simulated
+    horizon never take effect and are ignored.
+    """
+    def __init__(self, scenarios, start_year, end_year):
+        self.start_year = start_year
+        self.end_year = end_year
+        self.root = ScenarioNode()
+        self.scenario_names = []
+        for scenario in scenarios:
+            if scenario.name in self.scenario_names:
+                raise ValueError(f"Duplicate scenario name: {scenario.name!r}")
+            self.scenario_names.append(scenario.name)
+            node = self.root
+            years = sorted({intervention.start_year for intervention in scenario.interventions
+                            if start_year <= intervention.start_year < end_year})
+            for year in years:
+                batch = scenario.interventions_for(year)
+                key = (year, tuple(sorted((intervention.key() for intervention in batch), key=repr)))
+                if key not in node.children:
+                    node.children[key] = ScenarioNode(year, batch)
+                node = node.children[key]
+            node.scenarios.append(scenario.name)
+
+    def trunk_end(self, node):
+        """Last year the state of `node` itself has to be simulated."""
+        if node.scenarios:
+            return self.end_year - 1
+        return max(child.year for child in node.branches()) - 1
+
+    def simulated_years(self, node=None, first_year=None):
+        """Model-years simulated by a tree run (compare with scenarios x years for independent runs)."""
+        node = node or self.root
+        first_year = self.start_year if first_year is None else first_year
+        own = max(0, self.trunk_end(node) - first_year + 1)
+        return own + sum(self.simulated_years(child, child.year) for child in node.branches())
+
+    def describe(self, node=None, depth=0):
+        node = node or self.root
+        lines = []
+        for child in node.branches():
+            lines.append("  " * depth + f"{child.year}: {child.interventions}" +
+                         (f" -> {child.scenarios}" if child.scenarios else ""))
+            lines.extend(self.describe(child, depth + 1))
+        return lines
+
+
+def _advance(simulation, recorder, last_year, interventions=()):
+    """Simulates up to and including `last_year`, applying `interventions` in their start years."""
+    years = last_year - simulation.current_year
+    if years > 0:
+        simulation.run_simulation(recorder, years=years, scenarios=Scenario('branch', interventions))
+
+
+def _copy_recorder(recorder, simulation):
+    copy = YearRecorder(simulation, recorder.indicators)
+    copy.years = list(recorder.years) # Shared prefix: the yearly arrays themselves are not copied
+    copy.snapshots = list(recorder.snapshots)
+    return copy
+
+
+def _fork(simulation, recorder):
+    branch = simulation.fork()
+    return branch, _copy_recorder(recorder, branch)
+
+
+def _run_node(tree, node, simulation, recorder, results):
+    """Runs a subtree in-process, forking the state wherever branches diverge.
+
+    The interventions of `node` itself take effect in its first simulated year. Results
+    are collected as {scenario name: YearRecorder}.
+    """
+    pending = node.interventions
+    branches = node.branches()
+    for i, child in enumerate(branches):
+        _advance(simulation, recorder, child.year - 1, pending)
+        pending = []
+        if i == len(branches) - 1 and not node.scenarios:
+            _run_node(tree, child, simulation, recorder, results) # The last branch takes over the trunk
+        else:
+            _run_node(tree, child, *_fork(simulation, recorder), results)
+    if node.scenarios:
+        _advance(simulation, recorder, tree.end_year - 1, pending)
+        for name in node.scenarios:
+            results[name] = recorder
+
+
+def _run_subtree(config, tree, node, checkpoint_path, land_grid=None, road_networks=()):
+    """Worker entry point: resume from a checkpoint and run one subtree serially."""
+    simulation = BangladeshUrbanDevelopmentSimulation.from_checkpoint(config, checkpoint_path, land_grid=land_grid,
+                                                                      road_networks=road_networks)
+    recorder = YearRecorder(simulation)
+    results = {}
+    _run_node(tree, node, simulation, recorder, results)
+    return {name: (recorder.years, recorder.values) for name, recorder in results.items()}
+
+
+def _run_tree(config, tree, seed_sequence, replicates, executor, workdir, tag, land_grid=None, road_networks=()):
+    """Runs the trunk in this process and hands every subtree below the first split to `executor`.
+
+    Returns {scenario: YearRecorder or (prefix recorder, future)} plus the trunk's coverage.
+    The trunk simulates on forks of `land_grid` and `road_networks`, leaving them as given.
+    """
+    simulation = BangladeshUrbanDevelopmentSimulation(
+        config, seed=seed_sequence, land_grid=land_grid.fork() if land_grid is not None else None,
+        road_networks=[network.fork() for network in road_networks])
+    simulation.set_replicates(replicates)
+    recorder = YearRecorder(simulation)
+    node = tree.root
+    pending = []
+    # Follow the tree in-process while it has not split yet
+    while not node.scenarios and len(node.children) == 1:
+        node = node.branches()[0]
+        _advance(simulation, recorder, node.year - 1, pending)
+        pending = node.interventions
+    results = {}
+    checkpoints = {}
+    for child in node.branches():
+        _advance(simulation, recorder, child.year - 1, pending)
+        pending = []
+        if executor is None:
+            _run_node(tree, child, *_fork(simulation, recorder), results)
+            continue
+        if simulation.current_year not in checkpoints: # Branches diverging in the same year share one
+            path = os.path.join(workdir, f"{tag}_{simulation.current_year}.ckpt")
+            simulation.save_checkpoint(path)
+            checkpoints[simulation.current_year] = (path, _copy_recorder(recorder, simulation))
+        path, prefix = checkpoints[simulation.current_year]
+        future = executor.submit(_run_subtree, config, tree, child, path, land_grid, road_networks)
+        for name in child.scenario_names():
+            results[name] = (prefix, future)
+    if node.scenarios: # The trunk itself continues while the workers run the branches
+        _advance(simulation, recorder, tree.end_year - 1, pending)
+        for name in node.scenarios:
+            results[name] = recorder
+    return results, recorder.coverage(), simulation.city_index.names
+
+
+def _trajectory(result, name):
+    """(year list, yearly values) of one scenario, stitching worker results onto the shared prefix."""
+    if isinstance(result, YearRecorder):
+        return result.years, result.values
+    prefix, future = result
+    years, values = future.result()[name]
+    if not prefix.years:
+        return years, values
+    return prefix.years + years, np.concatenate([np.stack(prefix.snapshots), values])
+
+
+def run_scenario_tree(config, scenarios, years=10, seeds=1, replicates=1, root_seed=0, max_workers=None,
+                      land_grid=None, road_networks=()):
+    """Runs every scenario as a branch of one scenario tree per seed.
+
+    All scenarios of a seed start from the same simulation and RNG streams (common random
+    numbers), so a scenario's result is identical to running it alone with that seed;
+    shared prefixes are simulated once. Seed k's streams are those `run_scenarios` gives
+    the baseline's k-th job (see `job_seed`), so the baseline matches it exactly. `max_workers=1` runs everything in-process,
+    otherwise subtrees are resumed from checkpoints in a process pool. An optional
+    `land_grid` and `road_networks` (needed by scenarios with a RoadUpgrade) are the
+    starting grid and networks of every seed's tree; workers restore into copies of them.
+    """
+    start_year = BangladeshUrbanDevelopmentSimulation.START_YEAR
+    tree = ScenarioTree(scenarios, start_year, start_year + years)
+    names = tree.scenario_names
+    config = compile_config(config) # Workers memory-map the cached file instead of unpickling dicts
+    with contextlib.ExitStack() as stack:
+        workdir = stack.enter_context(tempfile.TemporaryDirectory(prefix='scenario_tree_'))
+        executor = None if max_workers == 1 else stack.enter_context(ProcessPoolExecutor(max_workers=max_workers))
+        runs = [_run_tree(config, tree, job_seed(root_seed, BASELINE.name, k), replicates,
+                          executor, workdir, f"seed{k}", land_grid, road_networks)
+                for k in range(seeds)]
+        values = None
+        for k, (results, coverage, cities) in enumerate(runs):
+            for s, name in enumerate(names):
+                year_list, trajectory = _trajectory(results[name], name)
+                if values is None:
+                    values = np.empty((len(names), seeds) + trajectory.shape)
+                values[s, k] = trajectory
+    return ScenarioResults(names, seeds, year_list, cities, RECORDED_INDICATORS, values, coverage), tree
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run policy scenarios as a tree that shares common prefixes.")
+    parser.add_argument('--seeds', type=int, default=1)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--replicates', type=int, default=1, help="Ensemble members per run")
+    parser.add_argument('--root-seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size (1 runs in-process)")
+    args = parser.parse_args()
+
+    scenarios = example_scenarios()
+    results, tree = run_scenario_tree(generate_synthetic_config(), scenarios, years=args.years, seeds=args.seeds,
+                                      replicates=args.replicates, root_seed=args.root_seed, max_workers=args.workers)
+    print("Scenario tree:")
+    print("\n".join("  " + line for line in tree.describe()))
+    print(f"Simulated {tree.simulated_years()} model-years per seed instead of {len(scenarios) * args.years}")
+    final_year = results.years[-1]
+    print(f"Mean Dhaka AQI in {final_year} by scenario:")
+    for name in results.scenario_names:
+        print(f"  {name:<16} {results.trajectory(name, 'aqi', 'Dhaka')[:, -1].mean():.1f}")
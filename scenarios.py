@@ -0,0 +1,114 @@
+import numpy as np
+
+class PolicyIntervention:
+    """A one-off change to a model indicator that takes effect at the start of a given year.
+
+    `model` is the simulation attribute holding the component (e.g. 'urban_transport') and
+    `indicator` a column of its state table (e.g. 'public_transit_coverage'). Exactly one of
+    `value` (set), `multiplier` (scale) or `delta` (add) describes the change; `cities`
+    restricts it to some cities (default: every city the indicator covers).
+    """
+    def __init__(self, start_year, model, indicator, value=None, multiplier=None, delta=None, cities=None):
+        if sum(change is not None for change in (value, multiplier, delta)) != 1:
+            raise ValueError("Specify exactly one of value, multiplier or delta")
+        self.start_year = start_year
+        self.model = model
+        self.indicator = indicator
+        self.value = value
+        self.multiplier = multiplier
+        self.delta = delta
+        self.cities = tuple(cities) if cities else None
+
+    def __repr__(self):
+        change = (f"={self.value}" if self.value is not None else
+                  f"*{self.multiplier}" if self.multiplier is not None else f"+{self.delta}")
+        where = f" in {', '.join(self.cities)}" if self.cities else ""
+        return f"PolicyIntervention({self.start_year}: {self.model}.{self.indicator}{change}{where})"
+
+    def key(self):
+        """Hashable identity used to recognise the same intervention in different scenarios."""
+        return (self.start_year, self.model, self.indicator, self.value, self.multiplier, self.delta, self.cities)
+
+    def apply(self, simulation):
+        table = getattr(simulation, self.model).state
+        where = table.covered(self.indicator).copy()
+        if self.cities is not None:
+            selected = np.zeros_like(where)
+            for city in self.cities:
+                if city in table.index:
+                    selected[table.index.position(city)] = True
+            where &= selected
+        table.begin_step() # Interventions are published before the year's models read them
+        current = table.column(self.indicator)
+        if self.value is not None:
+            new_values = np.full_like(current, self.value)
+        elif self.multiplier is not None:
+            new_values = current * self.multiplier
+        else:
+            new_values = current + self.delta
+        table.assign(self.indicator, new_values, where)
+        table.commit()
+
+
+class RoadUpgrade:
+    """Upgrades links of a city's road network at the start of a given year.
+
+    `links` are link ids of the city's CommuteNetwork; `speed_kmh` and/or `lanes` give
+    their new speed limit and lane count. The network's travel times are repaired
+    incrementally, so only the parts of the shortest-path trees it improves are redone.
+    """
+    def __init__(self, start_year, city, links, speed_kmh=None, lanes=None):
+        if speed_kmh is None and lanes is None:
+            raise ValueError("Specify speed_kmh and/or lanes")
+        self.start_year = start_year
+        self.city = city
+        self.links = tuple(int(link) for link in links)
+        self.speed_kmh = speed_kmh
+        self.lanes = lanes
+
+    def __repr__(self):
+        changes = ", ".join(f"{name}={value}" for name, value in (('speed_kmh', self.speed_kmh), ('lanes', self.lanes))
+                            if value is not None)
+        return f"RoadUpgrade({self.start_year}: {len(self.links)} links in {self.city}, {changes})"
+
+    def key(self):
+        return (self.start_year, 'road_upgrade', self.city, self.links, self.speed_kmh, self.lanes)
+
+    def apply(self, simulation):
+        simulation.urban_transport.calibrate() # Fitted to the network as configured, before any upgrade
+        for network in simulation.urban_transport.networks:
+            if network.city == self.city:
+                network.upgrade_links(list(self.links), self.speed_kmh, self.lanes)
+                return
+        raise ValueError(f"The simulation has no road network for {self.city}")
+
+
+class Scenario:
+    """A named set of policy interventions applied on top of the baseline configuration"""
+    def __init__(self, name, interventions=()):
+        self.name = name
+        self.interventions = sorted(interventions, key=lambda intervention: intervention.start_year)
+
+    def __repr__(self):
+        return f"Scenario({self.name!r}, {self.interventions!r})"
+
+    def interventions_for(self, year):
+        return [intervention for intervention in self.interventions if intervention.start_year == year]
+
+
+BASELINE = Scenario('baseline')
+
+def example_scenarios():
+    """A few illustrative policy scenarios for quick comparisons."""
+    return [
+        BASELINE,
+        Scenario('transit_push', [
+            PolicyIntervention(2027, 'urban_transport', 'public_transit_coverage', multiplier=1.25),
+        ]),
+        Scenario('clean_air', [
+            PolicyIntervention(2026, 'urban_environment', 'aqi', multiplier=0.85, cities=['Dhaka', 'Narayanganj']),
+        ]),
+        Scenario('revenue_reform', [
+            PolicyIntervention(2028, 'urban_governance', 'own_revenue', delta=0.1),
+        ]),
+    ]
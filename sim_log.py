@@ -0,0 +1,100 @@
+import collections
+import sys
+import threading
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+
+class Event(collections.namedtuple('Event', 'time level name message fields')):
+    """One structured log record: `message` is a str.format template over `fields`"""
+    __slots__ = ()
+
+    def format(self):
+        return self.message.format(**self.fields)
+
+    def as_dict(self):
+        return {'time': self.time, 'level': LEVEL_NAMES.get(self.level, self.level), 'event': self.name, **self.fields}
+
+
+class EventLogger:
+    """Leveled, structured event logger that costs (almost) nothing while no sink is attached.
+
+    Emitting checks a single threshold before building an Event, and no message is ever
+    formatted by the logger itself: sinks decide whether to render it. Call sites whose
+    fields are expensive to compute guard them with `if LOG.enabled(INFO): ...`.
+    """
+    def __init__(self):
+        self.sinks = []
+        self._threshold = float('inf') # No sinks: every level is disabled
+        self._lock = threading.Lock()
+
+    def enabled(self, level=INFO):
+        return level >= self._threshold
+
+    def add_sink(self, sink):
+        with self._lock:
+            self.sinks = self.sinks + [sink] # Copy-on-write so emitting threads never see a half-updated list
+            self._threshold = min(s.level for s in self.sinks)
+        return sink
+
+    def remove_sink(self, sink):
+        with self._lock:
+            self.sinks = [s for s in self.sinks if s is not sink]
+            self._threshold = min((s.level for s in self.sinks), default=float('inf'))
+
+    def log(self, level, name, message='', **fields):
+        if level < self._threshold:
+            return
+        event = Event(time.time(), level, name, message, fields)
+        for sink in self.sinks:
+            if level >= sink.level:
+                sink.emit(event)
+
+    def debug(self, name, message='', **fields):
+        self.log(DEBUG, name, message, **fields)
+
+    def info(self, name, message='', **fields):
+        self.log(INFO, name, message, **fields)
+
+    def warning(self, name, message='', **fields):
+        self.log(WARNING, name, message, **fields)
+
+    def error(self, name, message='', **fields):
+        self.log(ERROR, name, message, **fields)
+
+
+class ConsoleSink:
+    """Renders events as the familiar console lines (stdout unless another stream is given)"""
+    def __init__(self, level=INFO, stream=None):
+        self.level = level
+        self.stream = stream
+
+    def emit(self, event):
+        stream = self.stream or sys.stdout # Looked up per event so stdout redirection keeps working
+        stream.write(event.format() + "\n")
+
+
+class RingBufferSink:
+    """Keeps the most recent `capacity` events in memory, unformatted, for post-mortem debugging"""
+    def __init__(self, capacity=1000, level=DEBUG):
+        self.level = level
+        self.buffer = collections.deque(maxlen=capacity)
+
+    def emit(self, event):
+        self.buffer.append(event)
+
+    def events(self, name=None):
+        return [event for event in self.buffer if name is None or event.name == name]
+
+    def dump(self, stream=None):
+        stream = stream or sys.stdout
+        for event in self.buffer:
+            stream.write(f"{LEVEL_NAMES.get(event.level, event.level):<7} {event.name}: {event.format().strip()}\n")
+
+
+# Process-wide logger used by the models and the engine; attach sinks to see anything
+LOG = EventLogger()
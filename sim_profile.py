@@ -0,0 +1,134 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+class _NullSpan:
+    """Shared no-op context manager handed out while profiling is off"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'category', 'args', 'start', 'memory')
+
+    def __init__(self, profiler, name, category, args):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.memory = tracemalloc.get_traced_memory()[0] if self.profiler.trace_memory else None
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        allocated = tracemalloc.get_traced_memory()[0] - self.memory if self.memory is not None else None
+        self.profiler.spans.append((self.name, self.category, self.start, end, threading.get_ident(), allocated, self.args))
+        return False
+
+
+class Profiler:
+    """Wall-time (and optionally tracemalloc) spans around the simulation's phases.
+
+    Disabled by default: `span()` then returns a shared no-op context manager after a
+    single attribute check, so the instrumentation can stay in production code paths.
+    `enable()` starts collecting; spans are kept raw and aggregated only on export, as
+    a Chrome trace (chrome://tracing or Perfetto) and as a per-span JSON summary.
+    Allocation deltas are net bytes allocated inside a span (children included).
+    """
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.spans = []
+        self._origin = time.perf_counter_ns()
+        self._started_tracemalloc = False
+
+    def enable(self, trace_memory=False):
+        self.spans = []
+        self._origin = time.perf_counter_ns()
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self.trace_memory = False
+
+    def span(self, name, category='sim', **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category, args)
+
+    def profiled(self, name, category='sim'):
+        """Decorator form of `span` for whole functions."""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, name, category, {}):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    # --- Export ---
+    def summary(self):
+        """{span name: call count, total/mean/max wall time (ms) and allocated bytes}, slowest first."""
+        stats = {}
+        for name, category, start, end, _, allocated, _ in self.spans:
+            entry = stats.setdefault(name, {'category': category, 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                            'allocated_bytes': 0 if allocated is not None else None})
+            elapsed = (end - start) / 1e6
+            entry['calls'] += 1
+            entry['total_ms'] += elapsed
+            entry['max_ms'] = max(entry['max_ms'], elapsed)
+            if allocated is not None:
+                entry['allocated_bytes'] += allocated
+        for entry in stats.values():
+            entry['mean_ms'] = entry['total_ms'] / entry['calls']
+        return dict(sorted(stats.items(), key=lambda item: -item[1]['total_ms']))
+
+    def chrome_trace(self):
+        """Trace Event Format dict: one complete ('X') event per span, timestamps in microseconds."""
+        pid = os.getpid()
+        events = []
+        for name, category, start, end, thread, allocated, args in self.spans:
+            event_args = dict(args)
+            if allocated is not None:
+                event_args['allocated_bytes'] = allocated
+            events.append({'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': thread,
+                           'ts': (start - self._origin) / 1e3, 'dur': (end - start) / 1e3, 'args': event_args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, directory, prefix='profile'):
+        """Writes `<prefix>_trace.json` (Chrome trace) and `<prefix>_summary.json` to `directory`."""
+        os.makedirs(directory, exist_ok=True)
+        trace_path = os.path.join(directory, f"{prefix}_trace.json")
+        summary_path = os.path.join(directory, f"{prefix}_summary.json")
+        with open(trace_path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f, default=str)
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2)
+        return trace_path, summary_path
+
+
+# Process-wide profiler used by the engine's instrumentation points
+PROFILE = Profiler()
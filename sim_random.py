@@ -0,0 +1,35 @@
+import zlib
+
+import numpy as np
+
+def keyed_seed(seed_sequence, name):
+    """Child SeedSequence identified by `name` rather than by spawn order.
+
+    Keying on a stable name keeps every model's stream unchanged when other models are
+    added, removed or reordered.
+    """
+    return np.random.SeedSequence(seed_sequence.entropy,
+                                  spawn_key=tuple(seed_sequence.spawn_key) + (zlib.crc32(name.encode('utf-8')),),
+                                  pool_size=seed_sequence.pool_size)
+
+
+def model_rng(seed_sequence, name):
+    """Independent Generator for one component model under the simulation-level seed."""
+    return np.random.default_rng(keyed_seed(seed_sequence, name))
+
+
+class UniformDraws:
+    """Named uniform ranges drawn together for every (replicate, city) with one generator call"""
+    def __init__(self, ranges):
+        self.names = tuple(ranges)
+        bounds = np.array([ranges[name] for name in self.names], dtype=float)
+        self.low = bounds[:, 0]
+        self.span = bounds[:, 1] - bounds[:, 0]
+
+    def draw(self, rng, shape):
+        """Returns {name: array of `shape`} scaled from a single rng.random() batch."""
+        expand = (slice(None),) + (None,) * len(shape)
+        batch = rng.random((len(self.names),) + tuple(shape))
+        batch *= self.span[expand]
+        batch += self.low[expand]
+        return dict(zip(self.names, batch))
@@ -1,39 +1,75 @@
-import random
+import numpy as np
+
+from sim_random import UniformDraws
+from sim_log import INFO, LOG
+from state_store import CityIndex, StateTable, dense, estimate
 
 class SmartCityModel:
     """Model digital technology application and smart city development in Bangladesh"""
-    def __init__(self, config):
-        self.digital_literacy = config['smart_city']['digital_literacy'].copy()
-        self.adoption_rate = config['smart_city']['smart_service_adoption'].copy()
-        self.iot_density = config['smart_city']['iot_sensor_density'].copy()
+    # Random ranges drawn for every (replicate, city) in one batched call per step
+    DRAWS = UniformDraws({
+        'literacy_improvement': (0.008, 0.025),
+        'adoption_improvement': (0.015, 0.04),
+        'iot_growth': (0.08, 0.20),
+    })
+
+    # State passed to simulate_step after the year, and the state this model writes (with its getter)
+    STATE_READS = ('infrastructure', 'social')
+    STATE_WRITES = {'smart_city': 'get_smart_city_state'}
+
+    def __init__(self, config, city_index=None, rng=None):
+        self.index = city_index or CityIndex.from_config(config)
+        smart_config = config['smart_city']
+        self.state = StateTable(self.index, columns=('digital_literacy', 'adoption_rate', 'iot_density'))
+        self.state.load('digital_literacy', smart_config['digital_literacy'], default=0.6)
+        self.state.load('adoption_rate', smart_config['smart_service_adoption'], default=0.25)
+        self.state.load('iot_density', smart_config['iot_sensor_density'], default=5)
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.current_year = 2025
-        print("SmartCityModel Initialized")
+        LOG.info('model.init', "{model} Initialized", model='SmartCityModel')
+
+    @property
+    def digital_literacy(self):
+        return self.state.view('digital_literacy')
+
+    @property
+    def adoption_rate(self):
+        return self.state.view('adoption_rate')
+
+    @property
+    def iot_density(self):
+        return self.state.view('iot_density')
 
     def simulate_step(self, year, infrastructure_data, social_data):
         """Simulates the progress of digital literacy, service adoption, and infrastructure rollout."""
-        print(f"  Simulating Smart City Dynamics for year {year}...")
-
-        for city in self.digital_literacy: # Assuming keys exist for all tracked metrics
-            # --- Digital Literacy ---
-            # Factors: Internet penetration (infra), base literacy (social), specific programs (TBD)
-            internet_factor = infrastructure_data.get('internet_penetration', {}).get(city, 0.5)
-            base_literacy_factor = social_data.get('literacy', {}).get(city, 0.7)
-            literacy_improvement = random.uniform(0.008, 0.025) * internet_factor * base_literacy_factor
-            self.digital_literacy[city] = min(0.95, self.digital_literacy.get(city, 0.6) * (1 + literacy_improvement))
-
-            # --- Smart Service Adoption ---
-            # Factors: Digital literacy, availability of e-gov services (governance - TBD), perceived usefulness
-            adoption_improvement = random.uniform(0.015, 0.04) * self.digital_literacy[city] # Driven by digital literacy
-            self.adoption_rate[city] = min(0.9, self.adoption_rate.get(city, 0.25) * (1 + adoption_improvement))
-
-            # --- IoT Sensor Density ---
-            # Factors: Investment (public/private), strategic initiatives (governance - TBD)
-            # Assuming faster, somewhat independent growth initially
-            iot_growth = random.uniform(0.08, 0.20)
-            self.iot_density[city] = self.iot_density.get(city, 5) * (1 + iot_growth)
-
-        print(f"    Dhaka Smart Service Adoption Estimate: {self.adoption_rate.get('Dhaka', 'N/A'):.2f}")
-        print(f"    Chattogram IoT Sensor Density Estimate: {self.iot_density.get('Chattogram', 'N/A'):.1f}")
+        LOG.info('smart_city.step', "  Simulating Smart City Dynamics for year {year}...", year=year)
+        t = self.state
+        draws = self.DRAWS.draw(self.rng, t.shape)
+        active = t.covered('digital_literacy') # Assuming keys exist for all tracked metrics
+
+        # --- Digital Literacy ---
+        # Factors: Internet penetration (infra), base literacy (social), specific programs (TBD)
+        internet_factor = dense(infrastructure_data.get('internet_penetration', {}), self.index, 0.5)
+        base_literacy_factor = dense(social_data.get('literacy', {}), self.index, 0.7)
+        literacy_improvement = draws['literacy_improvement'] * internet_factor * base_literacy_factor
+        t.assign('digital_literacy', np.minimum(0.95, t.column('digital_literacy') * (1 + literacy_improvement)), active)
+
+        # --- Smart Service Adoption ---
+        # Factors: Digital literacy, availability of e-gov services (governance - TBD), perceived usefulness
+        adoption_improvement = draws['adoption_improvement'] * t.column('digital_literacy') # Driven by digital literacy
+        t.assign('adoption_rate', np.minimum(0.9, t.column('adoption_rate') * (1 + adoption_improvement)), active)
+
+        # --- IoT Sensor Density ---
+        # Factors: Investment (public/private), strategic initiatives (governance - TBD)
+        # Assuming faster, somewhat independent growth initially
+        iot_growth = draws['iot_growth']
+        t.assign('iot_density', t.column('iot_density') * (1 + iot_growth), active)
+
+        if LOG.enabled(INFO):
+            LOG.info('smart_city.summary', "    Dhaka Smart Service Adoption Estimate: {dhaka_adoption:.2f}",
+                     year=year, dhaka_adoption=estimate(t.view('adoption_rate', pending=True), 'Dhaka'))
+            LOG.info('smart_city.summary', "    Chattogram IoT Sensor Density Estimate: {chattogram_iot_density:.1f}",
+                     year=year, chattogram_iot_density=estimate(t.view('iot_density', pending=True), 'Chattogram'))
         self.current_year = year
 
     def get_smart_city_state(self):
@@ -41,4 +77,4 @@ class SmartCityModel:
             'digital_literacy': self.digital_literacy,
             'smart_service_adoption': self.adoption_rate,
             'iot_sensor_density': self.iot_density
-        } 
\ No newline at end of file
+        }
@@ -0,0 +1,428 @@
+import copy
+
+import numpy as np
+from collections.abc import Mapping
+
+class CityIndex:
+    """Assign a stable integer position to every city named in the configuration"""
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.positions = {name: i for i, name in enumerate(self.names)}
+
+    @classmethod
+    def from_config(cls, config):
+        """Collects city names from every per-city mapping in the config, in order of first appearance."""
+        names = {}
+        for section in config.values():
+            if not isinstance(section, Mapping):
+                continue
+            for values in section.values():
+                if isinstance(values, Mapping):
+                    for city in values:
+                        names.setdefault(city, None)
+        return cls(names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, city):
+        return city in self.positions
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def position(self, city):
+        return self.positions[city]
+
+    def same_as(self, other):
+        return other is self or (other is not None and other.names == self.names)
+
+
+class StateTable:
+    """Replicate x city x indicator array holding one model's state (struct-of-arrays layout).
+
+    Flat indicators occupy one column each; nested indicators such as land use shares
+    occupy a contiguous block of columns (a "group") so a whole block can be sliced as
+    a view. The leading replicate axis lets Monte Carlo ensemble members advance together
+    (it has length 1 for a single run). `mask` records which (city, column) cells carry
+    data, mirroring which keys the original per-city dicts contained; coverage is the
+    same for every replicate.
+
+    The table is double-buffered. `front` is the published state of the last completed
+    year and is read-only; a step writes into `values`, a back buffer seeded from the
+    front by `begin_step()`, and `commit()` swaps the two at the end of the year. Readers
+    of other models' state therefore see a consistent previous-year snapshot no matter
+    in which order (or on which thread) the steps run. `snapshot()` pins the current
+    front: a pinned buffer is never recycled as a back buffer (the next year gets a fresh
+    allocation instead), so snapshots stay valid without copying. The coverage mask is
+    copy-on-write for the same reason.
+    """
+    def __init__(self, index, columns=(), groups=None, integer=(), replicates=1):
+        self.index = index
+        self.columns = {}
+        self.groups = {}
+        for name in columns:
+            self.columns[name] = len(self.columns)
+        for group, categories in (groups or {}).items():
+            start = len(self.columns)
+            for category in categories:
+                self.columns[(group, category)] = len(self.columns)
+            self.groups[group] = (start, len(self.columns), tuple(categories))
+        self.integer = set(integer)
+        self.values = np.zeros((replicates, len(index), len(self.columns)))
+        self.mask = np.zeros((len(index), len(self.columns)), dtype=bool)
+        # Until the first step the write buffer doubles as the published one (loading happens in place)
+        self.front = self.values
+        self.front_mask = self.mask
+        self._spare = None # Recycled back buffer, if the old front was not pinned by a snapshot
+        self._pinned = False
+
+    @property
+    def shape(self):
+        """Shape of one column (everything but the indicator axis): (replicates, cities)."""
+        return self.values.shape[:-1]
+
+    @property
+    def replicates(self):
+        return self.values.shape[0]
+
+    def set_replicates(self, replicates):
+        """Broadcasts a single-run state to `replicates` identical ensemble members."""
+        if replicates == self.replicates:
+            return
+        if self.replicates != 1:
+            raise ValueError(f"Cannot resize an ensemble of {self.replicates} replicates to {replicates}")
+        if self.in_step:
+            raise RuntimeError("Cannot resize a table in the middle of a step")
+        self.values = self.front = np.repeat(self.front, replicates, axis=0)
+        self._spare = None
+        self._pinned = False
+
+    # --- Double buffering ---
+    @property
+    def in_step(self):
+        return self.values is not self.front
+
+    def begin_step(self):
+        """Opens the back buffer for writing, seeded with the published state."""
+        if self.in_step:
+            return
+        self.front.flags.writeable = False
+        back = self._spare if self._spare is not None else np.empty(self.front.shape, dtype=self.front.dtype)
+        self._spare = None
+        np.copyto(back, self.front)
+        self.values = back
+
+    def commit(self):
+        """Publishes the back buffer and recycles the old front unless a snapshot pinned it."""
+        if not self.in_step:
+            return
+        old_front = self.front
+        self.values.flags.writeable = False
+        self.front = self.values
+        self.front_mask = self.mask
+        if not self._pinned:
+            old_front.flags.writeable = True
+            self._spare = old_front
+        self._pinned = False
+
+    def snapshot(self):
+        """Zero-copy, immutable snapshot of the published state."""
+        self._pinned = True
+        return TableSnapshot(self)
+
+    def fork(self):
+        """Independent table that shares the published buffer copy-on-write with this one."""
+        if self.in_step:
+            raise RuntimeError("Cannot fork a table in the middle of a step")
+        self._pinned = True # Neither side may recycle the shared buffer
+        twin = copy.copy(self)
+        twin._spare = None
+        return twin
+
+    def restore(self, values, mask):
+        """Publishes externally owned arrays (e.g. memory-mapped from a checkpoint) as the state."""
+        if self.in_step:
+            raise RuntimeError("Cannot restore a table in the middle of a step")
+        if values.shape[1:] != self.front.shape[1:] or mask.shape != self.front_mask.shape:
+            raise ValueError(f"State of shape {values.shape} does not match table of shape {self.front.shape}")
+        self.values = self.front = values
+        self.mask = self.front_mask = np.array(mask, dtype=bool)
+        self._spare = None
+        self._pinned = True # Never write into the caller's buffer
+
+    def layout(self):
+        """Column names in storage order (group columns as [group, category])."""
+        return [list(key) if isinstance(key, tuple) else key for key in self.columns]
+
+    # --- Loading ---
+    def load(self, column, mapping, default=0.0):
+        """Fills a flat column from a {city: value} mapping; uncovered cities get `default`."""
+        col = self.columns[column]
+        if _aligned(mapping, self.index):
+            self.values[..., col] = mapping.dense(default)
+            self.mask[:, col] = mapping.covered()
+            return
+        self.values[..., col] = default
+        positions, values = self._positions(mapping)
+        self.values[..., positions, col] = values
+        self.mask[positions, col] = True
+
+    def load_group(self, group, mapping):
+        """Fills a group from a {city: {category: value}} mapping; missing categories are 0."""
+        start, stop, categories = self.groups[group]
+        if _aligned(mapping, self.index):
+            for offset, category in enumerate(categories):
+                if category in mapping.categories:
+                    source = mapping.categories.index(category)
+                    np.copyto(self.values[..., start + offset], mapping.values[:, source], where=mapping.mask[:, source])
+                    self.mask[:, start + offset] = mapping.mask[:, source]
+            return
+        for offset, category in enumerate(categories):
+            rows = {city: row[category] for city, row in mapping.items() if category in row}
+            positions, values = self._positions(rows)
+            self.values[..., positions, start + offset] = values
+            self.mask[positions, start + offset] = True
+
+    def load_array(self, name, values, covered):
+        """Fills a flat column or a whole group from an array aligned with the index.
+
+        Only the `covered` cities count as having data (every category of a group).
+        """
+        if name in self.groups:
+            start, stop, _ = self.groups[name]
+        else:
+            start = self.columns[name]
+            stop = start + 1
+            values = np.asarray(values)[..., None]
+        self.values[..., start:stop] = values
+        self.mask[:, start:stop] = np.asarray(covered)[:, None]
+
+    def _positions(self, mapping):
+        """Index positions and values of the cities of `mapping` that this table tracks."""
+        pairs = [(self.index.positions[city], value) for city, value in mapping.items() if city in self.index]
+        positions = np.fromiter((pos for pos, _ in pairs), dtype=np.intp, count=len(pairs))
+        return positions, np.array([value for _, value in pairs], dtype=float)
+
+    # --- Array access (views, not copies) ---
+    def column(self, name):
+        return self.values[..., self.columns[name]]
+
+    def group(self, name):
+        start, stop, _ = self.groups[name]
+        return self.values[..., start:stop]
+
+    def category(self, group, category):
+        return self.values[..., self.columns[(group, category)]]
+
+    def covered(self, name):
+        """Boolean per-city coverage of a flat column or (for a group) of any of its categories."""
+        if name in self.groups:
+            start, stop, _ = self.groups[name]
+            return self.mask[:, start:stop].any(axis=1)
+        return self.mask[:, self.columns[name]]
+
+    def assign(self, name, new_values, where):
+        """Writes `new_values` into a flat column for the cities selected by `where`."""
+        col = self.columns[name]
+        np.copyto(self.values[..., col], new_values, where=where)
+        covered = _any_replicate(where)
+        if (covered & ~self.mask[:, col]).any():
+            # Copy-on-write: published masks and snapshots keep the old coverage
+            self.mask = self.mask.copy()
+            self.mask[:, col] |= covered
+
+    def assign_group(self, name, new_values, where):
+        """Writes a (city x category) block for the cities selected by `where`."""
+        start, stop, _ = self.groups[name]
+        np.copyto(self.values[..., start:stop], new_values, where=where[..., None])
+
+    # --- Dict-like views for the legacy getters ---
+    def view(self, name, pending=False):
+        return IndicatorView(self, name, pending)
+
+    def group_view(self, name, pending=False):
+        return GroupView(self, name, pending)
+
+
+class TableSnapshot:
+    """Frozen state of a StateTable at the end of one year (shares the pinned buffer)"""
+    def __init__(self, table):
+        self.index = table.index
+        self.columns = table.columns
+        self.groups = table.groups
+        self.integer = table.integer
+        self.front = self.values = table.front
+        self.front_mask = self.mask = table.front_mask
+
+    @property
+    def replicates(self):
+        return self.front.shape[0]
+
+    def column(self, name):
+        return self.front[..., self.columns[name]]
+
+    def view(self, name):
+        return IndicatorView(self, name)
+
+    def group_view(self, name):
+        return GroupView(self, name)
+
+
+class IndicatorView(Mapping):
+    """Read-only {city: value} view over one column of a StateTable.
+
+    Views read the table's published (previous-year) buffer, so they never observe a
+    step that is still in progress; `pending=True` reads the write buffer instead.
+    """
+    def __init__(self, table, name, pending=False):
+        self.table = table
+        self.name = name
+        self.pending = pending
+        self._col = table.columns[name]
+        self._integer = name in table.integer
+
+    def _values(self):
+        return self.table.values if self.pending else self.table.front
+
+    def _mask(self):
+        return self.table.mask if self.pending else self.table.front_mask
+
+    def _cast(self, value):
+        if self.table.replicates > 1:
+            return value.astype(int) if self._integer else value.copy()
+        return int(value[0]) if self._integer else float(value[0])
+
+    def __getitem__(self, city):
+        pos = self.table.index.positions.get(city)
+        if pos is None or not self._mask()[pos, self._col]:
+            raise KeyError(city)
+        return self._cast(self._values()[..., pos, self._col])
+
+    def __iter__(self):
+        names = self.table.index.names
+        return (names[pos] for pos in np.flatnonzero(self._mask()[:, self._col]))
+
+    def __len__(self):
+        return int(self._mask()[:, self._col].sum())
+
+    def __repr__(self):
+        return f"IndicatorView({self.name!r}, {dict(self)!r})"
+
+    def dense(self, default):
+        """Per-city array with `default` wherever this indicator has no data."""
+        return np.where(self._mask()[:, self._col], self._values()[..., self._col], default)
+
+
+class GroupView(Mapping):
+    """Read-only {city: {category: value}} view over a column group of a StateTable"""
+    def __init__(self, table, name, pending=False):
+        self.table = table
+        self.name = name
+        self.pending = pending
+        self._start, self._stop, self.categories = table.groups[name]
+
+    def _values(self):
+        return self.table.values if self.pending else self.table.front
+
+    def _mask(self):
+        return self.table.mask if self.pending else self.table.front_mask
+
+    def covered(self):
+        return self._mask()[:, self._start:self._stop].any(axis=1)
+
+    def __getitem__(self, city):
+        pos = self.table.index.positions.get(city)
+        if pos is None or not self.covered()[pos]:
+            raise KeyError(city)
+        return GroupRowView(self, pos)
+
+    def __iter__(self):
+        names = self.table.index.names
+        return (names[pos] for pos in np.flatnonzero(self.covered()))
+
+    def __len__(self):
+        return int(self.covered().sum())
+
+    def __repr__(self):
+        return f"GroupView({self.name!r}, {[(city, dict(row)) for city, row in self.items()]!r})"
+
+
+class GroupRowView(Mapping):
+    """Read-only {category: value} view of one city's row within a column group"""
+    def __init__(self, group_view, pos):
+        self._group = group_view
+        self._pos = pos
+
+    def __getitem__(self, category):
+        group = self._group
+        try:
+            offset = group.categories.index(category)
+        except ValueError:
+            raise KeyError(category) from None
+        col = group._start + offset
+        if not group._mask()[self._pos, col]:
+            raise KeyError(category)
+        value = group._values()[..., self._pos, col]
+        integer = group.name in group.table.integer
+        if group.table.replicates > 1:
+            return value.astype(int) if integer else value.copy()
+        return int(value[0]) if integer else float(value[0])
+
+    def __iter__(self):
+        group = self._group
+        row_mask = group._mask()[self._pos, group._start:group._stop]
+        return (category for category, present in zip(group.categories, row_mask) if present)
+
+    def __len__(self):
+        group = self._group
+        return int(group._mask()[self._pos, group._start:group._stop].sum())
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+def _aligned(mapping, index):
+    """True for array-backed parameter tables (see config_compiler) indexed like `index`."""
+    return hasattr(mapping, 'covered') and index.same_as(getattr(mapping, 'index', None))
+
+
+def _any_replicate(where):
+    """Collapses a (replicates x cities) selection to the cities selected in any replicate."""
+    where = np.asarray(where)
+    return where.any(axis=0) if where.ndim > 1 else where
+
+
+def estimate(mapping, key, missing='N/A'):
+    """Console/report friendly `mapping.get(key)`: ensemble values are reduced to their replicate mean."""
+    value = mapping.get(key, missing)
+    return float(np.mean(value)) if isinstance(value, np.ndarray) else value
+
+
+def dense(data, index, default):
+    """Returns a per-city indicator (view or plain dict) as a dense array aligned with `index`.
+
+    Cities without data get `default`, replacing the scalar `dict.get(city, default)`
+    lookups of the original per-city loops. Views keep their replicate axis; plain dicts
+    give a per-city vector that broadcasts across replicates.
+    """
+    if isinstance(data, IndicatorView) and index.same_as(data.table.index):
+        return data.dense(default)
+    if _aligned(data, index):
+        return data.dense(default)
+    out = np.full(len(index), default, dtype=float)
+    for city, value in data.items():
+        if city in index:
+            out[index.position(city)] = value
+    return out
+
+
+def group_categories(mapping):
+    """Union of the category keys of a nested {city: {category: value}} mapping, in first-seen order."""
+    if getattr(mapping, 'categories', None) is not None:
+        return tuple(mapping.categories) # Compiled parameter tables store them in that order already
+    categories = {}
+    for row in mapping.values():
+        for category in row:
+            categories.setdefault(category, None)
+    return tuple(categories)
@@ -0,0 +1,104 @@
+# Canonical synthetic configuration shared by the simulation, the scenario tools and the
+# legacy standalone script. Models read it once into their state tables and never modify it;
+# see config_compiler for the validated, frozen and cached form.
+
+def generate_synthetic_config():
+    """Generates a configuration dictionary with synthetic data placeholders."""
+    config = {
+        # --- Urban Growth Data ---
+        'urban_growth': {
+            'initial_population': {
+                'Dhaka': 18_000_000, 'Chattogram': 5_500_000, 'Khulna': 1_500_000,
+                'Sylhet': 800_000, 'Rajshahi': 900_000, 'Barishal': 400_000,
+                'Rangpur': 350_000, 'Mymensingh': 500_000, 'Narayanganj': 2_000_000,
+                "Cox's Bazar": 600_000
+            },
+            'annual_growth_rate': { # Simplified average annual % growth
+                'Dhaka': 0.035, 'Chattogram': 0.030, 'Khulna': 0.020,
+                'Sylhet': 0.032, 'Rajshahi': 0.025, 'Barishal': 0.022,
+                'Rangpur': 0.028, 'Mymensingh': 0.030, 'Narayanganj': 0.033,
+                "Cox's Bazar": 0.045
+            },
+            'land_use': { # Simplified initial land use %
+                'Dhaka': {'residential': 40, 'commercial': 15, 'industrial': 10, 'informal': 15, 'green': 5, 'water': 15},
+                'Chattogram': {'residential': 35, 'commercial': 12, 'industrial': 18, 'informal': 10, 'green': 8, 'water': 17},
+                'Khulna': {'residential': 45, 'commercial': 10, 'industrial': 15, 'informal': 8, 'green': 10, 'water': 12},
+            },
+            'peri_urban_areas': ['Savar', 'Gazipur', 'Keraniganj'],
+        },
+        'housing': {
+            'initial_housing_stock': {
+                 'Dhaka': {'formal': 3_000_000, 'informal': 1_500_000},
+                 'Chattogram': {'formal': 800_000, 'informal': 400_000},
+                 'Khulna': {'formal': 250_000, 'informal': 100_000},
+            },
+            'avg_house_price': {'Dhaka': 80, 'Chattogram': 60, 'Khulna': 40},
+            'avg_rent': {'Dhaka': 20000, 'Chattogram': 12000, 'Khulna': 8000},
+            'affordability_ratio': {'Dhaka': 15, 'Chattogram': 12, 'Khulna': 10}
+        },
+        'infrastructure': {
+             'water_coverage': {'Dhaka': 0.85, 'Chattogram': 0.75, 'Khulna': 0.60},
+             'sanitation_coverage': {'Dhaka': 0.70, 'Chattogram': 0.60, 'Khulna': 0.50},
+             'power_reliability': {'Dhaka': 0.95, 'Chattogram': 0.92, 'Khulna': 0.88},
+             'waste_collection': {'Dhaka': 0.75, 'Chattogram': 0.65, 'Khulna': 0.55},
+             'internet_penetration': {'Dhaka': 0.80, 'Chattogram': 0.70, 'Khulna': 0.50},
+        },
+        'transport': {
+            'modal_split': {
+                'Dhaka': {'walk': 30, 'rickshaw': 25, 'bus': 20, 'car/taxi': 15, 'other': 10},
+                'Chattogram': {'walk': 35, 'rickshaw': 30, 'bus': 15, 'car/taxi': 10, 'other': 10},
+                'Khulna': {'walk': 40, 'rickshaw': 35, 'bus': 10, 'car/taxi': 5, 'other': 10},
+            },
+            'avg_commute_time': {'Dhaka': 60, 'Chattogram': 45, 'Khulna': 35},
+            'road_density': {'Dhaka': 15, 'Chattogram': 12, 'Khulna': 10},
+             'public_transit_coverage': {'Dhaka': 0.60, 'Chattogram': 0.40, 'Khulna': 0.30}
+        },
+        'economy': {
+            'gdp_per_capita': {'Dhaka': 5000, 'Chattogram': 4500, 'Khulna': 3000},
+            'unemployment_rate': {'Dhaka': 0.06, 'Chattogram': 0.07, 'Khulna': 0.08},
+            'sectoral_employment': {
+                'Dhaka': {'services': 60, 'industry': 30, 'informal': 10},
+                'Chattogram': {'services': 50, 'industry': 40, 'informal': 10},
+                 'Khulna': {'services': 55, 'industry': 35, 'informal': 10},
+            },
+            'informal_economy_share': {'Dhaka': 0.30, 'Chattogram': 0.35, 'Khulna': 0.40}
+        },
+        'governance': {
+            'municipal_own_revenue': {'Dhaka': 0.40, 'Chattogram': 0.35, 'Khulna': 0.25},
+            'citizen_satisfaction': {'Dhaka': 0.5, 'Chattogram': 0.55, 'Khulna': 0.6},
+            'planning_compliance': {'Dhaka': 0.45, 'Chattogram': 0.50, 'Khulna': 0.55}
+        },
+        'environment': {
+            'air_quality_index': {'Dhaka': 180, 'Chattogram': 150, 'Khulna': 120},
+            'green_space_ratio': {'Dhaka': 0.05, 'Chattogram': 0.08, 'Khulna': 0.10},
+             'flood_prone_area': {'Dhaka': 0.25, 'Chattogram': 0.15, 'Khulna': 0.30, 'Barishal': 0.40},
+             'waste_recycling_rate': {'Dhaka': 0.10, 'Chattogram': 0.08, 'Khulna': 0.05}
+        },
+        'social': {
+             'literacy_rate': {'Dhaka': 0.80, 'Chattogram': 0.75, 'Khulna': 0.70},
+             'access_to_healthcare': {'Dhaka': 0.90, 'Chattogram': 0.85, 'Khulna': 0.75},
+             'social_cohesion_index': {'Dhaka': 0.6, 'Chattogram': 0.65, 'Khulna': 0.7},
+              'crime_rate': {'Dhaka': 300, 'Chattogram': 250, 'Khulna': 200}
+        },
+        'urban_rural': {
+            'remittance_dependency': {'Sylhet': 0.40, 'Comilla': 0.30},
+            'rural_migration_rate': {'Dhaka': 0.015, 'Chattogram': 0.010, 'Khulna': 0.008},
+            'commuter_percentage': {'Dhaka': 0.15, 'Chattogram': 0.10, 'Khulna': 0.08}
+        },
+        'service_delivery': {
+            'school_density': {'Dhaka': 5, 'Chattogram': 4, 'Khulna': 3},
+            'hospital_beds_per_1000': {'Dhaka': 2.0, 'Chattogram': 1.5, 'Khulna': 1.2},
+             'public_space_per_capita': {'Dhaka': 1.0, 'Chattogram': 1.5, 'Khulna': 1.8}
+        },
+        'smart_city': {
+            'digital_literacy': {'Dhaka': 0.65, 'Chattogram': 0.60, 'Khulna': 0.50},
+            'smart_service_adoption': {'Dhaka': 0.30, 'Chattogram': 0.25, 'Khulna': 0.15},
+            'iot_sensor_density': {'Dhaka': 10, 'Chattogram': 5, 'Khulna': 2}
+        },
+        'resilience': {
+            'early_warning_coverage': {'Dhaka': 0.7, 'Chattogram': 0.8, 'Khulna': 0.75, 'Barishal': 0.85},
+            'building_code_compliance': {'Dhaka': 0.5, 'Chattogram': 0.55, 'Khulna': 0.6},
+            'disaster_recovery_speed': {'Dhaka': 7, 'Chattogram': 5, 'Khulna': 10}
+        }
+    }
+    return config
@@ -0,0 +1,172 @@
+import argparse
+import collections
+
+import numpy as np
+
+from road_network import ShortestPathTrees
+from trip_distribution import SparseOD
+
+# Passenger car units (PCU) one lane of a mixed-traffic urban street carries per hour
+LANE_CAPACITY_PCU = 900
+# Floor on link times (s), so zero-length links still put their head strictly after their tail
+MIN_LINK_TIME = 1e-3
+
+# Link flows and times (s) at equilibrium, its relative gap, the number of Frank-Wolfe steps
+# taken, and the (origin zone, destination zone) shortest times (s) at the equilibrium link times
+Equilibrium = collections.namedtuple('Equilibrium', 'flows times gap iterations zone_times')
+
+def bpr(free_time, flows, capacity, alpha=0.15, beta=4.0):
+    """Bureau of Public Roads link travel time: free_time * (1 + alpha * (flow / capacity) ** beta)."""
+    return free_time * (1 + alpha * (flows / capacity) ** beta)
+
+
+def all_or_nothing(trees, demand, targets):
+    """Link flows from sending all (source, target) demand, a SparseOD, along the sources' shortest-path trees.
+
+    The stored cells are loaded onto their target nodes, then accumulated up each tree
+    from its farthest node inwards, so every node passes its whole subtree's demand to
+    the link it is reached by: one sweep over the nodes for all trees at once instead of
+    one walk per origin-destination pair. Demand to unreachable targets is dropped.
+    """
+    network = trees.network
+    sources, nodes = trees.dist.shape
+    load = np.zeros((sources, nodes))
+    rows = np.arange(sources)
+    np.add.at(load, (demand.expand_rows(rows), targets[demand.columns]), demand.values)
+    load[~np.isfinite(trees.dist)] = 0
+    reached = trees.pred >= 0
+    parents = np.where(reached, network.tails[trees.pred], -1)
+    order = np.argsort(trees.dist, axis=1)
+    for rank in range(nodes - 1, 0, -1): # Rank 0 is the source itself
+        node = order[:, rank]
+        parent = parents[rows, node]
+        has = parent >= 0
+        load[rows[has], parent[has]] += load[rows[has], node[has]]
+    return np.bincount(trees.pred[reached], weights=load[reached], minlength=network.links)
+
+
+class TrafficAssignment:
+    """Static user-equilibrium assignment of a zone OD matrix with BPR link costs.
+
+    Uses the conjugate Frank-Wolfe method (Mitradjieva & Lindberg, 2013): each iteration
+    builds shortest-path trees at the current link times, loads the demand onto them
+    all-or-nothing, and moves the flows along a direction conjugate to the previous one,
+    with the step from a bisection line search on the Beckmann objective. It stops once
+    the relative gap (total travel time minus the all-or-nothing travel time, over the
+    total travel time) falls to `relative_gap`. The last equilibrium is the starting point of the next call:
+    with new demand D' = s * D + R (s the smallest cell ratio to the previous demand D,
+    R >= 0), s times the old flows plus R loaded all-or-nothing at the old times is a
+    feasible start, so re-equilibrating after a year of demand growth takes a few
+    iterations. Demand is a SparseOD (dense matrices are converted), so only the cells
+    the trip distribution keeps are stored and loaded; it and capacities are in PCU per hour.
+    """
+    def __init__(self, network, zone_nodes, relative_gap=1e-2, max_iterations=100, alpha=0.15, beta=4.0,
+                 lane_capacity=LANE_CAPACITY_PCU):
+        self.network = network
+        self.zone_nodes = np.asarray(zone_nodes, dtype=np.intp)
+        self.relative_gap = relative_gap
+        self.max_iterations = max_iterations
+        self.alpha = alpha
+        self.beta = beta
+        self.lane_capacity = lane_capacity
+        self.flows = None # Warm start: the last equilibrium and the demand (SparseOD) it carries
+        self.demand = None
+
+    def link_times(self, flows):
+        times = bpr(self.network.free_flow_time(), flows, self.network.lanes * self.lane_capacity, self.alpha, self.beta)
+        return np.maximum(times, MIN_LINK_TIME)
+
+    def _line_search(self, flows, direction, steps=30):
+        """Step in [0, 1] minimising the Beckmann objective along `direction` (its derivative is monotone)."""
+        if direction @ self.link_times(flows + direction) <= 0:
+            return 1.0
+        lo, hi = 0.0, 1.0
+        for _ in range(steps):
+            mid = (lo + hi) / 2
+            if direction @ self.link_times(flows + mid * direction) > 0:
+                hi = mid
+            else:
+                lo = mid
+        return (lo + hi) / 2
+
+    def _start(self, demand):
+        """Feasible initial flows for `demand`, reusing the last equilibrium when there is one."""
+        network = self.network
+        if self.flows is None:
+            return all_or_nothing(ShortestPathTrees(network, self.zone_nodes, self.link_times(np.zeros(network.links))),
+                                  demand, self.zone_nodes)
+        previous = np.zeros(network.links) # Links added since the last call start empty
+        previous[:len(self.flows)] = self.flows
+        # The cells may differ from the last call's (e.g. after a network change): old cells
+        # missing now have zero demand, and new cells start with none carried
+        carried = self.demand.values > 0
+        scale = ((demand.values_at(self.demand)[carried] / self.demand.values[carried]).min()
+                 if carried.any() else 0.0)
+        remainder = demand.with_values(np.maximum(demand.values - scale * self.demand.values_at(demand), 0))
+        trees = ShortestPathTrees(network, self.zone_nodes, self.link_times(previous))
+        return scale * previous + all_or_nothing(trees, remainder, self.zone_nodes)
+
+    def assign(self, demand):
+        """Equilibrates a (zone, zone) PCU/hour SparseOD or matrix; returns an Equilibrium."""
+        network = self.network
+        if isinstance(demand, SparseOD):
+            demand = demand.with_values(np.asarray(demand.values, dtype=float))
+        else:
+            demand = SparseOD.from_dense(np.asarray(demand, dtype=float))
+        free = network.free_flow_time()
+        capacity = network.lanes * self.lane_capacity
+        flows = self._start(demand)
+        conjugate = None
+        for iteration in range(self.max_iterations + 1):
+            times = self.link_times(flows)
+            trees = ShortestPathTrees(network, self.zone_nodes, times)
+            target = all_or_nothing(trees, demand, self.zone_nodes)
+            total = times @ flows
+            gap = (total - times @ target) / total if total > 0 else 0.0
+            if gap <= self.relative_gap or iteration == self.max_iterations:
+                break
+            if conjugate is None:
+                conjugate = target
+            else:
+                # Weight the previous direction so the new one is conjugate to it under the Hessian
+                slope = free * self.alpha * self.beta * flows ** (self.beta - 1) / capacity ** self.beta
+                previous = (conjugate - flows) * slope
+                denominator = previous @ (target - conjugate)
+                weight = (previous @ (target - flows)) / denominator if denominator != 0 else 0.0
+                weight = min(max(weight, 0.0), 0.99)
+                conjugate = weight * conjugate + (1 - weight) * target
+            direction = conjugate - flows
+            flows = flows + self._line_search(flows, direction) * direction
+        self.flows = flows
+        self.demand = demand
+        return Equilibrium(flows, times, gap, iteration, trees.times(self.zone_nodes))
+
+
+if __name__ == "__main__":
+    import time
+
+    from road_network import CommuteNetwork
+
+    parser = argparse.ArgumentParser(description="Time yearly user-equilibrium assignments on a synthetic city network.")
+    parser.add_argument('--size', type=int, default=128, help="Intersections per side of the synthetic grid")
+    parser.add_argument('--zone-every', type=int, default=8)
+    parser.add_argument('--trips', type=float, default=400000, help="Peak-hour PCU trips in the first year")
+    parser.add_argument('--growth', type=float, default=0.03, help="Yearly demand growth")
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--gap', type=float, default=1e-2, help="Relative gap to stop at")
+    args = parser.parse_args()
+
+    city = CommuteNetwork.synthetic(rows=args.size, cols=args.size, zone_every=args.zone_every)
+    print(f"{city.network.nodes:,} nodes, {city.network.links:,} links, {city.zones:,} zones")
+    assignment = TrafficAssignment(city.network, city.zone_nodes, relative_gap=args.gap)
+    shares = np.ones((city.zones, city.zones))
+    np.fill_diagonal(shares, 0)
+    shares /= shares.sum()
+    for year in range(args.years + 1):
+        start = time.perf_counter()
+        result = assignment.assign(SparseOD.from_dense(shares * args.trips * (1 + args.growth) ** year))
+        usable = shares > 0
+        free = city.travel_times()[usable].mean()
+        print(f"{'cold start' if year == 0 else f'year {year}'}: {time.perf_counter() - start:.2f} s, "
+              f"{result.iterations} iterations, gap {result.gap:.1e}, mean zone-to-zone time "
+              f"{(result.zone_times[usable] / 60).mean():.1f} min (free flow {free:.1f})")
@@ -0,0 +1,218 @@
+import argparse
+
+import numpy as np
+
+DEFAULT_BETA = 0.1 # Deterrence per minute of travel
+
+class SparseOD:
+    """(origin zone, destination zone) matrix in compressed sparse row form.
+
+    Origin i's cells are `columns[indptr[i]:indptr[i + 1]]` (ascending) with `values` in
+    the same order; cells not stored are zero. Row sums are one `reduceat` over the values and
+    column sums one `bincount`, so a sum costs a single pass over the stored cells.
+    """
+    def __init__(self, indptr, columns, values, zones):
+        self.indptr = indptr
+        self.columns = columns
+        self.values = values
+        self.zones = zones
+        self.counts = np.diff(indptr)
+
+    @classmethod
+    def from_dense(cls, matrix):
+        """SparseOD of the nonzero cells of a square matrix."""
+        matrix = np.asarray(matrix)
+        rows, columns = np.nonzero(matrix)
+        indptr = np.zeros(len(matrix) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(rows, minlength=len(matrix)))
+        return cls(indptr, columns.astype(np.int32), matrix[rows, columns], len(matrix))
+
+    @property
+    def cells(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.columns.nbytes + self.values.nbytes
+
+    def with_values(self, values):
+        """The same sparsity pattern holding other values (the index arrays are shared)."""
+        twin = object.__new__(SparseOD)
+        twin.__dict__.update(self.__dict__, values=values)
+        return twin
+
+    def expand_rows(self, per_row):
+        """Per-cell array repeating each origin's value over its cells."""
+        return np.repeat(per_row, self.counts)
+
+    def values_at(self, other):
+        """Per-cell array of this matrix's values at the cells `other` stores (zero where this one has none)."""
+        if other.indptr is self.indptr and other.columns is self.columns:
+            return self.values
+        keys = self.expand_rows(np.arange(self.zones)) * self.zones + self.columns # Ascending, as cells are
+        wanted = other.expand_rows(np.arange(other.zones)) * other.zones + other.columns
+        if not len(keys):
+            return np.zeros(len(wanted), dtype=self.values.dtype)
+        positions = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        return np.where(keys[positions] == wanted, self.values[positions], 0)
+
+    def row_sums(self, values=None):
+        values = self.values if values is None else values
+        sums = np.zeros(self.zones)
+        filled = self.counts > 0 # reduceat would return a neighbour's cell for empty rows
+        if values.size:
+            sums[filled] = np.add.reduceat(values, self.indptr[:-1][filled])
+        return sums
+
+    def column_sums(self, values=None):
+        return np.bincount(self.columns, weights=self.values if values is None else values, minlength=self.zones)
+
+    def dense(self):
+        result = np.zeros((self.zones, self.zones))
+        result[self.expand_rows(np.arange(self.zones)), self.columns] = self.values
+        return result
+
+
+def gravity_deterrence(cost_rows, zones, beta=DEFAULT_BETA, cutoff=1e-3, block=256):
+    """Sparse exp(-beta * cost) deterrence matrix of a doubly-constrained gravity model.
+
+    `cost_rows(lo, hi)` returns the (hi - lo, zones) costs (minutes) from origins lo..hi-1;
+    infinite costs mark unreachable pairs. Each origin drops its smallest cells that
+    together hold at most `cutoff` of its deterrence, i.e. the destinations so remote they
+    would draw a negligible share of its trips. Intrazonal cells are dropped as well,
+    since those trips never use the network. Each origin's row is stored relative to its
+    nearest destination, exp(-beta * (cost - nearest cost)), so remote origins do not
+    underflow to zero; the gravity model's row factors absorb this per-origin scale.
+    Origins are processed in blocks, so the dense costs are never held whole, and values
+    are float32: with int32 columns a stored cell takes 8 bytes, as much as a dense
+    float64 one.
+    """
+    indptr = np.zeros(zones + 1, dtype=np.int64)
+    columns, values = [], []
+    for lo in range(0, zones, block):
+        hi = min(lo + block, zones)
+        costs = np.array(cost_rows(lo, hi), dtype=float)
+        costs[np.arange(hi - lo), np.arange(lo, hi)] = np.inf
+        # Relative to each origin's nearest destination, so remote origins do not underflow
+        nearest = costs.min(axis=1, keepdims=True)
+        deterrence = np.exp(-beta * (costs - np.where(np.isfinite(nearest), nearest, 0)))
+        ascending = np.sort(deterrence, axis=1)
+        negligible = (np.cumsum(ascending, axis=1) <= cutoff * ascending.sum(axis=1, keepdims=True)).sum(axis=1)
+        threshold = ascending[np.arange(hi - lo), np.maximum(negligible - 1, 0)]
+        keep = (deterrence > np.where(negligible > 0, threshold, 0)[:, None])
+        rows, cols = np.nonzero(keep)
+        columns.append(cols.astype(np.int32))
+        values.append(deterrence[rows, cols].astype(np.float32))
+        indptr[lo + 1:hi + 1] = indptr[lo] + np.cumsum(keep.sum(axis=1))
+    return SparseOD(indptr, np.concatenate(columns), np.concatenate(values), zones)
+
+
+class TripDistribution:
+    """Doubly-constrained gravity model: trips T_ij = a_i * b_j * f_ij with zone totals as margins.
+
+    `balance(origins, destinations)` fits the factors a and b by iterative proportional
+    fitting (IPF), alternately scaling rows and columns with one sparse product each,
+    until every column total is within `convergence` of its target. The balance is
+    cached as the two factor vectors (the trips themselves are only built on request):
+    while the zone totals' shares stay within `tolerance` of the ones it was fitted to,
+    later calls just rescale a to the new overall total. Beyond that, the fit restarts
+    from the cached factors, so small drifts take few IPF iterations. Destination totals
+    are scaled to the origin total, so origins fix the trip count.
+    """
+    def __init__(self, deterrence, tolerance=0.01, convergence=1e-4, max_iterations=500):
+        self.deterrence = deterrence
+        self.tolerance = tolerance
+        self.convergence = convergence
+        self.max_iterations = max_iterations
+        self.row_factors = None # Balancing factors a and b, kept to warm-start the next fit
+        self.column_factors = None
+        self.fitted_origins = None # Zone totals the factors fit (None: no valid balance)
+        self.fitted_destinations = None
+        self.iterations = 0
+
+    def set_deterrence(self, deterrence):
+        """Replaces the deterrence matrix (e.g. after a network change); the next call rebalances."""
+        self.deterrence = deterrence
+        self.fitted_origins = self.fitted_destinations = None
+
+    def trips(self):
+        """SparseOD of the balanced trips a_i * b_j * f_ij."""
+        deterrence = self.deterrence
+        return deterrence.with_values(deterrence.values * deterrence.expand_rows(self.row_factors) *
+                                      self.column_factors[deterrence.columns])
+
+    def _drifted(self, origins, destinations):
+        if self.fitted_origins is None:
+            return True
+        for new, old in ((origins, self.fitted_origins), (destinations, self.fitted_destinations)):
+            expected = old * (new.sum() / old.sum()) if old.sum() > 0 else old
+            if np.any(np.abs(new - expected) > self.tolerance * np.maximum(expected, 1e-12)):
+                return True
+        return False
+
+    def balance(self, origins, destinations):
+        """SparseOD of trips with row totals `origins` and column totals `destinations` (rescaled to match)."""
+        origins = np.asarray(origins, dtype=float)
+        destinations = np.asarray(destinations, dtype=float)
+        total = origins.sum()
+        if destinations.sum() > 0:
+            destinations = destinations * (total / destinations.sum())
+        if not self._drifted(origins, destinations):
+            # Trips are linear in a: rescaling it (and the reference totals) keeps the balance
+            self.iterations = 0
+            scale = total / self.fitted_origins.sum() if self.fitted_origins.sum() > 0 else 0.0
+            self.row_factors = self.row_factors * scale
+            self.fitted_origins, self.fitted_destinations = self.fitted_origins * scale, self.fitted_destinations * scale
+            return self.trips()
+        deterrence = self.deterrence
+        a = self.row_factors if self.row_factors is not None else np.ones(deterrence.zones)
+        b = self.column_factors if self.column_factors is not None else np.ones(deterrence.zones)
+        for iteration in range(1, self.max_iterations + 1):
+            reach = deterrence.row_sums(deterrence.values * b[deterrence.columns])
+            a = np.divide(origins, reach, out=np.zeros_like(reach), where=reach > 0)
+            pull = deterrence.column_sums(deterrence.values * deterrence.expand_rows(a))
+            # Row totals are exact after the row step; stop once the columns are too
+            if np.all(np.abs(pull * b - destinations) <= self.convergence * np.maximum(destinations, 1e-12)):
+                break
+            b = np.divide(destinations, pull, out=np.zeros_like(pull), where=pull > 0)
+        self.iterations = iteration
+        self.row_factors, self.column_factors = a, b
+        self.fitted_origins, self.fitted_destinations = origins, destinations
+        return self.trips()
+
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Time gravity-model trip distribution for a synthetic city of zones.")
+    parser.add_argument('--zones', type=int, default=5000)
+    parser.add_argument('--size-km', type=float, default=40, help="Side of the square city")
+    parser.add_argument('--speed', type=float, default=15, help="Mean door-to-door speed (km/h)")
+    parser.add_argument('--beta', type=float, default=0.1, help="Deterrence per minute")
+    parser.add_argument('--years', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(0, args.size_km, size=(2, args.zones))
+    centre = np.hypot(x - args.size_km / 2, y - args.size_km / 2) / args.size_km
+    population = rng.lognormal(0, 0.5, args.zones) * np.exp(-centre / 0.5) * 1e4
+    jobs = rng.lognormal(0, 0.8, args.zones) * np.exp(-centre / 0.2) * 1e4
+    minutes = lambda lo, hi: (np.abs(x[lo:hi, None] - x) + np.abs(y[lo:hi, None] - y)) / args.speed * 60
+
+    start = time.perf_counter()
+    deterrence = gravity_deterrence(minutes, args.zones, beta=args.beta)
+    print(f"{args.zones:,} zones: deterrence in {time.perf_counter() - start:.2f} s, {deterrence.cells:,} cells "
+          f"({deterrence.cells / args.zones ** 2:.0%}), {deterrence.nbytes / 2**20:.0f} MB "
+          f"(dense: {args.zones ** 2 * 8 / 2**20:.0f} MB)")
+    distribution = TripDistribution(deterrence)
+    for year in range(args.years + 1):
+        if year:
+            population = population * 1.03 # Uniform growth: the cached balance is rescaled
+            if year == args.years:
+                population = population * rng.uniform(0.97, 1.05, args.zones) # Uneven growth: rebalance
+        start = time.perf_counter()
+        trips = distribution.balance(population, jobs)
+        error = np.abs(trips.column_sums() / (jobs * population.sum() / jobs.sum()) - 1).max()
+        print(f"{'initial' if year == 0 else f'year {year}'}: {time.perf_counter() - start:.3f} s, "
+              f"{distribution.iterations} IPF iterations, {trips.values.sum():,.0f} trips, "
+              f"largest column error {error:.1e}")
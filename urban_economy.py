@@ -1,72 +1,130 @@
-import random
+import numpy as np
+
+from sim_random import UniformDraws
+from sim_log import INFO, LOG
+from state_store import CityIndex, StateTable, dense, group_categories, estimate
 
 class UrbanEconomyModel:
     """Model economic activities and livelihood systems in Bangladesh cities"""
-    def __init__(self, config):
-        self.gdp_per_capita = config['economy']['gdp_per_capita'].copy()
-        self.unemployment = config['economy']['unemployment_rate'].copy()
-        self.sectoral_employment = config['economy']['sectoral_employment'].copy()
-        self.informal_share = config['economy']['informal_economy_share'].copy()
+    # Random ranges drawn for every (replicate, city) in one batched call per step
+    DRAWS = UniformDraws({
+        'base_growth': (0.04, 0.07),
+        'unemployment_noise': (-0.005, 0.005),
+        'services_shift': (0.01, 0.05),
+        'informal_noise': (-0.005, 0.005),
+    })
+
+    # State passed to simulate_step after the year, and the state this model writes (with its getter)
+    STATE_READS = ('population', 'infrastructure', 'demography')
+    STATE_WRITES = {'economy': 'get_economy_state'}
+
+    def __init__(self, config, city_index=None, rng=None):
+        self.index = city_index or CityIndex.from_config(config)
+        economy_config = config['economy']
+        self.state = StateTable(self.index, columns=('gdp_per_capita', 'unemployment', 'informal_share'),
+                                groups={'sectoral_employment': group_categories(economy_config['sectoral_employment'])})
+        self.state.load('gdp_per_capita', economy_config['gdp_per_capita'])
+        self.state.load('unemployment', economy_config['unemployment_rate'], default=0.07)
+        self.state.load_group('sectoral_employment', economy_config['sectoral_employment'])
+        self.state.load('informal_share', economy_config['informal_economy_share'], default=0.3)
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.current_year = 2025
-        print("UrbanEconomyModel Initialized")
+        LOG.info('model.init', "{model} Initialized", model='UrbanEconomyModel')
+
+    @property
+    def gdp_per_capita(self):
+        return self.state.view('gdp_per_capita')
+
+    @property
+    def unemployment(self):
+        return self.state.view('unemployment')
+
+    @property
+    def sectoral_employment(self):
+        return self.state.group_view('sectoral_employment')
+
+    @property
+    def informal_share(self):
+        return self.state.view('informal_share')
+
+    def _shift_sectors(self, active, draws):
+        """Simple shift towards services as GDP grows."""
+        t = self.state
+        if 'sectoral_employment' not in t.groups:
+            return
+        categories = t.groups['sectoral_employment'][2]
+        sectors = t.group('sectoral_employment').copy()
+
+        def sector(name, default):
+            # Missing sectors fall back to the same defaults as the original per-city dict lookups
+            if name not in categories:
+                return np.full(t.shape, default)
+            covered = t.mask[:, t.columns[('sectoral_employment', name)]]
+            return np.where(covered, sectors[..., categories.index(name)], default)
+
+        services, industry, informal = sector('services', 50), sector('industry', 30), sector('informal', 10)
+        gdp_level_factor = t.column('gdp_per_capita') / 5000 # Relative to Dhaka start
+        shift_to_services = gdp_level_factor * 0.1 * draws['services_shift']
 
-    def simulate_step(self, year, population_data, infrastructure_data):
+        transferable_industry = industry * shift_to_services * 0.6
+        transferable_informal = informal * shift_to_services * 0.4
+
+        for name, value in (('services', np.minimum(85, services + transferable_industry + transferable_informal)),
+                            ('industry', np.maximum(5, industry - transferable_industry)),
+                            ('informal', np.maximum(5, informal - transferable_informal))):
+            if name in categories:
+                sectors[..., categories.index(name)] = value
+
+        # Normalize
+        total = sectors.sum(axis=-1, keepdims=True)
+        sectors = np.divide(sectors * 100, total, out=sectors, where=total > 0)
+        t.assign_group('sectoral_employment', sectors, active & t.covered('sectoral_employment'))
+
+    def simulate_step(self, year, population_data, infrastructure_data, demography_data):
         """Simulates economic growth, unemployment shifts, and sectoral changes."""
-        print(f"  Simulating Economic Dynamics for year {year}...")
-
-        for city in self.gdp_per_capita:
-            # --- GDP Growth ---
-            # Factors: Base rate, infrastructure quality (power, internet), population growth (demand)
-            base_growth = random.uniform(0.04, 0.07) # National/base growth range
-
-            # Infrastructure multiplier (simplistic average)
-            power_factor = infrastructure_data.get('power_reliability', {}).get(city, 0.9) / 0.9
-            internet_factor = infrastructure_data.get('internet_penetration', {}).get(city, 0.6) / 0.6
-            infra_multiplier = (power_factor + internet_factor) / 2
-
-            growth_factor = 1 + base_growth * infra_multiplier
-            self.gdp_per_capita[city] *= growth_factor
-
-            # --- Unemployment ---
-            # Factors: GDP growth (inverse), population growth (direct), labor force participation (TBD)
-            gdp_growth = growth_factor - 1
-            # Placeholder: unemployment decreases with high GDP growth, increases slightly with population pressure
-            unemployment_change = - (gdp_growth - 0.05) * 0.1 # Decrease if growth > 5%
-            # Add effect of population growth (needs proper labor force calculation later)
-            # unemployment_change += (population_growth_rate - 0.03) * 0.05
-
-            self.unemployment[city] *= (1 + unemployment_change + random.uniform(-0.005, 0.005))
-            self.unemployment[city] = max(0.02, min(0.15, self.unemployment.get(city, 0.07))) # Bounds
-
-            # --- Sectoral Shift --- (Placeholder)
-            # Driven by development stage (GDP), investment, education levels (social)
-            # Simple shift towards services as GDP grows
-            sectors = self.sectoral_employment.get(city)
-            if sectors:
-                gdp_level_factor = self.gdp_per_capita[city] / 5000 # Relative to Dhaka start
-                shift_to_services = gdp_level_factor * 0.1 * random.uniform(0.01, 0.05)
-
-                transferable_industry = sectors.get('industry', 30) * shift_to_services * 0.6
-                transferable_informal = sectors.get('informal', 10) * shift_to_services * 0.4
-
-                sectors['services'] = min(85, sectors.get('services', 50) + transferable_industry + transferable_informal)
-                sectors['industry'] = max(5, sectors.get('industry', 30) - transferable_industry)
-                sectors['informal'] = max(5, sectors.get('informal', 10) - transferable_informal)
-
-                # Normalize
-                total = sum(sectors.values())
-                if total > 0:
-                    for sector, value in sectors.items():
-                        sectors[sector] = (value / total) * 100
-
-            # --- Informal Economy Share --- (Placeholder)
-            # Might decrease with formal sector growth, regulation (governance)
-            self.informal_share[city] = self.informal_share.get(city, 0.3) * (1 - (gdp_growth - 0.04)*0.05 + random.uniform(-0.005, 0.005))
-            self.informal_share[city] = max(0.1, min(0.5, self.informal_share[city]))
-
-
-        print(f"    Dhaka GDP per Capita Estimate: ${self.gdp_per_capita.get('Dhaka', 'N/A'):.0f}")
-        print(f"    Chattogram Unemployment Rate Estimate: {self.unemployment.get('Chattogram', 'N/A'):.3f}")
+        LOG.info('economy.step', "  Simulating Economic Dynamics for year {year}...", year=year)
+        t = self.state
+        draws = self.DRAWS.draw(self.rng, t.shape)
+        active = t.covered('gdp_per_capita')
+
+        # --- GDP Growth ---
+        # Factors: Base rate, infrastructure quality (power, internet), population growth (demand)
+        base_growth = draws['base_growth'] # National/base growth range
+
+        # Infrastructure multiplier (simplistic average)
+        power_factor = dense(infrastructure_data.get('power_reliability', {}), self.index, 0.9) / 0.9
+        internet_factor = dense(infrastructure_data.get('internet_penetration', {}), self.index, 0.6) / 0.6
+        infra_multiplier = (power_factor + internet_factor) / 2
+
+        growth_factor = 1 + base_growth * infra_multiplier
+        t.assign('gdp_per_capita', t.column('gdp_per_capita') * growth_factor, active)
+
+        # --- Unemployment ---
+        # Factors: GDP growth (inverse), population growth (direct), labor force participation (TBD)
+        gdp_growth = growth_factor - 1
+        # Placeholder: unemployment decreases with high GDP growth, increases slightly with population pressure
+        unemployment_change = - (gdp_growth - 0.05) * 0.1 # Decrease if growth > 5%
+        if demography_data:
+            # Labour supply: working-age growth beyond 3% a year adds to unemployment
+            labour_growth = dense(demography_data['working_age_growth'], self.index, 0.03)
+            unemployment_change = unemployment_change + (labour_growth - 0.03) * 0.05
+        unemployment = t.column('unemployment') * (1 + unemployment_change + draws['unemployment_noise'])
+        t.assign('unemployment', np.clip(unemployment, 0.02, 0.15), active) # Bounds
+
+        # --- Sectoral Shift --- (Placeholder)
+        # Driven by development stage (GDP), investment, education levels (social)
+        self._shift_sectors(active, draws)
+
+        # --- Informal Economy Share --- (Placeholder)
+        # Might decrease with formal sector growth, regulation (governance)
+        informal_share = t.column('informal_share') * (1 - (gdp_growth - 0.04) * 0.05 + draws['informal_noise'])
+        t.assign('informal_share', np.clip(informal_share, 0.1, 0.5), active)
+
+        if LOG.enabled(INFO):
+            LOG.info('economy.summary', "    Dhaka GDP per Capita Estimate: ${dhaka_gdp_per_capita:.0f}",
+                     year=year, dhaka_gdp_per_capita=estimate(t.view('gdp_per_capita', pending=True), 'Dhaka'))
+            LOG.info('economy.summary', "    Chattogram Unemployment Rate Estimate: {chattogram_unemployment:.3f}",
+                     year=year, chattogram_unemployment=estimate(t.view('unemployment', pending=True), 'Chattogram'))
         self.current_year = year
 
     def get_economy_state(self):
@@ -75,4 +133,4 @@ class UrbanEconomyModel:
             'unemployment': self.unemployment,
             'sectoral_employment': self.sectoral_employment,
             'informal_share': self.informal_share
-        } 
\ No newline at end of file
+        }
@@ -1,58 +1,117 @@
-import random
+import numpy as np
+
+from sim_random import UniformDraws
+from sim_log import INFO, LOG
+from state_store import CityIndex, StateTable, dense, GroupView, estimate
 
 class UrbanEnvironmentModel:
     """Model environmental systems and sustainability in Bangladesh cities"""
-    def __init__(self, config):
-        self.aqi = config['environment']['air_quality_index'].copy()
-        self.green_space = config['environment']['green_space_ratio'].copy() # % land area
-        self.flood_prone = config['environment']['flood_prone_area'].copy() # % land area (static for now)
-        self.recycling_rate = config['environment']['waste_recycling_rate'].copy() # %
+    # Random ranges drawn for every (replicate, city) in one batched call per step
+    DRAWS = UniformDraws({
+        'density_aqi': (2, 5),
+        'traffic_aqi': (1, 4),
+        'green_mitigation': (0, 2),
+        'green_loss': (0.001, 0.005),
+        'recycling_change': (0.005, 0.02),
+    })
+
+    # State passed to simulate_step after the year, and the state this model writes (with its getter)
+    STATE_READS = ('population', 'transport', 'land_use', 'infrastructure')
+    STATE_WRITES = {'environment': 'get_environment_state'}
+
+    def __init__(self, config, city_index=None, rng=None):
+        self.index = city_index or CityIndex.from_config(config)
+        environment_config = config['environment']
+        self.state = StateTable(self.index, columns=('aqi', 'green_space', 'flood_prone', 'recycling_rate'))
+        self.state.load('aqi', environment_config['air_quality_index'], default=150)
+        self.state.load('green_space', environment_config['green_space_ratio'], default=0.05) # % land area
+        self.state.load('flood_prone', environment_config['flood_prone_area']) # % land area (static for now)
+        self.state.load('recycling_rate', environment_config['waste_recycling_rate'], default=0.1) # %
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.current_year = 2025
-        print("UrbanEnvironmentModel Initialized")
+        LOG.info('model.init', "{model} Initialized", model='UrbanEnvironmentModel')
+
+    @property
+    def aqi(self):
+        return self.state.view('aqi')
+
+    @property
+    def green_space(self):
+        return self.state.view('green_space')
+
+    @property
+    def flood_prone(self):
+        return self.state.view('flood_prone')
+
+    @property
+    def recycling_rate(self):
+        return self.state.view('recycling_rate')
+
+    def _land_use_green(self, land_use_data):
+        """Per-city green land share from the growth model, with a mask of cities that report one."""
+        reported = np.zeros(len(self.index), dtype=bool)
+        green = self.state.column('green_space').copy()
+        if isinstance(land_use_data, GroupView) and self.index.same_as(land_use_data.table.index) and 'green' in land_use_data.categories:
+            table = land_use_data.table
+            col = table.columns[('land_use', 'green')]
+            reported = land_use_data.covered()
+            green_reported = table.front_mask[:, col]
+            # Cities with land use data but no 'green' entry keep their own green space ratio
+            green = np.where(green_reported, table.front[..., col], self.state.column('green_space'))
+            return reported, green
+        for city, row in land_use_data.items():
+            if city in self.index:
+                pos = self.index.position(city)
+                reported[pos] = True
+                if 'green' in row:
+                    green[..., pos] = row['green']
+        return reported, green
 
     def simulate_step(self, year, population_data, transport_data, land_use_data, infrastructure_data):
         """Simulates changes in environmental indicators like AQI, green space, recycling."""
-        print(f"  Simulating Environmental Dynamics for year {year}...")
-
-        for city in self.aqi: # Assuming keys exist for all tracked metrics
-            # --- Air Quality Index (AQI) ---
-            # Factors: Traffic (commute time/vehicles), industrial activity (economy - TBD), population density, green space (mitigation)
-            pop_density_factor = population_data.get(city, 1000000) / 10000000 # Relative to 10M
-            commute_factor = transport_data.get('avg_commute_time', {}).get(city, 60) / 60 # Relative to 60 mins
-            # Placeholder for industrial effect (needs economy data)
-            # industry_factor = economy_data.get('sectoral_employment', {}).get(city, {}).get('industry', 30) / 30
-            green_space_mitigation = (1 - self.green_space.get(city, 0.05) / 0.1) # Lower AQI if green space > 10%
-
-            aqi_change = (
-                pop_density_factor * random.uniform(2, 5) + # Density contribution
-                commute_factor * random.uniform(1, 4) + # Traffic contribution
-                # industry_factor * random.uniform(1, 3) +
-                - green_space_mitigation * random.uniform(0, 2) # Green space reduction
-            )
-            self.aqi[city] = max(30, self.aqi.get(city, 150) + aqi_change)
-
-            # --- Green Space Ratio ---
-            # Factors: Land conversion pressure (from growth model/land use)
-            # Updated based on land use changes passed from UrbanGrowthModel (or directly here)
-            if city in land_use_data:
-                 current_green_percentage = land_use_data[city].get('green', self.green_space.get(city, 5))
-                 self.green_space[city] = current_green_percentage # Update based on land use model results
-            else:
-                 # Fallback: slight decrease if not driven by land use model
-                 self.green_space[city] = self.green_space.get(city, 0.05) * (1 - random.uniform(0.001, 0.005))
-                 self.green_space[city] = max(0.01, self.green_space[city]) # Minimum green space
-
-            # --- Recycling Rate ---
-            # Factors: Waste collection efficiency (infra), policy/incentives (governance - TBD), citizen behaviour (social - TBD)
-            collection_factor = infrastructure_data.get('waste_collection', {}).get(city, 0.6) / 0.6
-            recycling_change = random.uniform(0.005, 0.02) * collection_factor # Higher collection enables better recycling
-            self.recycling_rate[city] = min(0.6, self.recycling_rate.get(city, 0.1) * (1 + recycling_change))
-
-            # --- Flood Prone Area --- (Considered static for now)
-            # Could be dynamic based on climate change impacts (resilience model) or drainage improvements (infra)
-
-        print(f"    Dhaka AQI Estimate: {self.aqi.get('Dhaka', 'N/A'):.0f}")
-        print(f"    Chattogram Green Space Ratio Estimate: {self.green_space.get('Chattogram', 'N/A'):.3f}")
+        LOG.info('environment.step', "  Simulating Environmental Dynamics for year {year}...", year=year)
+        t = self.state
+        draws = self.DRAWS.draw(self.rng, t.shape)
+        active = t.covered('aqi') # Assuming keys exist for all tracked metrics
+
+        # --- Air Quality Index (AQI) ---
+        # Factors: Traffic (commute time/vehicles), industrial activity (economy - TBD), population density, green space (mitigation)
+        pop_density_factor = dense(population_data, self.index, 1000000) / 10000000 # Relative to 10M
+        commute_factor = dense(transport_data.get('avg_commute_time', {}), self.index, 60) / 60 # Relative to 60 mins
+        # Placeholder for industrial effect (needs economy data)
+        # industry_factor = economy_data.get('sectoral_employment', {}).get(city, {}).get('industry', 30) / 30
+        green_space_mitigation = (1 - t.column('green_space') / 0.1) # Lower AQI if green space > 10%
+
+        aqi_change = (
+            pop_density_factor * draws['density_aqi'] + # Density contribution
+            commute_factor * draws['traffic_aqi'] + # Traffic contribution
+            # industry_factor * random.uniform(1, 3) +
+            - green_space_mitigation * draws['green_mitigation'] # Green space reduction
+        )
+        t.assign('aqi', np.maximum(30, t.column('aqi') + aqi_change), active)
+
+        # --- Green Space Ratio ---
+        # Factors: Land conversion pressure (from growth model/land use)
+        # Updated based on land use changes passed from UrbanGrowthModel (or directly here)
+        land_use_reported, land_use_green = self._land_use_green(land_use_data)
+        # Fallback: slight decrease if not driven by land use model
+        fallback_green = np.maximum(0.01, t.column('green_space') * (1 - draws['green_loss'])) # Minimum green space
+        t.assign('green_space', np.where(land_use_reported, land_use_green, fallback_green), active)
+
+        # --- Recycling Rate ---
+        # Factors: Waste collection efficiency (infra), policy/incentives (governance - TBD), citizen behaviour (social - TBD)
+        collection_factor = dense(infrastructure_data.get('waste_collection', {}), self.index, 0.6) / 0.6
+        recycling_change = draws['recycling_change'] * collection_factor # Higher collection enables better recycling
+        t.assign('recycling_rate', np.minimum(0.6, t.column('recycling_rate') * (1 + recycling_change)), active)
+
+        # --- Flood Prone Area --- (Considered static for now)
+        # Could be dynamic based on climate change impacts (resilience model) or drainage improvements (infra)
+
+        if LOG.enabled(INFO):
+            LOG.info('environment.summary', "    Dhaka AQI Estimate: {dhaka_aqi:.0f}",
+                     year=year, dhaka_aqi=estimate(t.view('aqi', pending=True), 'Dhaka'))
+            LOG.info('environment.summary', "    Chattogram Green Space Ratio Estimate: {chattogram_green_space:.3f}",
+                     year=year, chattogram_green_space=estimate(t.view('green_space', pending=True), 'Chattogram'))
         self.current_year = year
 
     def get_environment_state(self):
@@ -61,4 +120,4 @@ class UrbanEnvironmentModel:
             'green_space': self.green_space,
             'flood_prone': self.flood_prone,
             'recycling_rate': self.recycling_rate
-        } 
\ No newline at end of file
+        }
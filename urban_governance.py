@@ -1,56 +1,92 @@
-import random
+import numpy as np
+
+from sim_random import UniformDraws
+from sim_log import INFO, LOG
+from state_store import CityIndex, StateTable, dense, estimate
 
 class UrbanGovernanceModel:
     """Model governance frameworks and planning systems for Bangladesh cities"""
-    def __init__(self, config):
-        self.own_revenue = config['governance']['municipal_own_revenue'].copy() # % of total budget
-        self.satisfaction = config['governance']['citizen_satisfaction'].copy() # Index 0-1
-        self.compliance = config['governance']['planning_compliance'].copy() # % development adhering to plan
+    # Random ranges drawn for every (replicate, city) in one batched call per step
+    DRAWS = UniformDraws({
+        'satisfaction_noise': (-0.015, 0.015),
+        'revenue_change': (0.001, 0.01),
+        'compliance_noise': (-0.01, 0.01),
+    })
+
+    # State passed to simulate_step after the year, and the state this model writes (with its getter)
+    STATE_READS = ('infrastructure', 'social')
+    STATE_WRITES = {'governance': 'get_governance_state'}
+
+    def __init__(self, config, city_index=None, rng=None):
+        self.index = city_index or CityIndex.from_config(config)
+        governance_config = config['governance']
+        self.state = StateTable(self.index, columns=('own_revenue', 'satisfaction', 'compliance'))
+        self.state.load('own_revenue', governance_config['municipal_own_revenue'], default=0.3) # % of total budget
+        self.state.load('satisfaction', governance_config['citizen_satisfaction'], default=0.5) # Index 0-1
+        self.state.load('compliance', governance_config['planning_compliance'], default=0.45) # % development adhering to plan
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.current_year = 2025
-        print("UrbanGovernanceModel Initialized")
+        LOG.info('model.init', "{model} Initialized", model='UrbanGovernanceModel')
+
+    @property
+    def own_revenue(self):
+        return self.state.view('own_revenue')
+
+    @property
+    def satisfaction(self):
+        return self.state.view('satisfaction')
+
+    @property
+    def compliance(self):
+        return self.state.view('compliance')
 
     def simulate_step(self, year, infrastructure_data, social_data):
         """Simulates changes in governance indicators like revenue, satisfaction, and compliance."""
-        print(f"  Simulating Governance Dynamics for year {year}...")
-
-        for city in self.satisfaction: # Assuming keys exist for all tracked metrics
-            # --- Citizen Satisfaction ---
-            # Factors: Service levels (infra), social conditions (cohesion, crime), maybe transparency/participation (TBD)
-            # Simple average of key service coverages
-            avg_infra_coverage = (
-                infrastructure_data.get('water_coverage', {}).get(city, 0.5) +
-                infrastructure_data.get('sanitation_coverage', {}).get(city, 0.5) +
-                infrastructure_data.get('power_reliability', {}).get(city, 0.8) +
-                infrastructure_data.get('waste_collection', {}).get(city, 0.5)
-            ) / 4
-
-            # Social factors (e.g., cohesion improvement, crime reduction)
-            cohesion_level = social_data.get('cohesion', {}).get(city, 0.6)
-            crime_level_factor = 1 - (social_data.get('crime_rate', {}).get(city, 250) / 300) # Inverse relationship relative to Dhaka start
-
-            satisfaction_change = (
-                (avg_infra_coverage - 0.65) * 0.05 + # Driven by infrastructure level vs a baseline
-                (cohesion_level - 0.6) * 0.03 + # Driven by social cohesion vs baseline
-                (crime_level_factor - 0.0) * 0.02 # Driven by crime reduction
-                 + random.uniform(-0.015, 0.015) # Random fluctuation
-            )
-            self.satisfaction[city] = max(0.1, min(0.9, self.satisfaction.get(city, 0.5) + satisfaction_change))
-
-            # --- Municipal Own Revenue ---
-            # Factors: Economic growth (tax base), collection efficiency (institutional capacity - TBD)
-            # Placeholder: Slight increase linked to GDP growth
-            # gdp_growth = economy_data... # Needs economy data passed in
-            revenue_change = random.uniform(0.001, 0.01) # Slow base increase
-            self.own_revenue[city] = min(0.8, max(0.1, self.own_revenue.get(city, 0.3) * (1 + revenue_change)))
-
-            # --- Planning Compliance ---
-            # Factors: Enforcement capacity (institutional), development pressure (growth), citizen awareness (satisfaction?)
-            # Placeholder: Slight random fluctuation, maybe higher compliance if satisfaction is high?
-            compliance_change = random.uniform(-0.01, 0.01) + (self.satisfaction[city] - 0.5)*0.01
-            self.compliance[city] = min(0.9, max(0.2, self.compliance.get(city, 0.45) * (1 + compliance_change)))
-
-        print(f"    Dhaka Citizen Satisfaction Estimate: {self.satisfaction.get('Dhaka', 'N/A'):.2f}")
-        print(f"    Chattogram Planning Compliance Estimate: {self.compliance.get('Chattogram', 'N/A'):.2f}")
+        LOG.info('governance.step', "  Simulating Governance Dynamics for year {year}...", year=year)
+        t = self.state
+        draws = self.DRAWS.draw(self.rng, t.shape)
+        active = t.covered('satisfaction') # Assuming keys exist for all tracked metrics
+
+        # --- Citizen Satisfaction ---
+        # Factors: Service levels (infra), social conditions (cohesion, crime), maybe transparency/participation (TBD)
+        # Simple average of key service coverages
+        avg_infra_coverage = (
+            dense(infrastructure_data.get('water_coverage', {}), self.index, 0.5) +
+            dense(infrastructure_data.get('sanitation_coverage', {}), self.index, 0.5) +
+            dense(infrastructure_data.get('power_reliability', {}), self.index, 0.8) +
+            dense(infrastructure_data.get('waste_collection', {}), self.index, 0.5)
+        ) / 4
+
+        # Social factors (e.g., cohesion improvement, crime reduction)
+        cohesion_level = dense(social_data.get('cohesion', {}), self.index, 0.6)
+        crime_level_factor = 1 - (dense(social_data.get('crime_rate', {}), self.index, 250) / 300) # Inverse relationship relative to Dhaka start
+
+        satisfaction_change = (
+            (avg_infra_coverage - 0.65) * 0.05 + # Driven by infrastructure level vs a baseline
+            (cohesion_level - 0.6) * 0.03 + # Driven by social cohesion vs baseline
+            (crime_level_factor - 0.0) * 0.02 # Driven by crime reduction
+             + draws['satisfaction_noise'] # Random fluctuation
+        )
+        t.assign('satisfaction', np.clip(t.column('satisfaction') + satisfaction_change, 0.1, 0.9), active)
+
+        # --- Municipal Own Revenue ---
+        # Factors: Economic growth (tax base), collection efficiency (institutional capacity - TBD)
+        # Placeholder: Slight increase linked to GDP growth
+        # gdp_growth = economy_data... # Needs economy data passed in
+        revenue_change = draws['revenue_change'] # Slow base increase
+        t.assign('own_revenue', np.clip(t.column('own_revenue') * (1 + revenue_change), 0.1, 0.8), active)
+
+        # --- Planning Compliance ---
+        # Factors: Enforcement capacity (institutional), development pressure (growth), citizen awareness (satisfaction?)
+        # Placeholder: Slight random fluctuation, maybe higher compliance if satisfaction is high?
+        compliance_change = draws['compliance_noise'] + (t.column('satisfaction') - 0.5) * 0.01
+        t.assign('compliance', np.clip(t.column('compliance') * (1 + compliance_change), 0.2, 0.9), active)
+
+        if LOG.enabled(INFO):
+            LOG.info('governance.summary', "    Dhaka Citizen Satisfaction Estimate: {dhaka_satisfaction:.2f}",
+                     year=year, dhaka_satisfaction=estimate(t.view('satisfaction', pending=True), 'Dhaka'))
+            LOG.info('governance.summary', "    Chattogram Planning Compliance Estimate: {chattogram_compliance:.2f}",
+                     year=year, chattogram_compliance=estimate(t.view('compliance', pending=True), 'Chattogram'))
         self.current_year = year
 
     def get_governance_state(self):
@@ -58,4 +94,4 @@ class UrbanGovernanceModel:
             'municipal_own_revenue': self.own_revenue,
             'citizen_satisfaction': self.satisfaction,
             'planning_compliance': self.compliance
-        } 
\ No newline at end of file
+        }
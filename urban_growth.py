@@ -1,64 +1,133 @@
-import random
+import numpy as np
+
+from demography import COHORTS, DEMOGRAPHY_COLUMNS, CohortProjection
+from sim_log import INFO, LOG
+from state_store import CityIndex, StateTable, dense, group_categories, estimate
 
 class UrbanGrowthModel:
     """Model urban expansion patterns and spatial transformation in Bangladesh"""
-    def __init__(self, config):
-        self.population = config['urban_growth']['initial_population'].copy()
-        self.growth_rate = config['urban_growth']['annual_growth_rate']
+    # State passed to simulate_step after the year, and the state this model writes (with its getter)
+    STATE_READS = ()
+    STATE_WRITES = {'population': 'get_population', 'land_use': 'get_land_use', 'demography': 'get_demography'}
+
+    def __init__(self, config, city_index=None, rng=None, land_grid=None):
+        self.index = city_index or CityIndex.from_config(config)
+        growth_config = config['urban_growth']
+        # Optional CohortProjection: with a 'demography' section, population is projected by age and sex
+        demography = config.get('demography')
+        self.cohorts = CohortProjection(demography, self.index) if demography is not None else None
+        groups = {'land_use': group_categories(growth_config['land_use'])}
+        if self.cohorts is not None:
+            groups['cohorts'] = COHORTS
+        self.state = StateTable(self.index, columns=('population',) + (DEMOGRAPHY_COLUMNS if self.cohorts else ()),
+                                groups=groups, integer=('population',))
+        self.state.load('population', growth_config['initial_population'])
+        if self.cohorts is not None:
+            populated = self.state.covered('population')
+            cohorts = self.cohorts.initial(self.state.column('population'))
+            self.state.load_array('cohorts', cohorts, populated)
+            for name, values in zip(DEMOGRAPHY_COLUMNS, self.cohorts.summaries(cohorts) + (0.0, 0.0)):
+                self.state.load_array(name, values, populated)
         # Store land use data per city - more complex structure might be needed later
-        self.land_use = config['urban_growth']['land_use'].copy()
-        self.peri_urban = config['urban_growth']['peri_urban_areas']
+        self.state.load_group('land_use', growth_config['land_use'])
+        # Optional LandUseGrid: its cities' land use is simulated cell by cell and counted off their rasters
+        self.grid = land_grid
+        if land_grid is not None:
+            if tuple(land_grid.categories) != self.state.groups['land_use'][2]:
+                raise ValueError("The land use grid's classes do not match the configured land use categories")
+            self.state.load_group('land_use', land_grid.land_use(self.index))
+        self.growth_rate = dense(growth_config['annual_growth_rate'], self.index, 0.02) # Use specific rate or default
+        self.peri_urban = growth_config['peri_urban_areas']
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.current_year = 2025
-        print("UrbanGrowthModel Initialized")
+        LOG.info('model.init', "{model} Initialized", model='UrbanGrowthModel')
+
+    @property
+    def population(self):
+        return self.state.view('population')
+
+    @property
+    def land_use(self):
+        return self.state.group_view('land_use')
 
     def simulate_step(self, year):
         """Simulates population growth and basic land use pressure for one year."""
-        print(f"  Simulating Urban Growth for year {year}...")
-        cities_to_simulate = list(self.population.keys()) # Simulate for cities with initial population
-
-        for city in cities_to_simulate:
-            pop = self.population[city]
-            rate = self.growth_rate.get(city, 0.02) # Use specific rate or default
-            natural_increase = pop * (rate * 0.6) # Example: 60% of growth is natural
-            migration = pop * (rate * 0.4) # Example: 40% is migration (could link to rural model later)
-
-            # Add stochasticity
-            growth_variation = random.normalvariate(1, 0.05) # +/- 5% variation around the rate
-            new_pop = pop + (natural_increase + migration) * growth_variation
-            self.population[city] = max(0, int(new_pop)) # Ensure population doesn't go negative
-
-            # --- Placeholder Land Use Change ---
-            # Needs more sophisticated spatial representation (e.g., grid, zones)
-            # For now, just track % changes based on pop pressure
-            if city in self.land_use:
-                pop_increase_fraction = (self.population[city] - pop) / pop if pop > 0 else 0
-                if pop_increase_fraction > 0:
-                    # Assume increased demand for residential/informal
-                    demand_factor = pop_increase_fraction * 0.1 # How much land % changes relative to pop % change
-
-                    convertible_land = self.land_use[city].get('green', 0) # Prioritize converting green first
-
-                    conversion_amount = min(convertible_land, self.land_use[city].get('green', 0) * demand_factor * 2) # Convert up to demand*2 from green
-
-                    if conversion_amount > 0:
-                         self.land_use[city]['green'] = self.land_use[city].get('green', 0) - conversion_amount
-                         # Distribute converted land (example: 70% informal, 30% residential)
-                         self.land_use[city]['informal'] = self.land_use[city].get('informal', 0) + conversion_amount * 0.7
-                         self.land_use[city]['residential'] = self.land_use[city].get('residential', 0) + conversion_amount * 0.3
-                         # Ensure percentages roughly sum to 100 (crude normalization)
-                         total_land = sum(self.land_use[city].values())
-                         if total_land > 0:
-                             for use, percent in self.land_use[city].items():
-                                 self.land_use[city][use] = (percent / total_land) * 100
-
-
-        print(f"    Dhaka Population Estimate: {self.population.get('Dhaka', 'N/A')}")
-        if 'Dhaka' in self.land_use:
-             print(f"    Dhaka Land Use Estimate (Green%): {self.land_use['Dhaka'].get('green', 'N/A'):.1f}")
+        LOG.info('growth.step', "  Simulating Urban Growth for year {year}...", year=year)
+        t = self.state
+        active = t.covered('population') # Simulate for cities with initial population
+
+        pop = t.column('population').copy()
+        # Add stochasticity (one batched draw for every replicate and city)
+        growth_variation = self.rng.normal(1, 0.05, size=t.shape) # +/- 5% variation around the rate
+        if self.cohorts is not None:
+            # Births and deaths come from the age-sex schedules; migration keeps its 40% share of the rate
+            working, school = t.column('working_age').copy(), t.column('school_age').copy()
+            totals, new_working, new_school = self.cohorts.advance(t.group('cohorts'), self.growth_rate * 0.4,
+                                                                   growth_variation)
+            new_pop = np.floor(totals)
+            for name, values in (('working_age', new_working), ('school_age', new_school),
+                                 ('working_age_growth', _growth(new_working, working)),
+                                 ('school_age_growth', _growth(new_school, school))):
+                t.assign(name, values, active)
+        else:
+            natural_increase = pop * (self.growth_rate * 0.6) # Example: 60% of growth is natural
+            migration = pop * (self.growth_rate * 0.4) # Example: 40% is migration (could link to rural model later)
+            new_pop = np.maximum(0, np.floor(pop + (natural_increase + migration) * growth_variation)) # Ensure population doesn't go negative
+        t.assign('population', new_pop, active)
+
+        # --- Land Use Change ---
+        # Population pressure sets how much green land converts; cities without a land use grid
+        # just track the resulting % changes (see land_use_grid for the spatial version)
+        if 'land_use' in t.groups:
+            pop_increase_fraction = np.divide(new_pop - pop, pop, out=np.zeros_like(pop), where=pop > 0)
+            # Assume increased demand for residential/informal
+            demand_factor = pop_increase_fraction * 0.1 # How much land % changes relative to pop % change
+
+            land_use = t.group('land_use').copy()
+            categories = t.groups['land_use'][2]
+            green = land_use[..., categories.index('green')] if 'green' in categories else np.zeros_like(pop) # Prioritize converting green first
+            conversion_amount = np.minimum(green, green * demand_factor * 2) # Convert up to demand*2 from green
+
+            converting = active & t.covered('land_use') & (pop_increase_fraction > 0) & (conversion_amount > 0)
+            if converting.any():
+                land_use[..., categories.index('green')] -= conversion_amount
+                # Distribute converted land (example: 70% informal, 30% residential)
+                for use, share in (('informal', 0.7), ('residential', 0.3)):
+                    if use in categories:
+                        land_use[..., categories.index(use)] += conversion_amount * share
+                # Ensure percentages roughly sum to 100 (crude normalization)
+                total_land = land_use.sum(axis=-1, keepdims=True)
+                land_use = np.divide(land_use * 100, total_land, out=land_use, where=total_land > 0)
+                t.assign_group('land_use', land_use, converting)
+
+            if self.grid is not None:
+                # Gridded cities allocate their conversion demand to individual green cells instead
+                demand = np.where(converting, conversion_amount, 0.0)[..., self.grid.positions]
+                land_use[..., self.grid.positions, :] = self.grid.step(demand, self.rng)
+                gridded = np.zeros(len(self.index), dtype=bool)
+                gridded[self.grid.positions] = True
+                t.assign_group('land_use', land_use, gridded)
+
+        if LOG.enabled(INFO):
+            LOG.info('growth.summary', "    Dhaka Population Estimate: {dhaka_population:.0f}",
+                     year=year, dhaka_population=estimate(t.view('population', pending=True), 'Dhaka'))
+            if 'Dhaka' in self.land_use:
+                 LOG.info('growth.land_use', "    Dhaka Land Use Estimate (Green%): {dhaka_green_share:.1f}",
+                          year=year, dhaka_green_share=estimate(t.group_view('land_use', pending=True)['Dhaka'], 'green'))
         self.current_year = year
 
     def get_population(self):
         return self.population
 
     def get_land_use(self):
-        return self.land_use 
\ No newline at end of file
+        return self.land_use
+
+    def get_demography(self):
+        """Working-age and school-age counts and their yearly growth; empty without cohorts."""
+        if self.cohorts is None:
+            return {}
+        return {name: self.state.view(name) for name in DEMOGRAPHY_COLUMNS}
+
+
+def _growth(new, old):
+    return np.divide(new - old, old, out=np.zeros_like(old), where=old > 0)
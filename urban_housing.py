@@ -1,69 +1,112 @@
-import random
+import numpy as np
+
+from sim_random import UniformDraws
+from sim_log import INFO, LOG
+from state_store import CityIndex, StateTable, dense, group_categories, estimate
 
 class UrbanHousingModel:
     """Model housing production, markets and affordability in Bangladesh cities"""
-    def __init__(self, config):
-        self.housing_stock = config['housing']['initial_housing_stock'].copy()
-        self.prices = config['housing']['avg_house_price'].copy()
-        self.rents = config['housing']['avg_rent'].copy()
-        self.affordability = config['housing']['affordability_ratio'].copy()
+    # Random ranges drawn for every (replicate, city) in one batched call per step
+    DRAWS = UniformDraws({
+        'formal_construction': (0.02, 0.05),
+        'informal_construction': (0.1, 0.2),
+        'price_increase': (0.01, 0.03),
+        'rent_increase': (0.01, 0.04),
+    })
+
+    # State passed to simulate_step after the year, and the state this model writes (with its getter)
+    STATE_READS = ('population', 'economy')
+    STATE_WRITES = {'housing': 'get_housing_state'}
+
+    def __init__(self, config, city_index=None, rng=None):
+        self.index = city_index or CityIndex.from_config(config)
+        housing_config = config['housing']
+        self.state = StateTable(self.index, columns=('prices', 'rents', 'affordability'),
+                                groups={'housing_stock': group_categories(housing_config['initial_housing_stock'])},
+                                integer=('housing_stock',))
+        self.state.load_group('housing_stock', housing_config['initial_housing_stock'])
+        self.state.load('prices', housing_config['avg_house_price'], default=50)
+        self.state.load('rents', housing_config['avg_rent'], default=15000)
+        self.state.load('affordability', housing_config['affordability_ratio'], default=15)
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.current_year = 2025
-        print("UrbanHousingModel Initialized")
+        LOG.info('model.init', "{model} Initialized", model='UrbanHousingModel')
+
+    @property
+    def housing_stock(self):
+        return self.state.group_view('housing_stock')
+
+    @property
+    def prices(self):
+        return self.state.view('prices')
+
+    @property
+    def rents(self):
+        return self.state.view('rents')
+
+    @property
+    def affordability(self):
+        return self.state.view('affordability')
+
+    def _stock(self, tenure):
+        if ('housing_stock', tenure) in self.state.columns:
+            return self.state.category('housing_stock', tenure).copy()
+        return np.zeros(self.state.shape)
 
     def simulate_step(self, year, population_data, economy_data):
         """Simulates housing stock changes, price adjustments, and affordability."""
-        print(f"  Simulating Housing Dynamics for year {year}...")
+        LOG.info('housing.step', "  Simulating Housing Dynamics for year {year}...", year=year)
+        t = self.state
+        draws = self.DRAWS.draw(self.rng, t.shape)
+        active = t.covered('housing_stock')
 
         # Calculate housing need based on population and household size
         avg_household_size = 4.5 # Could be city-specific or change over time
-        housing_need = {}
-        for city, pop in population_data.items():
-            housing_need[city] = pop / avg_household_size
-
-        for city, stock in self.housing_stock.items():
-            current_supply = stock.get('formal', 0) + stock.get('informal', 0)
-            needed = housing_need.get(city, 0)
-            deficit = needed - current_supply
-
-            # --- Housing Construction (Placeholder) ---
-            # Formal construction might depend on profitability, regulations (governance), land availability (growth model)
-            # Informal growth depends on deficit and lack of formal options
-            if deficit > 0:
-                # Assume only a fraction of the *deficit* is met by new construction this year
-                formal_construction_rate = random.uniform(0.02, 0.05) # % of deficit met by formal sector
-                informal_construction_rate = random.uniform(0.1, 0.2) # % of deficit met by informal sector
-
-                new_formal = int(deficit * formal_construction_rate)
-                new_informal = int(deficit * informal_construction_rate)
-
-                stock['formal'] = stock.get('formal', 0) + new_formal
-                stock['informal'] = stock.get('informal', 0) + new_informal
-            else:
-                 # Optional: Add logic for vacancy or demolition if supply exceeds need
-                 pass
-
-            # --- Price/Rent Adjustment (Placeholder) ---
-            # Should depend on supply/demand imbalance, economic conditions (GDP growth), construction costs
-            demand_pressure = max(0, deficit / current_supply) if current_supply > 0 else 0.1 # Ratio of deficit to supply
-            gdp_growth_factor = (economy_data.get('gdp_per_capita', {}).get(city, 5000) / 5000) # Relative GDP factor
-
-            price_increase_rate = random.uniform(0.01, 0.03) + demand_pressure * 0.1 + (gdp_growth_factor -1) * 0.05
-            rent_increase_rate = random.uniform(0.01, 0.04) + demand_pressure * 0.15 + (gdp_growth_factor -1) * 0.03
-
-            self.prices[city] = self.prices.get(city, 50) * (1 + price_increase_rate)
-            self.rents[city] = self.rents.get(city, 15000) * (1 + rent_increase_rate)
-
-            # --- Affordability Update --- (Price-to-Income Ratio)
-            # Requires income data (e.g., from economy model)
-            # Placeholder: Link affordability ratio inversely to price changes
-            # A proper calculation would use median income vs median house price
-            self.affordability[city] = self.affordability.get(city, 15) * (1 + price_increase_rate * 0.5) # Worsens with price increase
-            self.affordability[city] = max(5, self.affordability[city]) # Floor value
-
-
-        print(f"    Dhaka Housing Stock Estimate: Formal={self.housing_stock.get('Dhaka', {}).get('formal', 'N/A')}, Informal={self.housing_stock.get('Dhaka', {}).get('informal', 'N/A')}")
-        print(f"    Dhaka Avg House Price (Lakh BDT): {self.prices.get('Dhaka', 'N/A'):.1f}")
-        print(f"    Dhaka Affordability Ratio: {self.affordability.get('Dhaka', 'N/A'):.1f}")
+        housing_need = dense(population_data, self.index, 0) / avg_household_size
+
+        formal, informal = self._stock('formal'), self._stock('informal')
+        current_supply = formal + informal
+        deficit = housing_need - current_supply
+
+        # --- Housing Construction (Placeholder) ---
+        # Formal construction might depend on profitability, regulations (governance), land availability (growth model)
+        # Informal growth depends on deficit and lack of formal options
+        # Assume only a fraction of the *deficit* is met by new construction this year
+        formal_construction_rate = draws['formal_construction'] # % of deficit met by formal sector
+        informal_construction_rate = draws['informal_construction'] # % of deficit met by informal sector
+        building = active & (deficit > 0) # Optional: Add logic for vacancy or demolition if supply exceeds need
+        for tenure, new_units in (('formal', np.floor(deficit * formal_construction_rate)),
+                                  ('informal', np.floor(deficit * informal_construction_rate))):
+            if ('housing_stock', tenure) in t.columns:
+                t.category('housing_stock', tenure)[building] += new_units[building]
+
+        # --- Price/Rent Adjustment (Placeholder) ---
+        # Should depend on supply/demand imbalance, economic conditions (GDP growth), construction costs
+        demand_pressure = np.where(current_supply > 0,
+                                   np.maximum(0, np.divide(deficit, current_supply, out=np.zeros_like(deficit), where=current_supply > 0)),
+                                   0.1) # Ratio of deficit to supply
+        gdp_growth_factor = dense(economy_data.get('gdp_per_capita', {}), self.index, 5000) / 5000 # Relative GDP factor
+
+        price_increase_rate = draws['price_increase'] + demand_pressure * 0.1 + (gdp_growth_factor - 1) * 0.05
+        rent_increase_rate = draws['rent_increase'] + demand_pressure * 0.15 + (gdp_growth_factor - 1) * 0.03
+
+        t.assign('prices', t.column('prices') * (1 + price_increase_rate), active)
+        t.assign('rents', t.column('rents') * (1 + rent_increase_rate), active)
+
+        # --- Affordability Update --- (Price-to-Income Ratio)
+        # Requires income data (e.g., from economy model)
+        # Placeholder: Link affordability ratio inversely to price changes
+        # A proper calculation would use median income vs median house price
+        affordability = t.column('affordability') * (1 + price_increase_rate * 0.5) # Worsens with price increase
+        t.assign('affordability', np.maximum(5, affordability), active) # Floor value
+
+        if LOG.enabled(INFO):
+            LOG.info('housing.summary', "    Dhaka Housing Stock Estimate: Formal={dhaka_formal_stock:.0f}, Informal={dhaka_informal_stock:.0f}",
+                     year=year, dhaka_formal_stock=estimate(t.group_view('housing_stock', pending=True).get('Dhaka', {}), 'formal'), dhaka_informal_stock=estimate(t.group_view('housing_stock', pending=True).get('Dhaka', {}), 'informal'))
+            LOG.info('housing.summary', "    Dhaka Avg House Price (Lakh BDT): {dhaka_price:.1f}",
+                     year=year, dhaka_price=estimate(t.view('prices', pending=True), 'Dhaka'))
+            LOG.info('housing.summary', "    Dhaka Affordability Ratio: {dhaka_affordability:.1f}",
+                     year=year, dhaka_affordability=estimate(t.view('affordability', pending=True), 'Dhaka'))
         self.current_year = year
 
     def get_housing_stock(self):
@@ -76,4 +119,13 @@ class UrbanHousingModel:
         return self.rents
 
     def get_affordability(self):
-        return self.affordability 
\ No newline at end of file
+        return self.affordability
+
+    def get_housing_state(self):
+        """Combined housing metrics for the models that depend on the housing market."""
+        return {
+            'housing_stock': self.get_housing_stock(),
+            'prices': self.get_prices(),
+            'rents': self.get_rents(),
+            'affordability': self.get_affordability()
+        }
@@ -1,69 +1,99 @@
-import random
+import numpy as np
+
+from sim_random import UniformDraws
+from sim_log import INFO, LOG
+from state_store import CityIndex, StateTable, dense, estimate
 
 class UrbanInfrastructureModel:
     """Model infrastructure networks and service delivery in Bangladesh cities"""
-    def __init__(self, config):
-        self.water_coverage = config['infrastructure']['water_coverage'].copy()
-        self.sanitation_coverage = config['infrastructure']['sanitation_coverage'].copy()
-        self.power_reliability = config['infrastructure']['power_reliability'].copy()
-        self.waste_collection = config['infrastructure']['waste_collection'].copy()
-        self.internet_penetration = config['infrastructure']['internet_penetration'].copy()
+    INDICATORS = ('water_coverage', 'sanitation_coverage', 'power_reliability', 'waste_collection', 'internet_penetration')
+    # Base improvement ranges, drawn for every (replicate, city) in one batched call per step
+    DRAWS = UniformDraws({
+        'water_coverage': (0.005, 0.02),
+        'sanitation_coverage': (0.004, 0.018),
+        'power_reliability': (0.002, 0.01),
+        'waste_collection': (0.005, 0.02),
+        'internet_penetration': (0.02, 0.05),
+    })
+
+    # State passed to simulate_step after the year, and the state this model writes (with its getter)
+    STATE_READS = ('population', 'governance')
+    STATE_WRITES = {'infrastructure': 'get_infrastructure_state'}
+
+    def __init__(self, config, city_index=None, rng=None):
+        self.index = city_index or CityIndex.from_config(config)
+        infra_config = config['infrastructure']
+        self.state = StateTable(self.index, columns=self.INDICATORS)
+        self.state.load('water_coverage', infra_config['water_coverage'])
+        self.state.load('sanitation_coverage', infra_config['sanitation_coverage'], default=0.5)
+        self.state.load('power_reliability', infra_config['power_reliability'], default=0.8)
+        self.state.load('waste_collection', infra_config['waste_collection'], default=0.5)
+        self.state.load('internet_penetration', infra_config['internet_penetration'], default=0.5)
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.current_year = 2025
-        print("UrbanInfrastructureModel Initialized")
+        LOG.info('model.init', "{model} Initialized", model='UrbanInfrastructureModel')
+
+    @property
+    def water_coverage(self):
+        return self.state.view('water_coverage')
+
+    @property
+    def sanitation_coverage(self):
+        return self.state.view('sanitation_coverage')
+
+    @property
+    def power_reliability(self):
+        return self.state.view('power_reliability')
+
+    @property
+    def waste_collection(self):
+        return self.state.view('waste_collection')
+
+    @property
+    def internet_penetration(self):
+        return self.state.view('internet_penetration')
+
+    def _improve(self, name, base_improvement, investment_factor, strain_factor):
+        """Diminishing-returns coverage improvement applied to every city at once."""
+        current_coverage = self.state.column(name)
+        improvement = base_improvement * investment_factor * (1 - current_coverage) # Diminishing returns
+        improvement *= strain_factor # Apply strain factor
+        return np.minimum(1.0, current_coverage + improvement)
 
     def simulate_step(self, year, population_data, governance_data):
         """Simulates the improvement or degradation of infrastructure coverage/quality."""
-        print(f"  Simulating Infrastructure Dynamics for year {year}...")
-
-        for city in self.water_coverage: # Assuming keys exist for all tracked metrics
-            # Factors influencing infrastructure improvement:
-            # - Population Growth (increases strain, may slow coverage % increase)
-            # - Municipal Revenue/Investment (governance)
-            # - Base level (diminishing returns as coverage approaches 100%)
-
-            pop_growth_factor = (population_data.get(city, 1) / population_data.get(city, 1)) -1 # Need previous year pop or calculate growth
-            # For simplicity now, just use a small negative effect if pop grows
-            pop_strain = population_data.get(city, 1000000) > 1000000 # Example simple check
-
-            investment_factor = governance_data.get('own_revenue', {}).get(city, 0.3) / 0.3 # Relative revenue
-
-            # Water Coverage
-            base_improvement = random.uniform(0.005, 0.02)
-            current_coverage = self.water_coverage[city]
-            improvement = base_improvement * investment_factor * (1 - current_coverage) # Diminishing returns
-            improvement *= (0.95 if pop_strain else 1.0) # Apply strain factor
-            self.water_coverage[city] = min(1.0, current_coverage + improvement)
-
-            # Sanitation Coverage
-            base_improvement = random.uniform(0.004, 0.018)
-            current_coverage = self.sanitation_coverage.get(city, 0.5)
-            improvement = base_improvement * investment_factor * (1 - current_coverage)
-            improvement *= (0.90 if pop_strain else 1.0) # Sanitation potentially more strained
-            self.sanitation_coverage[city] = min(1.0, current_coverage + improvement)
-
-            # Power Reliability
-            base_improvement = random.uniform(0.002, 0.01)
-            current_level = self.power_reliability.get(city, 0.8)
-            improvement = base_improvement * investment_factor * (1 - current_level)
-            improvement *= (0.97 if pop_strain else 1.0)
-            self.power_reliability[city] = min(1.0, current_level + improvement)
-
-            # Waste Collection
-            base_improvement = random.uniform(0.005, 0.02)
-            current_coverage = self.waste_collection.get(city, 0.5)
-            improvement = base_improvement * investment_factor * (1 - current_coverage)
-            improvement *= (0.90 if pop_strain else 1.0)
-            self.waste_collection[city] = min(1.0, current_coverage + improvement)
+        LOG.info('infrastructure.step', "  Simulating Infrastructure Dynamics for year {year}...", year=year)
+        t = self.state
+        draws = self.DRAWS.draw(self.rng, t.shape)
+        active = t.covered('water_coverage') # Assuming keys exist for all tracked metrics
 
-            # Internet Penetration (driven more by private sector/national policy but influenced by demand/urbanization)
-            base_improvement = random.uniform(0.02, 0.05)
-            current_coverage = self.internet_penetration.get(city, 0.5)
-            improvement = base_improvement * (1 - current_coverage) # Less dependent on local gov revenue
-            self.internet_penetration[city] = min(1.0, current_coverage + improvement)
+        # Factors influencing infrastructure improvement:
+        # - Population Growth (increases strain, may slow coverage % increase)
+        # - Municipal Revenue/Investment (governance)
+        # - Base level (diminishing returns as coverage approaches 100%)
 
+        # For simplicity now, just use a small negative effect if pop grows
+        pop_strain = dense(population_data, self.index, 1000000) > 1000000 # Example simple check
+
+        investment_factor = dense(governance_data.get('own_revenue', {}), self.index, 0.3) / 0.3 # Relative revenue
+
+        updates = {
+            'water_coverage': self._improve('water_coverage', draws['water_coverage'], investment_factor, np.where(pop_strain, 0.95, 1.0)),
+            # Sanitation potentially more strained
+            'sanitation_coverage': self._improve('sanitation_coverage', draws['sanitation_coverage'], investment_factor, np.where(pop_strain, 0.90, 1.0)),
+            'power_reliability': self._improve('power_reliability', draws['power_reliability'], investment_factor, np.where(pop_strain, 0.97, 1.0)),
+            'waste_collection': self._improve('waste_collection', draws['waste_collection'], investment_factor, np.where(pop_strain, 0.90, 1.0)),
+            # Internet Penetration (driven more by private sector/national policy but influenced by demand/urbanization)
+            'internet_penetration': self._improve('internet_penetration', draws['internet_penetration'], 1.0, 1.0), # Less dependent on local gov revenue
+        }
+        for name, new_values in updates.items():
+            t.assign(name, new_values, active)
 
-        print(f"    Dhaka Water Coverage Estimate: {self.water_coverage.get('Dhaka', 'N/A'):.2f}")
-        print(f"    Khulna Sanitation Coverage Estimate: {self.sanitation_coverage.get('Khulna', 'N/A'):.2f}")
+        if LOG.enabled(INFO):
+            LOG.info('infrastructure.summary', "    Dhaka Water Coverage Estimate: {dhaka_water_coverage:.2f}",
+                     year=year, dhaka_water_coverage=estimate(t.view('water_coverage', pending=True), 'Dhaka'))
+            LOG.info('infrastructure.summary', "    Khulna Sanitation Coverage Estimate: {khulna_sanitation_coverage:.2f}",
+                     year=year, khulna_sanitation_coverage=estimate(t.view('sanitation_coverage', pending=True), 'Khulna'))
         self.current_year = year
 
     def get_infrastructure_state(self):
@@ -74,4 +104,4 @@ class UrbanInfrastructureModel:
             'power_reliability': self.power_reliability,
             'waste_collection': self.waste_collection,
             'internet_penetration': self.internet_penetration,
-        } 
\ No newline at end of file
+        }
@@ -1,48 +1,84 @@
-import random
+import numpy as np
+
+from sim_random import UniformDraws
+from sim_log import INFO, LOG
+from state_store import CityIndex, StateTable, dense, estimate
 
 class UrbanResilienceModel:
     """Model risk reduction and resilience building in Bangladesh cities"""
-    def __init__(self, config):
-        self.warning_coverage = config['resilience']['early_warning_coverage'].copy() # % pop covered
-        self.code_compliance = config['resilience']['building_code_compliance'].copy() # % new builds
-        self.recovery_speed = config['resilience']['disaster_recovery_speed'].copy() # Avg time (days), lower is better
+    # Random ranges drawn for every (replicate, city) in one batched call per step
+    DRAWS = UniformDraws({
+        'coverage_increase': (0.01, 0.03),
+        'compliance_increase': (0.005, 0.015),
+        'speed_improvement': (0.01, 0.04),
+    })
+
+    # State passed to simulate_step after the year, and the state this model writes (with its getter)
+    STATE_READS = ('governance', 'environment')
+    STATE_WRITES = {'resilience': 'get_resilience_state'}
+
+    def __init__(self, config, city_index=None, rng=None):
+        self.index = city_index or CityIndex.from_config(config)
+        resilience_config = config['resilience']
+        self.state = StateTable(self.index, columns=('warning_coverage', 'code_compliance', 'recovery_speed'))
+        self.state.load('warning_coverage', resilience_config['early_warning_coverage'], default=0.7) # % pop covered
+        self.state.load('code_compliance', resilience_config['building_code_compliance'], default=0.5) # % new builds
+        self.state.load('recovery_speed', resilience_config['disaster_recovery_speed'], default=10) # Avg time (days), lower is better
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.current_year = 2025
-        print("UrbanResilienceModel Initialized")
+        LOG.info('model.init', "{model} Initialized", model='UrbanResilienceModel')
+
+    @property
+    def warning_coverage(self):
+        return self.state.view('warning_coverage')
+
+    @property
+    def code_compliance(self):
+        return self.state.view('code_compliance')
+
+    @property
+    def recovery_speed(self):
+        return self.state.view('recovery_speed')
 
     def simulate_step(self, year, governance_data, environment_data):
         """Simulates changes in resilience indicators like warning coverage, compliance, and recovery speed."""
-        print(f"  Simulating Urban Resilience Dynamics for year {year}...")
-
-        for city in self.warning_coverage: # Assuming keys exist for all tracked metrics
-            # --- Early Warning Coverage ---
-            # Factors: Investment (governance), technology adoption (smart city - TBD)
-            # Placeholder: Assume steady improvement, maybe faster in more flood-prone areas
-            investment_factor = governance_data.get('own_revenue', {}).get(city, 0.3) / 0.3
-            flood_prone_factor = environment_data.get('flood_prone', {}).get(city, 0.2) / 0.2 # Higher if more prone
-
-            coverage_increase = random.uniform(0.01, 0.03) * investment_factor * (1 + flood_prone_factor * 0.5)
-            self.warning_coverage[city] = min(1.0, self.warning_coverage.get(city, 0.7) * (1 + coverage_increase))
-
-            # --- Building Code Compliance ---
-            # Factors: Governance (planning compliance, enforcement capacity - TBD), awareness (social - TBD)
-            planning_compliance_factor = governance_data.get('compliance', {}).get(city, 0.5)
-            compliance_increase = random.uniform(0.005, 0.015) * planning_compliance_factor # Driven by general planning compliance
-            self.code_compliance[city] = min(0.95, self.code_compliance.get(city, 0.5) * (1 + compliance_increase))
-
-            # --- Disaster Recovery Speed (Days) ---
-            # Factors: Infrastructure resilience (TBD), institutional capacity (governance), social cohesion (social)
-            # Lower number is better
-            governance_factor = governance_data.get('satisfaction', {}).get(city, 0.5) # Proxy for capacity
-            social_cohesion_factor = 1.0 # Needs social_data passed in
-            # infrastructure_resilience_factor = ...
-
-            # Improvement means reducing the number of days
-            speed_improvement_rate = random.uniform(0.01, 0.04) * governance_factor # * social_cohesion_factor
-            self.recovery_speed[city] = self.recovery_speed.get(city, 10) * (1 - speed_improvement_rate)
-            self.recovery_speed[city] = max(1, self.recovery_speed[city]) # Minimum 1 day recovery
-
-        print(f"    Chattogram Building Code Compliance Estimate: {self.code_compliance.get('Chattogram', 'N/A'):.2f}")
-        print(f"    Khulna Disaster Recovery Speed Estimate: {self.recovery_speed.get('Khulna', 'N/A'):.1f} days")
+        LOG.info('resilience.step', "  Simulating Urban Resilience Dynamics for year {year}...", year=year)
+        t = self.state
+        draws = self.DRAWS.draw(self.rng, t.shape)
+        active = t.covered('warning_coverage') # Assuming keys exist for all tracked metrics
+
+        # --- Early Warning Coverage ---
+        # Factors: Investment (governance), technology adoption (smart city - TBD)
+        # Placeholder: Assume steady improvement, maybe faster in more flood-prone areas
+        investment_factor = dense(governance_data.get('own_revenue', {}), self.index, 0.3) / 0.3
+        flood_prone_factor = dense(environment_data.get('flood_prone', {}), self.index, 0.2) / 0.2 # Higher if more prone
+
+        coverage_increase = draws['coverage_increase'] * investment_factor * (1 + flood_prone_factor * 0.5)
+        t.assign('warning_coverage', np.minimum(1.0, t.column('warning_coverage') * (1 + coverage_increase)), active)
+
+        # --- Building Code Compliance ---
+        # Factors: Governance (planning compliance, enforcement capacity - TBD), awareness (social - TBD)
+        planning_compliance_factor = dense(governance_data.get('compliance', {}), self.index, 0.5)
+        compliance_increase = draws['compliance_increase'] * planning_compliance_factor # Driven by general planning compliance
+        t.assign('code_compliance', np.minimum(0.95, t.column('code_compliance') * (1 + compliance_increase)), active)
+
+        # --- Disaster Recovery Speed (Days) ---
+        # Factors: Infrastructure resilience (TBD), institutional capacity (governance), social cohesion (social)
+        # Lower number is better
+        governance_factor = dense(governance_data.get('satisfaction', {}), self.index, 0.5) # Proxy for capacity
+        social_cohesion_factor = 1.0 # Needs social_data passed in
+        # infrastructure_resilience_factor = ...
+
+        # Improvement means reducing the number of days
+        speed_improvement_rate = draws['speed_improvement'] * governance_factor # * social_cohesion_factor
+        recovery_speed = t.column('recovery_speed') * (1 - speed_improvement_rate)
+        t.assign('recovery_speed', np.maximum(1, recovery_speed), active) # Minimum 1 day recovery
+
+        if LOG.enabled(INFO):
+            LOG.info('resilience.summary', "    Chattogram Building Code Compliance Estimate: {chattogram_code_compliance:.2f}",
+                     year=year, chattogram_code_compliance=estimate(t.view('code_compliance', pending=True), 'Chattogram'))
+            LOG.info('resilience.summary', "    Khulna Disaster Recovery Speed Estimate: {khulna_recovery_speed:.1f} days",
+                     year=year, khulna_recovery_speed=estimate(t.view('recovery_speed', pending=True), 'Khulna'))
         self.current_year = year
 
     def get_resilience_state(self):
@@ -50,4 +86,4 @@ class UrbanResilienceModel:
             'early_warning_coverage': self.warning_coverage,
             'building_code_compliance': self.code_compliance,
             'disaster_recovery_speed': self.recovery_speed
-        } 
\ No newline at end of file
+        }
@@ -1,57 +1,87 @@
-import random
+import numpy as np
+
+from sim_random import UniformDraws
+from sim_log import INFO, LOG
+from state_store import CityIndex, StateTable, dense, estimate
 
 class UrbanRuralLinkageModel:
     """Model interconnections between urban centers and rural hinterlands in Bangladesh"""
-    def __init__(self, config):
-        self.remittance_dep = config['urban_rural']['remittance_dependency'].copy() # % hh income (static for now)
-        self.migration_rate = config['urban_rural']['rural_migration_rate'].copy() # Net annual % into major cities
-        self.commuter_perc = config['urban_rural']['commuter_percentage'].copy() # % workforce commuting
+    # Random ranges drawn for every (replicate, city) in one batched call per step
+    DRAWS = UniformDraws({
+        'migration_noise': (-0.002, 0.002),
+        'commuter_noise': (-0.005, 0.005),
+    })
+
+    # State passed to simulate_step after the year, and the state this model writes (with its getter)
+    STATE_READS = ('economy', 'transport', 'housing')
+    STATE_WRITES = {'linkage': 'get_linkage_state'}
+
+    def __init__(self, config, city_index=None, rng=None):
+        self.index = city_index or CityIndex.from_config(config)
+        linkage_config = config['urban_rural']
+        self.state = StateTable(self.index, columns=('remittance_dep', 'migration_rate', 'commuter_perc'))
+        self.state.load('remittance_dep', linkage_config['remittance_dependency']) # % hh income (static for now)
+        self.state.load('migration_rate', linkage_config['rural_migration_rate'], default=0.01) # Net annual % into major cities
+        self.state.load('commuter_perc', linkage_config['commuter_percentage'], default=0.1) # % workforce commuting
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.current_year = 2025
-        print("UrbanRuralLinkageModel Initialized")
+        LOG.info('model.init', "{model} Initialized", model='UrbanRuralLinkageModel')
+
+    @property
+    def remittance_dep(self):
+        return self.state.view('remittance_dep')
+
+    @property
+    def migration_rate(self):
+        return self.state.view('migration_rate')
+
+    @property
+    def commuter_perc(self):
+        return self.state.view('commuter_perc')
 
     def simulate_step(self, year, economy_data, transport_data, housing_data):
         """Simulates changes in migration rates and commuting patterns."""
-        print(f"  Simulating Urban-Rural Linkages for year {year}...")
+        LOG.info('linkage.step', "  Simulating Urban-Rural Linkages for year {year}...", year=year)
+        t = self.state
+        draws = self.DRAWS.draw(self.rng, t.shape)
 
         # Note: Migration rate here is net inflow *to the city*. A full model would track rural population too.
         # Remittance dependency is currently static - would need rural income/urban wage data.
+        urban_affordability_ratio = dense(housing_data.get('affordability', {}), self.index, 15)
 
-        for city in self.migration_rate: # Simulate for cities where migration is tracked
-            # --- Net Migration Rate Adjustment ---
-            # Factors: Urban economic opportunity (GDP growth, unemployment - inverse), rural conditions (TBD),
-            #          housing affordability (inverse), potential network effects
-
-            urban_unemployment = economy_data.get('unemployment', {}).get(city, 0.07)
-            # Placeholder for GDP growth pull factor
-            # urban_gdp_growth = ...
-            urban_affordability_ratio = housing_data.get('affordability', {}).get(city, 15)
-
-            # Higher unemployment reduces pull factor
-            unemployment_effect = (urban_unemployment / 0.06 - 1) * -0.1 # Reduces migration if unemployment > 6%
-            # Lower affordability reduces pull factor
-            affordability_effect = (urban_affordability_ratio / 12 - 1) * -0.05 # Reduces migration if ratio > 12
+        # --- Net Migration Rate Adjustment --- (for cities where migration is tracked)
+        # Factors: Urban economic opportunity (GDP growth, unemployment - inverse), rural conditions (TBD),
+        #          housing affordability (inverse), potential network effects
+        urban_unemployment = dense(economy_data.get('unemployment', {}), self.index, 0.07)
+        # Placeholder for GDP growth pull factor
+        # urban_gdp_growth = ...
 
-            migration_rate_change = unemployment_effect + affordability_effect + random.uniform(-0.002, 0.002)
-            self.migration_rate[city] = self.migration_rate.get(city, 0.01) * (1 + migration_rate_change)
-            self.migration_rate[city] = max(0.001, min(0.05, self.migration_rate[city])) # Bounds on net inflow rate
+        # Higher unemployment reduces pull factor
+        unemployment_effect = (urban_unemployment / 0.06 - 1) * -0.1 # Reduces migration if unemployment > 6%
+        # Lower affordability reduces pull factor
+        affordability_effect = (urban_affordability_ratio / 12 - 1) * -0.05 # Reduces migration if ratio > 12
 
-        for city in self.commuter_perc:
-            # --- Commuter Percentage Adjustment ---
-            # Factors: Transport conditions (commute time - inverse), housing affordability (direct - push factor),
-            #          job availability in city (direct)
+        migration_rate_change = unemployment_effect + affordability_effect + draws['migration_noise']
+        migration_rate = t.column('migration_rate') * (1 + migration_rate_change)
+        t.assign('migration_rate', np.clip(migration_rate, 0.001, 0.05), t.covered('migration_rate')) # Bounds on net inflow rate
 
-            avg_commute_time = transport_data.get('avg_commute_time', {}).get(city, 60)
-            urban_affordability_ratio = housing_data.get('affordability', {}).get(city, 15)
+        # --- Commuter Percentage Adjustment ---
+        # Factors: Transport conditions (commute time - inverse), housing affordability (direct - push factor),
+        #          job availability in city (direct)
+        avg_commute_time = dense(transport_data.get('avg_commute_time', {}), self.index, 60)
 
-            commute_time_effect = (avg_commute_time / 50 - 1) * -0.02 # Less commuting if time > 50 mins
-            affordability_effect = (urban_affordability_ratio / 12 - 1) * 0.03 # More commuting if ratio > 12
+        commute_time_effect = (avg_commute_time / 50 - 1) * -0.02 # Less commuting if time > 50 mins
+        affordability_effect = (urban_affordability_ratio / 12 - 1) * 0.03 # More commuting if ratio > 12
 
-            commuter_perc_change = commute_time_effect + affordability_effect + random.uniform(-0.005, 0.005)
-            self.commuter_perc[city] = self.commuter_perc.get(city, 0.1) * (1 + commuter_perc_change)
-            self.commuter_perc[city] = max(0.05, min(0.4, self.commuter_perc[city])) # Bounds 5% - 40%
+        commuter_perc_change = commute_time_effect + affordability_effect + draws['commuter_noise']
+        commuter_perc = t.column('commuter_perc') * (1 + commuter_perc_change)
+        t.assign('commuter_perc', np.clip(commuter_perc, 0.05, 0.4), t.covered('commuter_perc')) # Bounds 5% - 40%
 
-        print(f"    Dhaka Net Rural Migration Rate Estimate: {self.migration_rate.get('Dhaka', 'N/A'):.3f}")
-        print(f"    Dhaka Commuter Percentage Estimate: {self.commuter_perc.get('Dhaka', 'N/A'):.2f}")
+        if LOG.enabled(INFO):
+            LOG.info('linkage.summary', "    Dhaka Net Rural Migration Rate Estimate: {dhaka_migration_rate:.3f}",
+                     year=year, dhaka_migration_rate=estimate(t.view('migration_rate', pending=True), 'Dhaka'))
+            LOG.info('linkage.summary', "    Dhaka Commuter Percentage Estimate: {dhaka_commuter_share:.2f}",
+                     year=year, dhaka_commuter_share=estimate(t.view('commuter_perc', pending=True), 'Dhaka'))
         self.current_year = year
 
     def get_linkage_state(self):
@@ -59,4 +89,4 @@ class UrbanRuralLinkageModel:
             'remittance_dependency': self.remittance_dep,
             'migration_rate': self.migration_rate,
             'commuter_percentage': self.commuter_perc
-        } 
\ No newline at end of file
+        }
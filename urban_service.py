@@ -1,57 +1,90 @@
-import random
+import numpy as np
+
+from sim_random import UniformDraws
+from sim_log import INFO, LOG
+from state_store import CityIndex, StateTable, dense, estimate
 
 class UrbanServiceModel:
     """Model public service provision and social infrastructure in Bangladesh cities (Focus: Edu, Health, Public Space)"""
-    def __init__(self, config):
-        self.school_density = config['service_delivery']['school_density'].copy() # Schools per sq km
-        self.hospital_beds = config['service_delivery']['hospital_beds_per_1000'].copy() # Beds per 1000 pop
-        self.public_space_pc = config['service_delivery']['public_space_per_capita'].copy() # sq m per capita
+    # Random ranges drawn for every (replicate, city) in one batched call per step
+    DRAWS = UniformDraws({
+        'school_investment': (0.002, 0.008),
+        'bed_investment': (0.003, 0.01),
+        'space_development': (0.001, 0.005),
+    })
+
+    # State passed to simulate_step after the year, and the state this model writes (with its getter)
+    STATE_READS = ('population', 'governance', 'demography')
+    STATE_WRITES = {'service': 'get_service_state'}
+
+    def __init__(self, config, city_index=None, rng=None):
+        self.index = city_index or CityIndex.from_config(config)
+        service_config = config['service_delivery']
+        self.state = StateTable(self.index, columns=('school_density', 'hospital_beds', 'public_space_pc'))
+        self.state.load('school_density', service_config['school_density'], default=4) # Schools per sq km
+        self.state.load('hospital_beds', service_config['hospital_beds_per_1000'], default=1.5) # Beds per 1000 pop
+        self.state.load('public_space_pc', service_config['public_space_per_capita'], default=1.0) # sq m per capita
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.current_year = 2025
-        print("UrbanServiceModel Initialized")
+        LOG.info('model.init', "{model} Initialized", model='UrbanServiceModel')
+
+    @property
+    def school_density(self):
+        return self.state.view('school_density')
+
+    @property
+    def hospital_beds(self):
+        return self.state.view('hospital_beds')
+
+    @property
+    def public_space_pc(self):
+        return self.state.view('public_space_pc')
 
-    def simulate_step(self, year, population_data, governance_data):
+    def simulate_step(self, year, population_data, governance_data, demography_data):
         """Simulates changes in social infrastructure provision levels."""
-        print(f"  Simulating Urban Service (Social Infra) Dynamics for year {year}...")
-
-        for city in self.school_density: # Assuming keys exist for all tracked metrics
-            # Factors: Population growth (demand), municipal investment (revenue/governance), land availability (growth model - TBD)
-
-            revenue_factor = governance_data.get('own_revenue', {}).get(city, 0.3) / 0.3 # Relative revenue
-            # Need population growth rate for per-capita adjustments
-            # Placeholder for population growth calculation (requires storing previous year pop)
-            pop_now = population_data.get(city, 1000000)
-            # pop_prev = ...
-            # pop_growth_rate = (pop_now - pop_prev) / pop_prev if pop_prev else 0
-            pop_growth_rate = 0.03 # Using fixed rate for now
-
-            # --- School Density ---
-            # Assume investment leads to new schools, increasing density
-            school_investment_rate = random.uniform(0.002, 0.008) * revenue_factor
-            self.school_density[city] = self.school_density.get(city, 4) * (1 + school_investment_rate)
-
-            # --- Hospital Beds per 1000 ---
-            # Investment increases total beds, but rate per 1000 depends on population growth
-            bed_investment_rate = random.uniform(0.003, 0.01) * revenue_factor
-            current_beds_pc = self.hospital_beds.get(city, 1.5)
-            # Calculate new total beds based on old rate and pop, add new beds, then recalculate per capita
-            # total_beds_old = current_beds_pc * (pop_now / (1 + pop_growth_rate)) / 1000
-            # new_total_beds = total_beds_old * (1 + bed_investment_rate)
-            # self.hospital_beds[city] = (new_total_beds / pop_now) * 1000
-            # Simplified: Adjust rate directly, implicitly accounting for pop growth effect
-            self.hospital_beds[city] = current_beds_pc * (1 + bed_investment_rate - pop_growth_rate * 0.5) # Growth dilutes per capita rate
-            self.hospital_beds[city] = max(0.5, self.hospital_beds[city]) # Floor
-
-            # --- Public Space Per Capita ---
-            # New space development vs population growth pressure
-            space_development_rate = random.uniform(0.001, 0.005) * revenue_factor # Rate of new space addition relative to existing
-            current_space_pc = self.public_space_pc.get(city, 1.0)
-            # Similar logic to beds: calculate total, add new, recalculate per capita
-            # Simplified: Adjust rate directly
-            self.public_space_pc[city] = current_space_pc * (1 + space_development_rate - pop_growth_rate)
-            self.public_space_pc[city] = max(0.2, self.public_space_pc[city]) # Floor value
-
-        print(f"    Dhaka Hospital Beds per 1000 Estimate: {self.hospital_beds.get('Dhaka', 'N/A'):.2f}")
-        print(f"    Chattogram Public Space per Capita Estimate: {self.public_space_pc.get('Chattogram', 'N/A'):.2f}")
+        LOG.info('service.step', "  Simulating Urban Service (Social Infra) Dynamics for year {year}...", year=year)
+        t = self.state
+        draws = self.DRAWS.draw(self.rng, t.shape)
+        active = t.covered('school_density') # Assuming keys exist for all tracked metrics
+
+        # Factors: Population growth (demand), municipal investment (revenue/governance), land availability (growth model - TBD)
+        revenue_factor = dense(governance_data.get('own_revenue', {}), self.index, 0.3) / 0.3 # Relative revenue
+        # Need population growth rate for per-capita adjustments
+        # Placeholder for population growth calculation (requires storing previous year pop)
+        # pop_now = population_data; pop_prev = ...
+        # pop_growth_rate = (pop_now - pop_prev) / pop_prev if pop_prev else 0
+        pop_growth_rate = 0.03 # Using fixed rate for now
+
+        # --- School Density ---
+        # Assume investment leads to new schools, increasing density
+        school_investment_rate = draws['school_investment'] * revenue_factor
+        if demography_data:
+            # Half of any growth in the school-age population is met with new schools
+            school_investment_rate = school_investment_rate + 0.5 * np.maximum(
+                dense(demography_data['school_age_growth'], self.index, 0.0), 0)
+        t.assign('school_density', t.column('school_density') * (1 + school_investment_rate), active)
+
+        # --- Hospital Beds per 1000 ---
+        # Investment increases total beds, but rate per 1000 depends on population growth
+        bed_investment_rate = draws['bed_investment'] * revenue_factor
+        # Calculate new total beds based on old rate and pop, add new beds, then recalculate per capita
+        # Simplified: Adjust rate directly, implicitly accounting for pop growth effect
+        hospital_beds = t.column('hospital_beds') * (1 + bed_investment_rate - pop_growth_rate * 0.5) # Growth dilutes per capita rate
+        t.assign('hospital_beds', np.maximum(0.5, hospital_beds), active) # Floor
+
+        # --- Public Space Per Capita ---
+        # New space development vs population growth pressure
+        space_development_rate = draws['space_development'] * revenue_factor # Rate of new space addition relative to existing
+        # Similar logic to beds: calculate total, add new, recalculate per capita
+        # Simplified: Adjust rate directly
+        public_space_pc = t.column('public_space_pc') * (1 + space_development_rate - pop_growth_rate)
+        t.assign('public_space_pc', np.maximum(0.2, public_space_pc), active) # Floor value
+
+        if LOG.enabled(INFO):
+            LOG.info('service.summary', "    Dhaka Hospital Beds per 1000 Estimate: {dhaka_hospital_beds:.2f}",
+                     year=year, dhaka_hospital_beds=estimate(t.view('hospital_beds', pending=True), 'Dhaka'))
+            LOG.info('service.summary', "    Chattogram Public Space per Capita Estimate: {chattogram_public_space:.2f}",
+                     year=year, chattogram_public_space=estimate(t.view('public_space_pc', pending=True), 'Chattogram'))
         self.current_year = year
 
     def get_service_state(self):
@@ -59,4 +92,4 @@ class UrbanServiceModel:
             'school_density': self.school_density,
             'hospital_beds_per_1000': self.hospital_beds,
             'public_space_per_capita': self.public_space_pc
-        } 
\ No newline at end of file
+        }
@@ -1,65 +1,107 @@
-import random
+import numpy as np
+
+from sim_random import UniformDraws
+from sim_log import INFO, LOG
+from state_store import CityIndex, StateTable, dense, estimate
 
 class UrbanSocialModel:
     """Model social structures, cultural patterns and community dynamics in Bangladesh cities"""
-    def __init__(self, config):
-        self.literacy = config['social']['literacy_rate'].copy()
-        self.healthcare_access = config['social']['access_to_healthcare'].copy()
-        self.cohesion = config['social']['social_cohesion_index'].copy()
-        self.crime_rate = config['social']['crime_rate'].copy() # Per 100k pop
+    # Random ranges drawn for every (replicate, city) in one batched call per step
+    DRAWS = UniformDraws({
+        'literacy_change': (0.003, 0.008),
+        'health_access_change': (0.004, 0.012),
+        'cohesion_noise': (-0.01, 0.01),
+        'crime_noise': (-0.02, 0.02),
+    })
+
+    # State passed to simulate_step after the year, and the state this model writes (with its getter)
+    STATE_READS = ('population', 'economy', 'governance', 'service')
+    STATE_WRITES = {'social': 'get_social_state'}
+
+    def __init__(self, config, city_index=None, rng=None):
+        self.index = city_index or CityIndex.from_config(config)
+        social_config = config['social']
+        self.state = StateTable(self.index, columns=('literacy', 'healthcare_access', 'cohesion', 'crime_rate'))
+        self.state.load('literacy', social_config['literacy_rate'], default=0.7)
+        self.state.load('healthcare_access', social_config['access_to_healthcare'], default=0.8)
+        self.state.load('cohesion', social_config['social_cohesion_index'], default=0.6)
+        self.state.load('crime_rate', social_config['crime_rate'], default=250) # Per 100k pop
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.current_year = 2025
-        print("UrbanSocialModel Initialized")
+        LOG.info('model.init', "{model} Initialized", model='UrbanSocialModel')
+
+    @property
+    def literacy(self):
+        return self.state.view('literacy')
+
+    @property
+    def healthcare_access(self):
+        return self.state.view('healthcare_access')
+
+    @property
+    def cohesion(self):
+        return self.state.view('cohesion')
+
+    @property
+    def crime_rate(self):
+        return self.state.view('crime_rate')
 
     def simulate_step(self, year, population_data, economy_data, governance_data, service_data):
         """Simulates changes in literacy, health access, cohesion, and crime rates."""
-        print(f"  Simulating Social Dynamics for year {year}...")
-
-        for city in self.literacy: # Assuming keys exist for all tracked metrics
-            # --- Literacy Rate ---
-            # Factors: Education service availability (service model), economic conditions (affordability - TBD)
-            school_density_factor = service_data.get('school_density', {}).get(city, 4) / 4 # Relative to Chattogram start
-            literacy_change = random.uniform(0.003, 0.008) * school_density_factor # Base improvement driven by school density
-            self.literacy[city] = min(0.98, self.literacy.get(city, 0.7) * (1 + literacy_change))
-
-            # --- Healthcare Access ---
-            # Factors: Healthcare service availability (service model - beds/facility density)
-            hospital_beds_factor = service_data.get('hospital_beds_per_1000', {}).get(city, 1.5) / 1.5 # Relative to Chattogram start
-            health_access_change = random.uniform(0.004, 0.012) * hospital_beds_factor
-            self.healthcare_access[city] = min(0.99, self.healthcare_access.get(city, 0.8) * (1 + health_access_change))
-
-            # --- Social Cohesion ---
-            # Factors: Inequality (economy - TBD), governance satisfaction, crime rate (inverse), migration (potentially negative initially)
-            satisfaction_factor = governance_data.get('satisfaction', {}).get(city, 0.5)
-            # Placeholder for inequality effect
-            # inequality_factor = ...
-            crime_factor = 1 - (self.crime_rate.get(city, 250) / 500) # Higher crime reduces cohesion (relative to higher bound)
-            # Placeholder for migration effect
-            # migration_factor = ...
-
-            cohesion_change = (
-                (satisfaction_factor - 0.5) * 0.03 + # Higher satisfaction boosts cohesion
-                (crime_factor - 0.5) * 0.02 + # Lower crime boosts cohesion
-                random.uniform(-0.01, 0.01)
-            )
-            self.cohesion[city] = max(0.2, min(0.9, self.cohesion.get(city, 0.6) + cohesion_change))
-
-            # --- Crime Rate ---
-            # Factors: Unemployment (economy), social cohesion (inverse), inequality (TBD), density (TBD), policing (governance - TBD)
-            unemployment_factor = economy_data.get('unemployment', {}).get(city, 0.07) / 0.07 # Relative to 7%
-            cohesion_factor = (1 - self.cohesion[city]) / 0.5 # Inverse, relative to 0.5 baseline cohesion
-            # density_factor = ...
-
-            crime_rate_change_multiplier = (
-                1 +
-                (unemployment_factor - 1) * 0.05 + # Higher unemployment increases crime rate % change
-                (cohesion_factor - 1) * 0.03 + # Lower cohesion increases crime rate % change
-                random.uniform(-0.02, 0.02)
-            )
-            self.crime_rate[city] = max(50, self.crime_rate.get(city, 250) * crime_rate_change_multiplier)
-
-        print(f"    Dhaka Literacy Rate Estimate: {self.literacy.get('Dhaka', 'N/A'):.2f}")
-        print(f"    Khulna Social Cohesion Index Estimate: {self.cohesion.get('Khulna', 'N/A'):.2f}")
-        print(f"    Dhaka Crime Rate Estimate: {self.crime_rate.get('Dhaka', 'N/A'):.0f}")
+        LOG.info('social.step', "  Simulating Social Dynamics for year {year}...", year=year)
+        t = self.state
+        draws = self.DRAWS.draw(self.rng, t.shape)
+        active = t.covered('literacy') # Assuming keys exist for all tracked metrics
+
+        # --- Literacy Rate ---
+        # Factors: Education service availability (service model), economic conditions (affordability - TBD)
+        school_density_factor = dense(service_data.get('school_density', {}), self.index, 4) / 4 # Relative to Chattogram start
+        literacy_change = draws['literacy_change'] * school_density_factor # Base improvement driven by school density
+        t.assign('literacy', np.minimum(0.98, t.column('literacy') * (1 + literacy_change)), active)
+
+        # --- Healthcare Access ---
+        # Factors: Healthcare service availability (service model - beds/facility density)
+        hospital_beds_factor = dense(service_data.get('hospital_beds_per_1000', {}), self.index, 1.5) / 1.5 # Relative to Chattogram start
+        health_access_change = draws['health_access_change'] * hospital_beds_factor
+        t.assign('healthcare_access', np.minimum(0.99, t.column('healthcare_access') * (1 + health_access_change)), active)
+
+        # --- Social Cohesion ---
+        # Factors: Inequality (economy - TBD), governance satisfaction, crime rate (inverse), migration (potentially negative initially)
+        satisfaction_factor = dense(governance_data.get('satisfaction', {}), self.index, 0.5)
+        # Placeholder for inequality effect
+        # inequality_factor = ...
+        crime_factor = 1 - (t.column('crime_rate') / 500) # Higher crime reduces cohesion (relative to higher bound)
+        # Placeholder for migration effect
+        # migration_factor = ...
+
+        cohesion_change = (
+            (satisfaction_factor - 0.5) * 0.03 + # Higher satisfaction boosts cohesion
+            (crime_factor - 0.5) * 0.02 + # Lower crime boosts cohesion
+            draws['cohesion_noise']
+        )
+        t.assign('cohesion', np.clip(t.column('cohesion') + cohesion_change, 0.2, 0.9), active)
+
+        # --- Crime Rate ---
+        # Factors: Unemployment (economy), social cohesion (inverse), inequality (TBD), density (TBD), policing (governance - TBD)
+        unemployment_factor = dense(economy_data.get('unemployment', {}), self.index, 0.07) / 0.07 # Relative to 7%
+        cohesion_factor = (1 - t.column('cohesion')) / 0.5 # Inverse, relative to 0.5 baseline cohesion
+        # density_factor = ...
+
+        crime_rate_change_multiplier = (
+            1 +
+            (unemployment_factor - 1) * 0.05 + # Higher unemployment increases crime rate % change
+            (cohesion_factor - 1) * 0.03 + # Lower cohesion increases crime rate % change
+            draws['crime_noise']
+        )
+        t.assign('crime_rate', np.maximum(50, t.column('crime_rate') * crime_rate_change_multiplier), active)
+
+        if LOG.enabled(INFO):
+            LOG.info('social.summary', "    Dhaka Literacy Rate Estimate: {dhaka_literacy:.2f}",
+                     year=year, dhaka_literacy=estimate(t.view('literacy', pending=True), 'Dhaka'))
+            LOG.info('social.summary', "    Khulna Social Cohesion Index Estimate: {khulna_cohesion:.2f}",
+                     year=year, khulna_cohesion=estimate(t.view('cohesion', pending=True), 'Khulna'))
+            LOG.info('social.summary', "    Dhaka Crime Rate Estimate: {dhaka_crime_rate:.0f}",
+                     year=year, dhaka_crime_rate=estimate(t.view('crime_rate', pending=True), 'Dhaka'))
         self.current_year = year
 
     def get_social_state(self):
@@ -68,4 +110,4 @@ class UrbanSocialModel:
             'healthcare_access': self.healthcare_access,
             'cohesion': self.cohesion,
             'crime_rate': self.crime_rate
-        } 
\ No newline at end of file
+        }
@@ -1,83 +1,208 @@
-import random
+import numpy as np
+
+from sim_random import UniformDraws
+from sim_log import INFO, LOG
+from state_store import CityIndex, StateTable, dense, group_categories, estimate
+
+# Peak-hour person trips per resident, and passenger car units (PCU) per person trip by mode
+# (vehicle size over occupancy), turning population and modal split into road network demand
+PEAK_HOUR_TRIP_RATE = 0.1
+MODE_PCU = {'car/taxi': 0.7, 'bus': 0.06, 'rickshaw': 0.35, 'walk': 0.0, 'other': 0.3}
+# Share of car/taxi users that congestion moves onto buses per point of travel time index above 1,
+# and the most it moves in one year however congested the network is
+CONGESTION_SHIFT = 0.02
+MAX_CONGESTION_SHIFT = 0.1
 
 class UrbanTransportModel:
     """Model transportation systems and mobility patterns in Bangladesh cities"""
-    def __init__(self, config):
-        self.modal_split = config['transport']['modal_split'].copy()
-        self.avg_commute_time = config['transport']['avg_commute_time'].copy()
-        self.road_density = config['transport']['road_density'].copy() # km/sq km
-        self.public_transit_coverage = config['transport']['public_transit_coverage'].copy() # % pop with access
+    # Random ranges drawn for every (replicate, city) in one batched call per step
+    DRAWS = UniformDraws({
+        'commute_change': (0.005, 0.02),
+        'modal_shift': (0.01, 0.05),
+        'road_growth': (0.001, 0.005),
+        'transit_growth': (0.005, 0.025),
+    })
+
+    # State passed to simulate_step after the year, and the state this model writes (with its getter)
+    STATE_READS = ('population', 'infrastructure', 'land_use')
+    STATE_WRITES = {'transport': 'get_transport_state'}
+
+    def __init__(self, config, city_index=None, rng=None, road_networks=()):
+        self.index = city_index or CityIndex.from_config(config)
+        transport_config = config['transport']
+        self.state = StateTable(self.index, columns=('avg_commute_time', 'road_density', 'public_transit_coverage'),
+                                groups={'modal_split': group_categories(transport_config['modal_split'])})
+        self.state.load_group('modal_split', transport_config['modal_split'])
+        self.state.load('avg_commute_time', transport_config['avg_commute_time'])
+        self.state.load('road_density', transport_config['road_density'], default=10) # km/sq km
+        self.state.load('public_transit_coverage', transport_config['public_transit_coverage'], default=0.4) # % pop with access
+        # Optional CommuteNetworks: their cities' commute times come from congested zone-to-zone
+        # travel times on the road graph, scaled so the first year matches the configured time
+        # (see `calibrate`)
+        self.networks = list(road_networks)
+        for network in self.networks:
+            if network.city not in self.index:
+                raise ValueError(f"No city {network.city!r} for the road network")
+        self._network_positions = np.array([self.index.position(network.city) for network in self.networks], dtype=np.intp)
+        self._travel_time_index = np.ones(len(self.networks)) # Congested over free-flow mean time
+        self.commute_scale = None # Configured over network commute time, fitted on first use
+        self.network_population = None # Network cities' population when their zones were last grown
+        self._calibration = (dense(config['urban_growth']['initial_population'], self.index, 0),
+                             self.state.column('avg_commute_time')[0, self._network_positions])
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.current_year = 2025
-        print("UrbanTransportModel Initialized")
+        LOG.info('model.init', "{model} Initialized", model='UrbanTransportModel')
+
+    @property
+    def modal_split(self):
+        return self.state.group_view('modal_split')
+
+    @property
+    def avg_commute_time(self):
+        return self.state.view('avg_commute_time')
+
+    @property
+    def road_density(self):
+        return self.state.view('road_density')
+
+    @property
+    def public_transit_coverage(self):
+        return self.state.view('public_transit_coverage')
+
+    def _network_commutes(self, population):
+        """Equilibrates each road network for its city's peak-hour vehicles; returns the mean congested minutes.
+
+        Networks are shared by the replicates, so demand comes from the replicate-mean
+        population and modal split, and each network's zones first grow with its city's
+        population since the last call. Also updates the networks' travel time indices.
+        """
+        t = self.state
+        pcu = np.zeros(t.shape)
+        if 'modal_split' in t.groups:
+            categories = t.groups['modal_split'][2]
+            weights = np.array([MODE_PCU.get(name, MODE_PCU['other']) for name in categories])
+            pcu = t.group('modal_split') @ weights / 100 # Split is in percent
+        vehicles = np.maximum(np.mean(np.broadcast_to(population * pcu, t.shape), axis=0) * PEAK_HOUR_TRIP_RATE, 0)
+        residents = np.mean(np.broadcast_to(population, t.shape), axis=0)[self._network_positions]
+        if self.network_population is not None:
+            growth = np.divide(residents, self.network_population, out=np.ones_like(residents),
+                               where=self.network_population > 0)
+            for network, factor in zip(self.networks, growth):
+                if factor != 1:
+                    network.grow(factor)
+        self.network_population = residents
+        commutes, free_flow = np.empty(len(self.networks)), np.empty(len(self.networks))
+        for i, (pos, network) in enumerate(zip(self._network_positions, self.networks)):
+            shares = network.trip_shares()
+            network.equilibrate(shares.with_values(shares.values * vehicles[pos]))
+            commutes[i] = network.mean_travel_time(shares, congested=True)
+            free_flow[i] = network.mean_travel_time(shares)
+        self._travel_time_index = commutes / free_flow # A new array, so forks keep their own
+        return commutes
+
+    def calibrate(self):
+        """Fits `commute_scale` so the networks reproduce the configured commute times, unless already fitted.
+
+        Runs on the first step (or before a first road upgrade) rather than at construction,
+        so a simulation restored from a checkpoint keeps the saved scale and equilibrium flows
+        instead of equilibrating every network from scratch only to discard the result.
+        """
+        if self.networks and self.commute_scale is None:
+            population, configured = self._calibration
+            self.commute_scale = configured / self._network_commutes(population)
+
+    def _shift_modal_split(self, active, draws):
+        """Shift away from walking/rickshaw towards bus/car if transit improves or commute time is high."""
+        t = self.state
+        if 'modal_split' not in t.groups:
+            return
+        categories = t.groups['modal_split'][2]
+        split = t.group('modal_split').copy()
+
+        def mode(name):
+            return split[..., categories.index(name)] if name in categories else np.zeros(t.shape)
+
+        walk, rickshaw = mode('walk'), mode('rickshaw')
+        transit_improvement_factor = (t.column('public_transit_coverage') - 0.4) * 0.1
+        congestion_factor = (t.column('avg_commute_time') / 60 - 1) * 0.05 # Shift if commute > 60 mins
+
+        # Shift from walk/rickshaw
+        shift_away = (walk * (congestion_factor + transit_improvement_factor * 0.5) +
+                      rickshaw * (congestion_factor * 0.5 + transit_improvement_factor * 0.8)) * \
+                     draws['modal_shift'] # Small fraction shifts per year
+        shift_amount = np.maximum(0, shift_away)
+        slow_total = walk + rickshaw
+        shift_share = np.divide(shift_amount, slow_total, out=np.zeros_like(slow_total), where=slow_total > 0)
+
+        for name, change in (('walk', -walk * shift_share), ('rickshaw', -rickshaw * shift_share),
+                             # Shift towards bus and car/taxi (example distribution)
+                             ('bus', shift_amount * 0.6), ('car/taxi', shift_amount * 0.3), ('other', shift_amount * 0.1)):
+            if name in categories:
+                split[..., categories.index(name)] += change
+
+        if self.networks and 'car/taxi' in categories and 'bus' in categories:
+            # Congestion on a city's road network moves car/taxi users onto buses
+            car, bus = categories.index('car/taxi'), categories.index('bus')
+            shift = np.clip((self._travel_time_index - 1) * CONGESTION_SHIFT, 0, MAX_CONGESTION_SHIFT)
+            moved = np.maximum(split[..., self._network_positions, car], 0) * shift
+            split[..., self._network_positions, car] -= moved
+            split[..., self._network_positions, bus] += moved
+
+        # Normalize to 100%
+        total_split = split.sum(axis=-1, keepdims=True)
+        split = np.divide(split * 100, total_split, out=split, where=total_split > 0)
+        t.assign_group('modal_split', split, active & t.covered('modal_split'))
 
     def simulate_step(self, year, population_data, infrastructure_data, land_use_data):
         """Simulates changes in commute times and modal split based on urban factors."""
-        print(f"  Simulating Transport Dynamics for year {year}...")
-
-        for city in self.avg_commute_time:
-            # --- Commute Time Adjustment ---
-            # Factors: Population density, road density, public transit availability, maybe land use mix
-
-            # Estimate population density (requires city area - placeholder)
-            # Placeholder area calculation - assumes population is proportional to area initially
-            # This needs a proper spatial component or area data in config
-            initial_pop_dhaka = 18_000_000
-            current_pop_dhaka = population_data.get('Dhaka', initial_pop_dhaka)
-            # Assume Dhaka area ~300 sq km (very rough)
-            estimated_area = 300 * (population_data.get(city, initial_pop_dhaka) / initial_pop_dhaka)
-            pop_density = population_data.get(city, 1000000) / max(1, estimated_area) # Pop per sq km
-
-            density_factor = pop_density / 60000 # Relative density compared to Dhaka initial estimate
-            road_factor = self.road_density.get(city, 10) / 15 # Relative road density compared to Dhaka
-            transit_factor = self.public_transit_coverage.get(city, 0.4) # Higher coverage should reduce time
-
-            # Base change + density effect - road effect - transit effect
-            commute_change_rate = (random.uniform(0.005, 0.02) # Base increase
-                                 + density_factor * 0.03 # Density increases time
-                                 - (road_factor - 1) * 0.01 # Higher road density slightly decreases time
-                                 - (transit_factor - 0.4) * 0.02) # Higher transit coverage decreases time
-
-            self.avg_commute_time[city] *= (1 + commute_change_rate)
-            self.avg_commute_time[city] = max(15, self.avg_commute_time[city]) # Floor at 15 mins
-
-            # --- Modal Split Adjustment --- (Highly simplified)
-            # Shift away from walking/rickshaw towards bus/car if transit improves or commute time is high
-            split = self.modal_split.get(city)
-            if split:
-                transit_improvement_factor = (self.public_transit_coverage.get(city, 0.4) - 0.4) * 0.1
-                congestion_factor = (self.avg_commute_time[city] / 60 - 1) * 0.05 # Shift if commute > 60 mins
-
-                # Shift from walk/rickshaw
-                shift_away = (split['walk'] * (congestion_factor + transit_improvement_factor * 0.5) +
-                              split['rickshaw'] * (congestion_factor*0.5 + transit_improvement_factor * 0.8)) * \
-                             random.uniform(0.01, 0.05) # Small fraction shifts per year
-
-                shift_amount = max(0, shift_away)
-                shifted_walk = split['walk'] * (shift_amount / (split['walk'] + split['rickshaw'])) if (split['walk'] + split['rickshaw']) > 0 else 0
-                shifted_rickshaw = split['rickshaw'] * (shift_amount / (split['walk'] + split['rickshaw'])) if (split['walk'] + split['rickshaw']) > 0 else 0
-
-                split['walk'] -= shifted_walk
-                split['rickshaw'] -= shifted_rickshaw
-
-                # Shift towards bus and car/taxi (example distribution)
-                split['bus'] = split.get('bus', 0) + shift_amount * 0.6
-                split['car/taxi'] = split.get('car/taxi', 0) + shift_amount * 0.3
-                split['other'] = split.get('other', 0) + shift_amount * 0.1
-
-                # Normalize to 100%
-                total_split = sum(split.values())
-                if total_split > 0:
-                    for mode, value in split.items():
-                        split[mode] = (value / total_split) * 100
-
-            # Placeholder: Road density might increase based on investment/governance
-            self.road_density[city] *= (1 + random.uniform(0.001, 0.005)) # Very slow increase
-            self.public_transit_coverage[city] = min(1.0, self.public_transit_coverage[city]*(1 + random.uniform(0.005, 0.025))) # Slow increase
-
-
-        print(f"    Dhaka Avg Commute Time Estimate: {self.avg_commute_time.get('Dhaka', 'N/A'):.1f} mins")
-        if 'Dhaka' in self.modal_split:
-            print(f"    Dhaka Modal Split Estimate (Walk%): {self.modal_split['Dhaka'].get('walk', 'N/A'):.1f}")
+        LOG.info('transport.step', "  Simulating Transport Dynamics for year {year}...", year=year)
+        t = self.state
+        draws = self.DRAWS.draw(self.rng, t.shape)
+        active = t.covered('avg_commute_time')
+
+        # --- Commute Time Adjustment ---
+        # Factors: Population density, road density, public transit availability, maybe land use mix
+
+        # Estimate population density (requires city area - placeholder)
+        # Placeholder area calculation - assumes population is proportional to area initially
+        # This needs a proper spatial component or area data in config
+        initial_pop_dhaka = 18_000_000
+        # Assume Dhaka area ~300 sq km (very rough)
+        estimated_area = 300 * (dense(population_data, self.index, initial_pop_dhaka) / initial_pop_dhaka)
+        pop_density = dense(population_data, self.index, 1000000) / np.maximum(1, estimated_area) # Pop per sq km
+
+        density_factor = pop_density / 60000 # Relative density compared to Dhaka initial estimate
+        road_factor = t.column('road_density') / 15 # Relative road density compared to Dhaka
+        transit_factor = t.column('public_transit_coverage') # Higher coverage should reduce time
+
+        # Base change + density effect - road effect - transit effect
+        commute_change_rate = (draws['commute_change'] # Base increase
+                               + density_factor * 0.03 # Density increases time
+                               - (road_factor - 1) * 0.01 # Higher road density slightly decreases time
+                               - (transit_factor - 0.4) * 0.02) # Higher transit coverage decreases time
+        commute_time = t.column('avg_commute_time') * (1 + commute_change_rate)
+        if self.networks:
+            # Cities with a road network replace the density estimate with congested network travel times
+            self.calibrate()
+            commute_time[..., self._network_positions] = self.commute_scale * self._network_commutes(
+                dense(population_data, self.index, 0))
+        t.assign('avg_commute_time', np.maximum(15, commute_time), active) # Floor at 15 mins
+
+        # --- Modal Split Adjustment --- (Highly simplified)
+        self._shift_modal_split(active, draws)
+
+        # Placeholder: Road density might increase based on investment/governance
+        road_density = t.column('road_density') * (1 + draws['road_growth']) # Very slow increase
+        transit_coverage = np.minimum(1.0, t.column('public_transit_coverage') * (1 + draws['transit_growth'])) # Slow increase
+        t.assign('road_density', road_density, active)
+        t.assign('public_transit_coverage', transit_coverage, active)
+
+        if LOG.enabled(INFO):
+            LOG.info('transport.summary', "    Dhaka Avg Commute Time Estimate: {dhaka_commute_time:.1f} mins",
+                     year=year, dhaka_commute_time=estimate(t.view('avg_commute_time', pending=True), 'Dhaka'))
+            if 'Dhaka' in self.modal_split:
+                LOG.info('transport.modal_split', "    Dhaka Modal Split Estimate (Walk%): {dhaka_walk_share:.1f}",
+                         year=year, dhaka_walk_share=estimate(t.group_view('modal_split', pending=True)['Dhaka'], 'walk'))
         self.current_year = year
 
     def get_transport_state(self):
@@ -86,4 +211,4 @@ class UrbanTransportModel:
             'avg_commute_time': self.avg_commute_time,
             'road_density': self.road_density,
             'public_transit_coverage': self.public_transit_coverage
-        } 
\ No newline at end of file
+        }